@@ -0,0 +1,154 @@
+"""
+Columnar export of the wallet analytics to Arrow IPC or Parquet files.
+
+The metrics of a wallet (valuations, cashflows, share values, TWRR...) and the per-asset price and position
+matrices are gathered as numpy columns, then wrapped into an Arrow table without copying the float buffers.
+Notebooks and BI tools can then read the typed table directly (pyarrow, pandas, polars, DuckDB...).
+
+pyarrow is an optional dependency: pip install portfolio_tracking[arrow]
+"""
+from pathlib import Path
+from typing import Dict, List, Sequence
+import numpy as np
+from .price_matrix import forward_fill_prices
+
+
+EXPORT_FORMATS = {".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow", ".parquet": "parquet"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError("The export to Arrow/Parquet needs pyarrow: pip install portfolio_tracking[arrow]") from error
+    return pyarrow
+
+
+def wallet_columns(wallet) -> Dict[str, np.ndarray]:
+    """
+    Gathers the metrics of a wallet whose evaluation dates are set, one column per metric.
+
+    Args:
+        wallet (Wallet): The wallet to export.
+
+    Returns:
+        Dict[str, np.ndarray]: The columns 'date' (datetime64[D]), 'valuation', 'cashflow', 'share_value',
+            'share_number', 'twrr' and 'twrr_cumulated' (float64), all of the length of wallet.dates.
+    """
+    if not wallet.valuations:
+        wallet.calculate_wallet_valuation()
+    dates = wallet.dates
+    cashflows_dict = {row[0]: row[1] for row in wallet.db_manager.get_all_cashflows_between_dates(dates[0], dates[-1])}
+    _, share_number = wallet.get_wallet_share_value_2()
+    twrr_cumulated, twrr = wallet.calculate_wallet_TWRR()
+    return {
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "valuation": np.array(wallet.valuations, dtype=np.float64),
+        "cashflow": np.array([cashflows_dict.get(date) or 0 for date in dates], dtype=np.float64),
+        "share_value": np.array(wallet.calculate_wallet_share_value(), dtype=np.float64),
+        "share_number": np.array(share_number, dtype=np.float64),
+        "twrr": np.array(twrr, dtype=np.float64),
+        "twrr_cumulated": np.array(twrr_cumulated, dtype=np.float64),
+    }
+
+
+def asset_matrices(wallet) -> Dict[str, np.ndarray]:
+    """
+    Builds the dates x assets matrices of the close prices (carried forward like for the valuation)
+    and of the quantities held, over the evaluation dates of a wallet.
+
+    Args:
+        wallet (Wallet): The wallet to export.
+
+    Returns:
+        Dict[str, np.ndarray]: {'asset_ids': ids of the columns, 'prices': matrix, 'quantities': matrix}.
+    """
+    dates = wallet.dates
+    session_dates, asset_ids, closes = wallet.db_manager.get_all_assets_prices_arrays(dates[0], dates[-1])
+    initial_prices = {asset_id: (date, close) for date, asset_id, close in wallet.db_manager.get_all_assets_last_prices_before_date(dates[0])}
+    prices = forward_fill_prices(closes,
+                                 session_dates,
+                                 wallet.max_price_staleness_days,
+                                 initial_prices=np.array([initial_prices.get(asset_id, (None, np.nan))[1] for asset_id in asset_ids.tolist()], dtype=np.float64),
+                                 initial_dates=[initial_prices.get(asset_id, (None, None))[0] for asset_id in asset_ids.tolist()])
+    _, _, quantities = wallet.db_manager.get_all_assets_quantities_arrays(dates[0], dates[-1])
+    return {"asset_ids": asset_ids, "prices": prices, "quantities": quantities}
+
+
+def to_table(columns: Dict[str, np.ndarray]):
+    """
+    Wraps numpy columns into an Arrow table. The float64 columns without NaN share their buffer with numpy,
+    NaN values (unknown prices) become nulls. A 'date' column of datetime64[D] becomes a date32 column.
+
+    Args:
+        columns (Dict[str, np.ndarray]): The 1-D columns, all of the same length.
+
+    Returns:
+        pyarrow.Table: The table.
+    """
+    pa = _import_pyarrow()
+    arrays = {}
+    for name, values in columns.items():
+        if np.issubdtype(values.dtype, np.floating) and np.isnan(values).any():
+            arrays[name] = pa.array(values, mask=np.isnan(values))
+        else:
+            arrays[name] = pa.array(np.ascontiguousarray(values))
+    return pa.table(arrays)
+
+
+def matrix_columns(dates: Sequence[str], tickers: Sequence[str], matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Splits a dates x assets matrix into a 'date' column and one column per ticker.
+    The matrix is transposed once so that each ticker column is a contiguous view.
+    """
+    transposed = np.ascontiguousarray(matrix.T)
+    columns = {"date": np.array(dates, dtype="datetime64[D]")}
+    columns.update({ticker: transposed[column] for column, ticker in enumerate(tickers)})
+    return columns
+
+
+def write_table(table, path: Path, file_format: str=None) -> Path:
+    """
+    Writes an Arrow table to an Arrow IPC (Feather v2) or Parquet file.
+
+    Args:
+        table (pyarrow.Table): The table to write.
+        path (Path): The output file.
+        file_format (str, optional): 'arrow' or 'parquet'. Defaults to the one given by the suffix of path.
+
+    Returns:
+        Path: The path of the written file.
+    """
+    pa = _import_pyarrow()
+    path = Path(path)
+    file_format = file_format if file_format is not None else EXPORT_FORMATS.get(path.suffix.lower())
+    if file_format not in EXPORT_FORMATS.values():
+        raise ValueError(f"Unknown export format for '{path}', expected one of {sorted(EXPORT_FORMATS)}")
+    Path.mkdir(path.parent, parents=True, exist_ok=True)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def export_wallet(wallet, path: Path, file_format: str=None) -> Path:
+    """
+    Exports the metrics of a wallet as one table: date, valuation, cashflow, share_value, share_number, twrr, twrr_cumulated.
+    """
+    return write_table(to_table(wallet_columns(wallet)), path, file_format)
+
+
+def export_asset_matrices(wallet, prices_path: Path, positions_path: Path, file_format: str=None) -> List[Path]:
+    """
+    Exports the close prices and the quantities held of every asset, as two tables with a 'date' column
+    and one column per ticker.
+    """
+    tickers = {asset_id: ticker for asset_id, _, ticker, _ in wallet.db_manager.get_all_assets()}
+    matrices = asset_matrices(wallet)
+    columns_names = [tickers[asset_id] for asset_id in matrices["asset_ids"].tolist()]
+    return [write_table(to_table(matrix_columns(wallet.dates, columns_names, matrices["prices"])), prices_path, file_format),
+            write_table(to_table(matrix_columns(wallet.dates, columns_names, matrices["quantities"])), positions_path, file_format)]
+
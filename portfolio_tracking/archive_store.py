@@ -0,0 +1,219 @@
+"""
+Indexed, compressed store for the archived histories.
+
+The CSV files of the Archives directory are gathered in a single SQLite container (histories/Archives/archives.db).
+Each archive (named after its CSV file, ex: 'Genfit_EUR_history') is cut into yearly blocks of zlib-compressed
+CSV lines, indexed by (name, year) with the first and last date of each block. A range read only decompresses
+the blocks overlapping the range, and the sessions missing in the range are reported with the trading calendars.
+
+Usage:
+    python -m portfolio_tracking.archive_store --archives histories/Archives
+"""
+import argparse
+import csv
+import io
+from pathlib import Path
+import sqlite3
+from typing import Dict, Iterator, List, Tuple
+import zlib
+from .yfinance_interface import ARCHIVES_DB_FILENAME, ARCHIVES_DIR_NAME, HISTORIES_DIR_PATH, HISTORY_FILENAME_SUFIX
+
+
+COMPRESSION_LEVEL = 9
+
+
+def _compress(lines: List[str]) -> bytes:
+    return zlib.compress("".join(lines).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def _decompress(data: bytes) -> List[str]:
+    return zlib.decompress(data).decode("utf-8").splitlines(keepends=True)
+
+
+def _to_line(row: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(row)
+    return buffer.getvalue()
+
+
+class ArchiveStore:
+    def __init__(self, db_path: Path=HISTORIES_DIR_PATH/ARCHIVES_DIR_NAME/ARCHIVES_DB_FILENAME) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        db_path : Path
+            Path of the container, created if it does not exist.
+        """
+        self.db_path = Path(db_path)
+        Path.mkdir(self.db_path.parent, parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS Archives (
+                name TEXT PRIMARY KEY,  -- Nom du fichier CSV d'origine, sans extension
+                header TEXT NOT NULL  -- Ligne d'en-tête du CSV (Date,Open,High,...)
+            );
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS Blocks (
+                name TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                first_date TEXT NOT NULL,
+                last_date TEXT NOT NULL,
+                nb_rows INTEGER NOT NULL,
+                data BLOB NOT NULL,  -- Lignes CSV de l'année, compressées avec zlib
+                PRIMARY KEY(name, year),
+                FOREIGN KEY(name) REFERENCES Archives(name)
+            ) WITHOUT ROWID;
+            """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_names(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Les noms des archives stockées, triés.
+        """
+        return [row[0] for row in self.conn.execute("SELECT name FROM Archives ORDER BY name")]
+
+    def get_coverage(self, name: str) -> Tuple[str, str]:
+        """
+        Args:
+            name (str): Nom de l'archive.
+        Returns:
+            Tuple[str, str]: La première et la dernière date de l'archive, (None, None) si elle n'existe pas.
+        """
+        return self.conn.execute("""
+        SELECT MIN(first_date), MAX(last_date) FROM Blocks WHERE name = ?
+        """, (name,)).fetchone()
+
+    def write_rows(self, name: str, header: List[str], rows: List[List[str]]) -> int:
+        """
+        Adds rows to an archive. The rows of a date already archived replace the previous ones;
+        only the yearly blocks touched by the new rows are rewritten.
+
+        Args:
+            name (str): Nom de l'archive.
+            header (List[str]): Les noms des colonnes, la première étant 'Date'.
+            rows (List[List[str]]): Les lignes, la première valeur étant la date sous forme 'YYYY-MM-DD'.
+        Returns:
+            int: Le nombre de lignes écrites.
+        """
+        rows_by_year: Dict[int, Dict[str, str]] = {}
+        for row in rows:
+            rows_by_year.setdefault(int(row[0][:4]), {})[row[0][:10]] = _to_line(row)
+
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO Archives (name, header) VALUES (?, ?)", (name, _to_line(header)))
+            for year, lines_by_date in rows_by_year.items():
+                block = self.conn.execute("SELECT data FROM Blocks WHERE name = ? AND year = ?", (name, year)).fetchone()
+                if block is not None:
+                    for line in _decompress(block[0]):
+                        lines_by_date.setdefault(line[:10], line)
+                dates = sorted(lines_by_date)
+                self.conn.execute("""
+                INSERT OR REPLACE INTO Blocks (name, year, first_date, last_date, nb_rows, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, (name, year, dates[0], dates[-1], len(dates), _compress([lines_by_date[date] for date in dates])))
+        return len(rows)
+
+    def iter_lines(self, name: str, start_date: str, end_date: str) -> Iterator[str]:
+        """
+        Streams the CSV lines of an archive between two dates (inclusive), in chronological order.
+        Only the blocks overlapping the range are read and decompressed.
+
+        Args:
+            name (str): Nom de l'archive.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        Returns:
+            Iterator[str]: Les lignes CSV (sans l'en-tête).
+        """
+        blocks = self.conn.execute("""
+        SELECT data FROM Blocks
+        WHERE name = ? AND last_date >= ? AND first_date <= ?
+        ORDER BY year ASC
+        """, (name, start_date[:10], end_date[:10])).fetchall()
+        for (data,) in blocks:
+            for line in _decompress(data):
+                if start_date[:10] <= line[:10] <= end_date[:10]:
+                    yield line
+
+    def read_csv_text(self, name: str, start_date: str, end_date: str) -> str:
+        """
+        Args:
+            name (str): Nom de l'archive.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        Returns:
+            str: Le contenu CSV (avec l'en-tête) de la période, None si l'archive n'existe pas.
+        """
+        header = self.conn.execute("SELECT header FROM Archives WHERE name = ?", (name,)).fetchone()
+        if header is None:
+            return None
+        return header[0] + "".join(self.iter_lines(name, start_date, end_date))
+
+    def find_gaps(self, name: str, ticker: str, start_date: str, end_date: str) -> List[str]:
+        """
+        Lists the sessions of the exchange of the ticker which are missing in an archive between two dates.
+
+        Args:
+            name (str): Nom de l'archive.
+            ticker (str): Le ticker de l'asset, qui détermine sa place de cotation.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        Returns:
+            List[str]: Les séances absentes de l'archive, sous forme 'YYYY-MM-DD'.
+        """
+        from .trading_calendar import get_ticker_calendar
+        archived_dates = {line[:10] for line in self.iter_lines(name, start_date, end_date)}
+        return [session for session in get_ticker_calendar(ticker).sessions_between(start_date[:10], end_date[:10])
+                if session not in archived_dates]
+
+    def import_csv(self, file_path: Path) -> int:
+        """
+        Imports an archive CSV file (first column 'Date'), named after the file.
+
+        Args:
+            file_path (Path): Le fichier CSV à importer.
+        Returns:
+            int: Le nombre de lignes importées.
+        """
+        with open(file_path, 'r', encoding='utf-8', newline='') as csv_file:
+            reader = csv.reader(csv_file)
+            header = next(reader, None)
+            if header is None:
+                return 0
+            rows = [row for row in reader if row and row[0]]
+        return self.write_rows(Path(file_path).stem, header, rows)
+
+    def import_directory(self, archives_dir: Path, pattern: str=f"*_{HISTORY_FILENAME_SUFIX}") -> Dict[str, int]:
+        """
+        Imports all the archive CSV files of a directory.
+
+        Args:
+            archives_dir (Path): Le répertoire Archives.
+            pattern (str): Motif des fichiers à importer.
+        Returns:
+            Dict[str, int]: Le nombre de lignes importées par archive.
+        """
+        return {file_path.stem: self.import_csv(file_path) for file_path in sorted(Path(archives_dir).glob(pattern))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the archive CSV files into the compressed archive store.")
+    parser.add_argument("--archives", type=Path, default=HISTORIES_DIR_PATH/ARCHIVES_DIR_NAME, help="Directory of the archive CSV files.")
+    parser.add_argument("--db", type=Path, default=None, help="Path of the container. Defaults to <archives>/archives.db.")
+    args = parser.parse_args()
+
+    store = ArchiveStore(args.db if args.db is not None else args.archives / ARCHIVES_DB_FILENAME)
+    imported = store.import_directory(args.archives)
+    for name, nb_rows in imported.items():
+        first_date, last_date = store.get_coverage(name)
+        print(f"{name}: {nb_rows} lignes ({first_date} -> {last_date})")
+    store.close()
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,195 @@
+"""
+In-memory backtesting of investment strategies (periodic rebalancing to target weights, DCA...).
+
+The price matrix of the tested assets is read once from the database; a strategy is then replayed against it
+without writing anything to SQLite. The strategy callback is only called on the rebalancing sessions (first session
+of each day, week, month or year) and returns the quantities to buy or sell. Between these sessions the quantities
+are constant, so valuations, cashflows and TWRR are computed for all the dates in a few vectorized operations.
+"""
+from typing import Callable, Dict, Hashable, List, Sequence
+import numpy as np
+from .downsampling import PERIODS, period_start
+from .price_matrix import DEFAULT_MAX_PRICE_STALENESS_DAYS, as_of_price_matrix
+from .returns import twrr_series
+from .yfinance_interface import DatabaseManager
+
+
+FREQUENCIES = ("D",) + PERIODS
+
+
+class BacktestState:
+    def __init__(self, index: int, date: str, prices: np.ndarray, quantities: np.ndarray, invested: float, first: bool=False) -> None:
+        """State of the simulated wallet given to the strategy on a rebalancing session.
+
+        Parameters
+        ----------
+        index : int
+            Index of the session in the dates of the backtest.
+        date : str
+            Date of the session, as 'YYYY-MM-DD'.
+        prices : np.ndarray
+            Close of each asset on this session (NaN if unknown).
+        quantities : np.ndarray
+            Quantities held before the orders of this session.
+        invested : float
+            Net amount invested so far (sum of the cashflows).
+        first : bool=False
+            True on the first rebalancing session of the run.
+        """
+        self.index = index
+        self.date = date
+        self.prices = prices
+        self.quantities = quantities
+        self.invested = invested
+        self.first = first
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.where(np.isnan(self.prices), 0, self.prices * self.quantities)
+
+
+Strategy = Callable[[BacktestState], np.ndarray]
+
+
+class BacktestResult:
+    def __init__(self, dates: List[str], orders: np.ndarray, quantities: np.ndarray, valuations: np.ndarray, cashflows: np.ndarray, normalized_wallet_value: float=100) -> None:
+        self.dates = dates
+        self.orders = orders
+        self.quantities = quantities
+        self.valuations = valuations
+        self.cashflows = cashflows
+        self.twrr_cumulated, self.twrr = twrr_series(valuations, cashflows, normalized_wallet_value)
+
+    def __repr__(self) -> str:
+        return f"BacktestResult({self.dates[0]} -> {self.dates[-1]}, valuation={self.valuations[-1]:.2f}, twrr={self.twrr_cumulated[-1]:.2f})"
+
+
+class Backtest:
+    def __init__(self, dates: Sequence[str], asset_ids: Sequence[int], prices: np.ndarray) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        dates : Sequence[str]
+            Sorted dates of the backtest, as 'YYYY-MM-DD'.
+        asset_ids : Sequence[int]
+            Ids of the tested assets, one column of prices per asset.
+        prices : np.ndarray
+            (dates x assets) matrix of the closes, NaN where unknown.
+        """
+        self.dates = list(dates)
+        self.asset_ids = list(asset_ids)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self._rebalancing_indices: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_database(cls, db_manager: DatabaseManager, tickers: Sequence[str], start_date: str, end_date: str, max_price_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS) -> "Backtest":
+        """
+        Loads the closes of the tested assets, carried forward onto the dates where their exchange was closed.
+
+        Args:
+            db_manager (DatabaseManager): Manager of the database, only read.
+            tickers (Sequence[str]): Les tickers des assets testés.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+            max_price_staleness_days (int): Ancienneté maximale d'un prix reporté.
+        Returns:
+            Backtest: Le backtest prêt à rejouer des stratégies.
+        """
+        asset_ids = [db_manager.get_asset_id_by_ticker(ticker) for ticker in tickers]
+        dates = [row[0] for row in db_manager.get_dates(start_date, end_date)]
+        if not dates:
+            raise ValueError(f"No dates between {start_date} and {end_date}.")
+        prices = as_of_price_matrix(dates,
+                                    asset_ids,
+                                    db_manager.get_all_assets_prices_between_dates(start_date, end_date),
+                                    db_manager.get_all_assets_last_prices_before_date(start_date),
+                                    max_price_staleness_days)
+        return cls(dates, asset_ids, prices)
+
+    def rebalancing_indices(self, frequency: str) -> np.ndarray:
+        """
+        Returns the indices of the first session of each day ('D'), week ('W'), month ('M') or year ('Y').
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency '{frequency}', expected one of {FREQUENCIES}")
+        if frequency not in self._rebalancing_indices:
+            if frequency == "D":
+                indices = np.arange(len(self.dates))
+            else:
+                starts = [period_start(date, frequency) for date in self.dates]
+                indices = np.array([index for index, start in enumerate(starts) if index == 0 or start != starts[index - 1]], dtype=np.int64)
+            self._rebalancing_indices[frequency] = indices
+        return self._rebalancing_indices[frequency]
+
+    def run(self, strategy: Strategy, frequency: str="M", normalized_wallet_value: float=100) -> BacktestResult:
+        """
+        Replays a strategy. Orders are executed at the close of the rebalancing session, orders on an asset
+        without known price are dropped.
+
+        Args:
+            strategy (Strategy): Called with a BacktestState on each rebalancing session, returns the quantity
+                to buy (positive) or sell (negative) of each asset, or None to do nothing.
+            frequency (str): 'D', 'W', 'M' or 'Y'.
+            normalized_wallet_value (float): La valeur de départ du TWRR cumulé.
+        Returns:
+            BacktestResult: Les ordres, quantités, valorisations, flux et TWRR à chaque date.
+        """
+        nb_assets = len(self.asset_ids)
+        orders = np.zeros_like(self.prices)
+        quantities = np.zeros(nb_assets)
+        invested = 0.0
+        for position, index in enumerate(self.rebalancing_indices(frequency).tolist()):
+            prices = self.prices[index]
+            session_orders = strategy(BacktestState(index, self.dates[index], prices, quantities.copy(), invested, first=position == 0))
+            if session_orders is None:
+                continue
+            session_orders = np.where(np.isnan(prices), 0, np.asarray(session_orders, dtype=np.float64))
+            orders[index] = session_orders
+            quantities += session_orders
+            invested += float(np.nansum(session_orders * prices))
+
+        held = np.cumsum(orders, axis=0)
+        valued_prices = np.where(np.isnan(self.prices), 0, self.prices)
+        valuations = (held * valued_prices).sum(axis=1)
+        cashflows = (orders * valued_prices).sum(axis=1)
+        return BacktestResult(self.dates, orders, held, valuations, cashflows, normalized_wallet_value)
+
+    def run_many(self, strategies: Dict[Hashable, Strategy], frequency: str="M") -> Dict[Hashable, BacktestResult]:
+        """
+        Replays several strategies (ex: a grid of parameters) against the same prices.
+        """
+        return {key: self.run(strategy, frequency) for key, strategy in strategies.items()}
+
+
+def dca(amounts: Sequence[float]) -> Strategy:
+    """
+    Dollar-cost averaging: invests a fixed amount in each asset on every rebalancing session.
+
+    Args:
+        amounts (Sequence[float]): Le montant investi dans chaque asset à chaque séance.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+
+    def strategy(state: BacktestState) -> np.ndarray:
+        return np.divide(amounts, state.prices, out=np.zeros_like(amounts), where=~np.isnan(state.prices))
+    return strategy
+
+
+def rebalance(weights: Sequence[float], contribution: float=0, initial_investment: float=0) -> Strategy:
+    """
+    Periodic rebalancing: on every rebalancing session, adds contribution to the wallet (initial_investment
+    on the first one) and trades so that each asset weighs its target weight in the wallet.
+
+    Args:
+        weights (Sequence[float]): Les poids cibles de chaque asset, de somme 1.
+        contribution (float): Le montant ajouté à chaque séance de rééquilibrage.
+        initial_investment (float): Le montant investi lors de la première séance.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+
+    def strategy(state: BacktestState) -> np.ndarray:
+        wallet_value = state.values.sum() + contribution + (initial_investment if state.first else 0)
+        targets = np.divide(wallet_value * weights, state.prices, out=state.quantities.copy(), where=~np.isnan(state.prices))
+        return targets - state.quantities
+    return strategy
@@ -0,0 +1,151 @@
+"""
+Columnar (NumPy) variants of the range queries of DatabaseManager.
+
+Instead of building a list with one tuple per row, the rows are streamed from the cursor into preallocated arrays:
+a dates x assets matrix for the prices and quantities, a vector for the cashflows. The dates come back as
+datetime64[D] (days since 1970-01-01, computed by SQLite), so that no date string is parsed in Python.
+"""
+from typing import Tuple
+import numpy as np
+from .fixed_point import QUANTITY_SCALE
+from .price_matrix import fill_matrix_from_cursor
+
+
+DAY_NUMBER_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"     # Date 'YYYY-MM-DD' -> days since 1970-01-01
+
+
+class ColumnarFetch:
+    """
+    Mixed into DatabaseManager, whose queries (get_dates(), execute_query(), segments of the archived years),
+    storage scales and adjustment factors it relies on.
+    """
+    def _session_dates(self, start_date: str, end_date: str) -> np.ndarray:
+        return np.array([date for (date,) in self.get_dates(start_date, end_date)], dtype="datetime64[D]")
+
+    def _asset_ids(self) -> np.ndarray:
+        return np.array([asset[0] for asset in self.get_all_assets()], dtype=np.int64)
+
+    def get_all_assets_prices_arrays(self, start_date: str, end_date: str, stored_units: bool=False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Columnar variant of get_all_assets_prices_between_dates(): the closes are streamed from the cursor
+        into a preallocated dates x assets matrix instead of a list of tuples.
+
+        Args:
+            start_date (str): The start date as 'YYYY-MM-DD'.
+            end_date (str): The end date as 'YYYY-MM-DD'.
+            stored_units (bool): If True, the closes stay in storage units (scaled integers in fixed_point mode).
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (dates, asset_ids, closes): the dates of the Dates table (datetime64[D]),
+                the ids of all the assets (one column per asset) and the matrix of the closes, NaN without a quote.
+        """
+        dates, asset_ids = self._session_dates(start_date, end_date), self._asset_ids()
+        closes = np.full((len(dates), len(asset_ids)), np.nan)
+        query = f"""
+        SELECT {DAY_NUMBER_SQL.format("d.date")}, p.asset_id, p.close
+        FROM {{schema}}.Prices p
+        JOIN {{schema}}.Dates d ON p.date_id = d.id
+        WHERE d.date BETWEEN :start_date AND :end_date
+        """
+        days = dates.astype(np.int64)
+        for cursor in self._cursors_on_segments(query, start_date, end_date):
+            fill_matrix_from_cursor(closes, days, asset_ids, cursor)
+        if self.fixed_point and not stored_units:
+            closes /= self._get_price_scales(asset_ids)
+        return dates, asset_ids, closes
+
+    def get_one_asset_prices_arrays(self, asset_id: int, start_date: str, end_date: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Columnar variant of get_one_asset_prices_between_dates().
+
+        Args:
+            asset_id (int): Id of the asset whose prices are requested.
+            start_date (str): The start date as 'YYYY-MM-DD'.
+            end_date (str): The end date as 'YYYY-MM-DD'.
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (dates, closes): the quoted dates (datetime64[D]) and the closes, NaN if unknown.
+        """
+        query = f"""
+        SELECT {DAY_NUMBER_SQL.format("d.date")}, p.close
+        FROM {{schema}}.Prices p
+        JOIN {{schema}}.Dates d ON p.date_id = d.id
+        WHERE p.asset_id = :asset_id AND d.date BETWEEN :start_date AND :end_date
+        ORDER BY d.date ASC
+        """
+        dtype = np.dtype([("day", np.int64), ("close", np.float64)])
+        rows = np.concatenate([np.empty(0, dtype)] + [np.fromiter(cursor, dtype=dtype)
+                                                      for cursor in self._cursors_on_segments(query, start_date, end_date, {"asset_id": asset_id})])
+        return rows["day"].astype("datetime64[D]"), rows["close"] / self._get_price_scale(asset_id)
+
+    def get_all_assets_quantities_arrays(self, start_date: str, end_date: str, stored_units: bool=False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Columnar variant of get_all_assets_quantities_between_dates(): the orders are summed per date and asset
+        into a preallocated dates x assets matrix, then accumulated along the dates.
+        An order dated on a day missing from Dates counts from the next date of the matrix.
+
+        Args:
+            start_date (str): The start date as 'YYYY-MM-DD'.
+            end_date (str): The end date as 'YYYY-MM-DD'.
+            stored_units (bool): If True, the quantities stay in storage units (scaled integers in fixed_point mode).
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (dates, asset_ids, quantities): the dates of the Dates table (datetime64[D]),
+                the ids of all the assets (one column per asset) and the matrix of the held quantities, in today's shares.
+        """
+        dates, asset_ids = self._session_dates(start_date, end_date), self._asset_ids()
+        quantities = np.zeros((len(dates), len(asset_ids)))
+        if not len(dates) or not len(asset_ids):
+            return dates, asset_ids, quantities
+        query = """
+        SELECT asset_id, date, SUM(quantity)
+        FROM Orders
+        WHERE date <= ?
+        GROUP BY asset_id, date
+        """
+        orders = np.fromiter(self.execute_query(query, (end_date,)), dtype=[("asset_id", np.int64), ("date", "U10"), ("quantity", np.float64)])
+        adjusted = orders["quantity"].copy()
+        factors = self.adjustment_factors
+        for asset_id in np.unique(orders["asset_id"]).tolist():
+            asset_orders = orders["asset_id"] == asset_id
+            adjusted[asset_orders] *= factors.quantity_factors(asset_id, orders["date"][asset_orders])
+        if self.fixed_point:
+            adjusted = np.round(adjusted)
+
+        # The orders before the first date are accumulated on the first row
+        rows = np.searchsorted(dates.astype(np.int64), orders["date"].astype("datetime64[D]").astype(np.int64))
+        columns = np.searchsorted(asset_ids, orders["asset_id"]).clip(0, len(asset_ids) - 1)
+        known = (rows < len(dates)) & (asset_ids[columns] == orders["asset_id"])
+        np.add.at(quantities, (rows[known], columns[known]), adjusted[known])
+        np.cumsum(quantities, axis=0, out=quantities)
+        if self.fixed_point and not stored_units:
+            quantities /= QUANTITY_SCALE
+        return dates, asset_ids, quantities
+
+    def get_all_cashflows_arrays(self, start_date: str, end_date: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Columnar variant of get_all_cashflows_between_dates().
+
+        Args:
+            start_date (str): The start date as 'YYYY-MM-DD'.
+            end_date (str): The end date as 'YYYY-MM-DD'.
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (dates, cashflows): the dates of the Dates table (datetime64[D]) and the cashflow of each date.
+        """
+        dates = self._session_dates(start_date, end_date)
+        days = dates.astype(np.int64)
+        cashflows = np.zeros(len(dates))
+        if not len(dates):
+            return dates, cashflows
+        query = f"""
+        SELECT {DAY_NUMBER_SQL.format("date")}, currency, SUM(cashflow)
+        FROM DailyCashflows
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date, currency
+        """
+        rows = np.fromiter(self.execute_query(query, (start_date, end_date)), dtype=[("day", np.int64), ("currency", "U8"), ("cashflow", np.float64)])
+        positions = np.searchsorted(days, rows["day"]).clip(0, len(days) - 1)
+        known = days[positions] == rows["day"]
+        scales = np.array([self._cashflow_scale(currency) for currency in rows["currency"].tolist()], dtype=np.float64)
+        np.add.at(cashflows, positions[known], rows["cashflow"][known] / scales[known])
+
+        for session_date, amount in self._dividend_payments(dates.astype(str).tolist()):
+            cashflows[np.searchsorted(dates, np.datetime64(session_date, "D"))] -= amount
+        return dates, cashflows
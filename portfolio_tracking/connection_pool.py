@@ -0,0 +1,87 @@
+"""
+Thread-safe access to one SQLite database file.
+
+All the writes go through a single writer connection, serialized by a lock, while each thread reads through its own
+read-only connection. The database is switched to WAL journaling, so that readers see the last committed state
+without ever waiting for the writer, and the writer does not wait for the readers.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterator, List
+
+
+READ_KEYWORDS = ("SELECT", "WITH")
+
+
+def is_read_query(query: str) -> bool:
+    """
+    Tells whether a query only reads the database (SELECT, WITH ... SELECT, PRAGMA data_version).
+    """
+    words = query.lstrip(" \t\r\n(").split(None, 2)
+    if not words:
+        return False
+    keyword = words[0].upper()
+    return keyword in READ_KEYWORDS or (keyword == "PRAGMA" and len(words) > 1 and words[1].rstrip(";").lower() == "data_version")
+
+
+class ConnectionPool:
+    def __init__(self, db_path: Path) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        db_path : Path
+            Path of the database file (an in-memory database cannot be shared between connections).
+        """
+        self.db_path = Path(db_path)
+        self.writer = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.write_lock = threading.RLock()
+        # data_version n'a de sens que sur une même connexion : elle est toujours lue sur celle-ci, quel que soit le thread
+        self._watcher = self._read_only_connection()
+        self._watcher_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """
+        Returns the read-only connection of the calling thread, opened on its first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._read_only_connection()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _read_only_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"{self.db_path.absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+    def data_version(self) -> int:
+        """
+        Returns the `PRAGMA data_version` of one dedicated connection, so that two values read from any threads can be
+        compared: it changes each time another connection (the writer or another process) commits.
+        """
+        with self._watcher_lock:
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Gives the writer connection to one thread at a time, and commits (or rolls back) when leaving the block.
+        """
+        with self.write_lock, self.writer:
+            yield self.writer
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._watcher.close()
+        self.writer.close()
@@ -0,0 +1,87 @@
+"""
+Cumulative adjustment factors of the corporate actions (splits and dividends).
+
+The prices stored in Prices come split-adjusted from Yahoo Finance (every past close is expressed in today's shares),
+while the quantities of Orders are the ones actually traded. Instead of rewriting prices or orders, the quantity of an
+order is multiplied at query time by the product of the split ratios after its date, looked up by binary search
+in a precomputed array of cumulative ratios per asset.
+"""
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+
+
+SPLIT = "split"
+DIVIDEND = "dividend"
+ACTION_KINDS = (SPLIT, DIVIDEND)
+
+
+class AdjustmentFactors:
+    def __init__(self) -> None:
+        self._split_dates: Dict[int, np.ndarray] = {}
+        # _remaining_ratios[asset_id][i] : produit des ratios des splits d'indice >= i (avec un 1 final)
+        self._remaining_ratios: Dict[int, np.ndarray] = {}
+        self._splits: Dict[int, Tuple[Tuple[str, float], ...]] = {}
+        self._dividends: List[Tuple[str, int, float]] = []
+
+    @classmethod
+    def from_actions(cls, actions: Iterable[Tuple[int, str, str, float]]) -> "AdjustmentFactors":
+        """
+        Builds the factors from corporate actions.
+
+        Args:
+            actions (Iterable[Tuple[int, str, str, float]]): Les opérations, tel que [[asset_id, date, kind, value]],
+                value étant le ratio d'un split (ex: 2 pour 1 action -> 2) ou le dividende par action.
+        Returns:
+            AdjustmentFactors: Les facteurs.
+        """
+        factors = cls()
+        splits: Dict[int, List[Tuple[str, float]]] = {}
+        for asset_id, date, kind, value in actions:
+            if kind == SPLIT:
+                splits.setdefault(asset_id, []).append((date, value))
+            elif kind == DIVIDEND:
+                factors._dividends.append((date, asset_id, value))
+            else:
+                raise ValueError(f"Unknown corporate action '{kind}', expected one of {ACTION_KINDS}")
+        for asset_id, asset_splits in splits.items():
+            asset_splits.sort()
+            ratios = np.array([ratio for _, ratio in asset_splits] + [1.0])
+            factors._split_dates[asset_id] = np.array([date for date, _ in asset_splits])
+            factors._remaining_ratios[asset_id] = np.cumprod(ratios[::-1])[::-1]
+            factors._splits[asset_id] = tuple(asset_splits)
+        factors._dividends.sort()
+        return factors
+
+    def quantity_factor(self, asset_id: int, date: str) -> float:
+        """
+        Returns the factor converting a quantity traded on a date into today's shares.
+        A split dated on the day of the order is already reflected in its quantity.
+        """
+        split_dates = self._split_dates.get(asset_id)
+        if split_dates is None:
+            return 1.0
+        return float(self._remaining_ratios[asset_id][np.searchsorted(split_dates, date, side="right")])
+
+    def quantity_factors(self, asset_id: int, dates: Sequence[str]) -> np.ndarray:
+        """
+        Vectorized quantity_factor() for several dates.
+        """
+        split_dates = self._split_dates.get(asset_id)
+        if split_dates is None:
+            return np.ones(len(dates))
+        return self._remaining_ratios[asset_id][np.searchsorted(split_dates, np.asarray(dates), side="right")]
+
+    def splits(self) -> Dict[int, Tuple[Tuple[str, float], ...]]:
+        """
+        Returns the splits of each asset, as {asset_id: ((date, ratio), ...)} sorted by date.
+        """
+        return dict(self._splits)
+
+    def dividends_between(self, start_date: str, end_date: str) -> List[Tuple[str, int, float]]:
+        """
+        Returns the dividends whose ex-date is between two dates (inclusive), as [(ex_date, asset_id, dividend per share)].
+        """
+        return [dividend for dividend in self._dividends if start_date <= dividend[0] <= end_date]
+
+    def __bool__(self) -> bool:
+        return bool(self._split_dates or self._dividends)
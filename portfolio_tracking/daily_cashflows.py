@@ -0,0 +1,55 @@
+"""
+Net flows of the orders per date and per asset, maintained by SQLite itself.
+
+The DailyCashflows table holds, for each date and asset, the sum of quantity * price of the orders. Triggers on
+Orders apply every insert, update or delete to it, so that the cashflows of a date range are read from a small
+table instead of being aggregated from all the orders at each query.
+"""
+import sqlite3
+
+
+def create_daily_cashflows(conn: sqlite3.Connection, value_type: str) -> None:
+    """
+    Net flows (quantity * price) of the orders per date and per asset, kept up to date by triggers on Orders.
+    The table is filled from the existing orders when it is created.
+    """
+    is_new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'DailyCashflows'").fetchone() is None
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS DailyCashflows (
+        date TEXT NOT NULL,
+        asset_id INTEGER NOT NULL,
+        currency TEXT NOT NULL,  -- Currency of the asset, in which the cashflow is expressed
+        cashflow {value_type} NOT NULL,  -- Sum of quantity * price of the orders of the day
+        FOREIGN KEY(asset_id) REFERENCES Assets(id),
+        PRIMARY KEY(date, asset_id)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Orders_insert_cashflow AFTER INSERT ON Orders
+    BEGIN
+        INSERT INTO DailyCashflows (date, asset_id, currency, cashflow)
+        SELECT NEW.date, NEW.asset_id, a.currency, NEW.quantity * NEW.price FROM Assets a WHERE a.id = NEW.asset_id
+        ON CONFLICT(date, asset_id) DO UPDATE SET cashflow = cashflow + excluded.cashflow;
+    END;
+    """)
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Orders_delete_cashflow AFTER DELETE ON Orders
+    BEGIN
+        UPDATE DailyCashflows SET cashflow = cashflow - OLD.quantity * OLD.price
+        WHERE date = OLD.date AND asset_id = OLD.asset_id;
+    END;
+    """)
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Orders_update_cashflow AFTER UPDATE OF asset_id, date, quantity, price ON Orders
+    BEGIN
+        UPDATE DailyCashflows SET cashflow = cashflow - OLD.quantity * OLD.price
+        WHERE date = OLD.date AND asset_id = OLD.asset_id;
+        INSERT INTO DailyCashflows (date, asset_id, currency, cashflow)
+        SELECT NEW.date, NEW.asset_id, a.currency, NEW.quantity * NEW.price FROM Assets a WHERE a.id = NEW.asset_id
+        ON CONFLICT(date, asset_id) DO UPDATE SET cashflow = cashflow + excluded.cashflow;
+    END;
+    """)
+    if is_new:
+        conn.execute("""
+        INSERT INTO DailyCashflows (date, asset_id, currency, cashflow)
+        SELECT o.date, o.asset_id, a.currency, SUM(o.quantity * o.price)
+        FROM Orders o
+        JOIN Assets a ON o.asset_id = a.id
+        GROUP BY o.date, o.asset_id
+        """)
@@ -0,0 +1,142 @@
+"""
+OHLC rollups and shape-preserving decimation of daily series.
+
+Used to keep weekly, monthly and yearly rollups next to the daily prices and valuations,
+and to reduce the number of points handed to matplotlib to what can actually be displayed.
+"""
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+
+PERIODS = ("W", "M", "Y")     # Semaine, mois, année
+DAYS_PER_PERIOD = {None: 1, "W": 7, "M": 31, "Y": 366}
+DEFAULT_MAX_POINTS = 2000
+
+Rollup = Tuple[str, float, float, float, float]   # (period_start, open, high, low, close)
+
+
+def period_start(date: str, period: str) -> str:
+    """
+    Returns the first day of the period containing the date.
+
+    Args:
+        date (str): La date sous forme 'YYYY-MM-DD'.
+        period (str): 'W' (semaine, commençant le lundi), 'M' (mois) ou 'Y' (année).
+    Returns:
+        str: Le premier jour de la période, sous forme 'YYYY-MM-DD'.
+    """
+    if period == "W":
+        day = datetime.strptime(date, "%Y-%m-%d")
+        return (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+    if period == "M":
+        return date[:8] + "01"
+    if period == "Y":
+        return date[:5] + "01-01"
+    raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+
+
+def ohlc_rollup(dates: Sequence[str], closes: Sequence[float], period: str, opens: Sequence[float]=None) -> List[Rollup]:
+    """
+    Aggregates a daily series into OHLC bars over weeks, months or years.
+    When only closes are known (ex: a valuation series), they are also used as opens.
+
+    Args:
+        dates (Sequence[str]): Les dates triées, sous forme 'YYYY-MM-DD'.
+        closes (Sequence[float]): Les valeurs de clôture correspondant à chaque date.
+        period (str): 'W', 'M' ou 'Y'.
+        opens (Sequence[float], optional): Les valeurs d'ouverture correspondant à chaque date.
+    Returns:
+        List[Rollup]: tel que [(period_start, open, high, low, close)].
+    """
+    if opens is None:
+        opens = closes
+    rollups: List[Rollup] = []
+    current_start = None
+    for date, open_value, close_value in zip(dates, opens, closes):
+        if open_value is None:
+            open_value = close_value
+        if close_value is None:
+            continue
+        start = period_start(date, period)
+        if start != current_start:
+            if current_start is not None:
+                rollups.append((current_start, bar_open, bar_high, bar_low, bar_close))
+            current_start = start
+            bar_open, bar_high, bar_low = open_value, max(open_value, close_value), min(open_value, close_value)
+        bar_high = max(bar_high, open_value, close_value)
+        bar_low = min(bar_low, open_value, close_value)
+        bar_close = close_value
+    if current_start is not None:
+        rollups.append((current_start, bar_open, bar_high, bar_low, bar_close))
+    return rollups
+
+
+def choose_period(start_date: str, end_date: str, max_points: int=DEFAULT_MAX_POINTS) -> str:
+    """
+    Chooses the finest resolution that displays the date range with at most max_points points.
+
+    Args:
+        start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+        end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        max_points (int): Nombre maximal de points souhaités.
+    Returns:
+        str: None pour les données journalières, sinon 'W', 'M' ou 'Y'.
+    """
+    nb_days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+    for period in (None,) + PERIODS:
+        if nb_days / DAYS_PER_PERIOD[period] <= max_points:
+            return period
+    return PERIODS[-1]
+
+
+def lttb_indices(values: Sequence[float], max_points: int=DEFAULT_MAX_POINTS) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets decimation: selects max_points indices of the series
+    that preserve its visual shape (peaks and troughs), always keeping the first and last points.
+    The points are considered evenly spaced on the x axis.
+
+    Args:
+        values (Sequence[float]): La série à réduire.
+        max_points (int): Nombre de points à conserver (au moins 3).
+    Returns:
+        List[int]: Les indices des points conservés, triés.
+    """
+    nb_values = len(values)
+    if max_points >= nb_values or max_points < 3:
+        return list(range(nb_values))
+
+    bucket_size = (nb_values - 2) / (max_points - 2)
+    indices = [0]
+    selected = 0
+    for bucket in range(max_points - 2):
+        bucket_start = int(bucket * bucket_size) + 1
+        bucket_end = int((bucket + 1) * bucket_size) + 1
+        # Moyenne du bucket suivant, qui sert de troisième sommet du triangle
+        next_start = bucket_end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, nb_values)
+        next_x = (next_start + next_end - 1) / 2
+        next_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        selected_x, selected_y = selected, values[selected]
+        best_area = -1
+        for index in range(bucket_start, bucket_end):
+            area = abs((selected_x - next_x) * (values[index] - selected_y)
+                       - (selected_x - index) * (next_y - selected_y))
+            if area > best_area:
+                best_area = area
+                best_index = index
+        indices.append(best_index)
+        selected = best_index
+    indices.append(nb_values - 1)
+    return indices
+
+
+def lttb(dates: Sequence[str], values: Sequence[float], max_points: int=DEFAULT_MAX_POINTS) -> Tuple[List[str], List[float]]:
+    """
+    Decimates a (dates, values) series with lttb_indices().
+
+    Returns:
+        Tuple[List[str], List[float]]: Les dates et les valeurs conservées.
+    """
+    indices = lttb_indices(values, max_points)
+    return [dates[index] for index in indices], [values[index] for index in indices]
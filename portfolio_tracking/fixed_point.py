@@ -0,0 +1,88 @@
+"""
+Fixed-point storage of the prices, quantities and cashflows.
+
+In fixed-point mode the database stores these values as scaled integers (int64) instead of REAL: a quantity q is
+stored as round(q * QUANTITY_SCALE), a price p of an asset quoted in currency c as round(p * price_scale(c)), and the
+cashflow of an order (quantity * price) as the exact product of both, at the scale cashflow_scale(c). Sums computed
+by SQLite or numpy on these integers are exact, and the values are converted to float only when they are returned.
+"""
+from pathlib import Path
+import sqlite3
+from typing import Dict
+import numpy as np
+
+
+QUANTITY_SCALE = 10**6     # Fractional shares up to 6 decimals
+DEFAULT_PRICE_SCALE = 10**4     # 4 decimals, like the CSV histories
+PRICE_SCALES: Dict[str, int] = {"JPY": 10**2, "KRW": 1}
+INT64_SAFE_BOUND = 2.0**62     # Below this bound (float estimate), the int64 sums of exact_valuations() cannot overflow
+
+
+def price_scale(currency: str) -> int:
+    return PRICE_SCALES.get(currency, DEFAULT_PRICE_SCALE)
+
+
+def cashflow_scale(currency: str) -> int:
+    return QUANTITY_SCALE * price_scale(currency)
+
+
+def storage_mode(conn: sqlite3.Connection, db_path: Path, fixed_point: bool) -> bool:
+    """
+    Returns the storage mode recorded in the Settings table, recording the requested one for a new database.
+    """
+    with conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS Settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        """)
+        stored = conn.execute("SELECT value FROM Settings WHERE key = 'fixed_point'").fetchone()
+        if stored is None:
+            # A database created before the mode was added stores REALs
+            is_new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Orders'").fetchone() is None
+            mode = bool(fixed_point) and is_new
+            conn.execute("INSERT INTO Settings (key, value) VALUES ('fixed_point', ?)", (str(int(mode)),))
+        else:
+            mode = stored[0] == "1"
+    if fixed_point is not None and fixed_point != mode:
+        raise ValueError(f"{db_path} stores {'fixed-point' if mode else 'floating-point'} values, it cannot be opened with fixed_point={fixed_point}.")
+    return mode
+
+
+def to_fixed(value: float, scale: int) -> int:
+    """
+    Converts a value to its scaled integer, None (NULL) for None or NaN.
+    """
+    if value is None or value != value:
+        return None
+    return int(round(value * scale))
+
+
+def from_fixed(value: int, scale: int) -> float:
+    return None if value is None else value / scale
+
+
+def exact_valuations(quantities: np.ndarray, prices: np.ndarray, price_scales: np.ndarray) -> np.ndarray:
+    """
+    Computes the valuation of each date with integer arithmetic, then divides once per price scale.
+    The products and their sums per date stay in int64 when they are bounded by INT64_SAFE_BOUND, and are
+    otherwise computed with Python integers (object arrays): exact whatever the size of the positions, but slower.
+
+    Args:
+        quantities (np.ndarray): The dates x assets matrix of the quantities, in storage units (integers).
+        prices (np.ndarray): The dates x assets matrix of the prices, in storage units (integers), NaN if unknown (valued at 0).
+        price_scales (np.ndarray): The price scale of each column.
+    Returns:
+        np.ndarray: The valuation of each date.
+    """
+    prices = np.where(np.isnan(prices), 0, prices).astype(np.int64)
+    quantities = np.asarray(quantities).astype(np.int64)
+    bound = float(np.abs(prices).max(initial=0)) * float(np.abs(quantities).max(initial=0)) * prices.shape[1]
+    if bound >= INT64_SAFE_BOUND:
+        prices, quantities = prices.astype(object), quantities.astype(object)
+    products = prices * quantities
+    valuations = np.zeros(len(products))
+    for scale in np.unique(price_scales).tolist():
+        # The sum of Python integers is divided exactly, to the nearest float
+        valuations += (products[:, price_scales == scale].sum(axis=1) / (QUANTITY_SCALE * scale)).astype(np.float64)
+    return valuations
@@ -0,0 +1,212 @@
+"""
+Time-series store for intraday bars.
+
+Bars are keyed by their integer UTC timestamp (seconds) and partitioned by asset and month:
+one small SQLite file per (ticker, month), under histories/intraday/<ticker>/<YYYY-MM>.db.
+A range query only opens the partitions of the months it covers, so tens of millions of bars stay queryable.
+Daily bars are rebuilt from the intraday ones for the existing valuation path (Dates/Prices tables).
+"""
+from datetime import date, datetime, timezone
+from pathlib import Path
+import sqlite3
+from typing import Dict, Iterator, List, Tuple
+from zoneinfo import ZoneInfo
+from .yfinance_interface import HISTORIES_DIR_PATH, DatabaseManager, _normalized_name
+
+
+INTRADAY_DIR_NAME = "intraday"
+INTRADAY_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+
+Bar = Tuple[int, float, float, float, float, float]   # (timestamp, open, high, low, close, volume)
+DailyBar = Tuple[str, float, float, float, float, float]   # (date, open, high, low, close, volume)
+
+
+def _month_of(timestamp: int) -> Tuple[int, int]:
+    moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return moment.year, moment.month
+
+
+def _months_between(start_timestamp: int, end_timestamp: int) -> Iterator[Tuple[int, int]]:
+    year, month = _month_of(start_timestamp)
+    end_year, end_month = _month_of(end_timestamp)
+    while (year, month) <= (end_year, end_month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _timestamp_of(day: str, tz: ZoneInfo) -> int:
+    """Returns the timestamp of the beginning of the day (format 'YYYY-MM-DD') in the given time zone."""
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=tz).timestamp())
+
+
+class IntradayStore:
+    def __init__(self, root_dir: Path=HISTORIES_DIR_PATH/INTRADAY_DIR_NAME) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        root_dir : Path
+            Directory containing one sub-directory of monthly partitions per ticker.
+        """
+        self.root_dir = Path(root_dir)
+
+    def _ticker_dir(self, ticker: str) -> Path:
+        return self.root_dir / _normalized_name(ticker)
+
+    def _partition_path(self, ticker: str, year: int, month: int) -> Path:
+        return self._ticker_dir(ticker) / f"{year:04d}-{month:02d}.db"
+
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS Bars (
+                timestamp INTEGER PRIMARY KEY,  -- Secondes UTC, la table est donc triée par date
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL
+            );
+            """)
+        return conn
+
+    def get_partitions(self, ticker: str) -> List[Tuple[int, int]]:
+        """
+        Args:
+            ticker (str): Le ticker de l'asset.
+        Returns:
+            List[Tuple[int, int]]: Les partitions existantes, tel que [(year, month)], triées.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        if not ticker_dir.is_dir():
+            return []
+        return sorted(tuple(int(part) for part in path.stem.split("-")) for path in ticker_dir.glob("*.db"))
+
+    def insert_bars(self, ticker: str, bars: List[Bar]) -> int:
+        """
+        Inserts (or replaces) intraday bars, each in the partition of its month.
+
+        Args:
+            ticker (str): Le ticker de l'asset.
+            bars (List[Bar]): Liste de barres tel que [(timestamp, open, high, low, close, volume)].
+        Returns:
+            int: Le nombre de barres écrites.
+        """
+        partitions: Dict[Tuple[int, int], List[Bar]] = {}
+        for bar in bars:
+            partitions.setdefault(_month_of(bar[0]), []).append(bar)
+
+        Path.mkdir(self._ticker_dir(ticker), parents=True, exist_ok=True)
+        for (year, month), partition_bars in partitions.items():
+            conn = self._connect(self._partition_path(ticker, year, month))
+            with conn:
+                conn.executemany("""
+                INSERT OR REPLACE INTO Bars (timestamp, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, partition_bars)
+            conn.close()
+        return len(bars)
+
+    def get_bars(self, ticker: str, start_timestamp: int, end_timestamp: int) -> Iterator[Bar]:
+        """
+        Streams the bars between two timestamps (inclusive), in chronological order.
+        Only the partitions covering the requested range are opened.
+
+        Args:
+            ticker (str): Le ticker de l'asset.
+            start_timestamp (int): Timestamp UTC de début (en secondes).
+            end_timestamp (int): Timestamp UTC de fin (en secondes).
+        Returns:
+            Iterator[Bar]: tel que [(timestamp, open, high, low, close, volume)].
+        """
+        for year, month in _months_between(start_timestamp, end_timestamp):
+            path = self._partition_path(ticker, year, month)
+            if not path.is_file():
+                continue
+            conn = self._connect(path)
+            try:
+                yield from conn.execute("""
+                SELECT timestamp, open, high, low, close, volume
+                FROM Bars
+                WHERE timestamp BETWEEN ? AND ?
+                ORDER BY timestamp ASC
+                """, (start_timestamp, end_timestamp))
+            finally:
+                conn.close()
+
+    def get_last_timestamp(self, ticker: str) -> int:
+        """
+        Args:
+            ticker (str): Le ticker de l'asset.
+        Returns:
+            int: Le timestamp de la dernière barre stockée, ou None si aucune.
+        """
+        for year, month in reversed(self.get_partitions(ticker)):
+            conn = self._connect(self._partition_path(ticker, year, month))
+            result = conn.execute("SELECT MAX(timestamp) FROM Bars").fetchone()
+            conn.close()
+            if result[0] is not None:
+                return result[0]
+        return None
+
+    def get_daily_bars(self, ticker: str, start_date: str, end_date: str, time_zone: str="UTC") -> List[DailyBar]:
+        """
+        Aggregates the intraday bars into daily OHLCV bars.
+
+        Args:
+            ticker (str): Le ticker de l'asset.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+            time_zone (str): Fuseau horaire de la place de cotation, qui définit le découpage en jours.
+        Returns:
+            List[DailyBar]: tel que [(date, open, high, low, close, volume)].
+        """
+        tz = ZoneInfo(time_zone)
+        start_timestamp = _timestamp_of(start_date, tz)
+        end_timestamp = _timestamp_of(end_date, tz) + 24 * 3600 - 1
+
+        daily_bars: List[DailyBar] = []
+        current_day: date = None
+        for timestamp, open_price, high, low, close, volume in self.get_bars(ticker, start_timestamp, end_timestamp):
+            day = datetime.fromtimestamp(timestamp, tz=tz).date()
+            if day != current_day:
+                if current_day is not None:
+                    daily_bars.append((current_day.strftime("%Y-%m-%d"), day_open, day_high, day_low, day_close, day_volume))
+                current_day = day
+                day_open, day_high, day_low, day_volume = open_price, high, low, 0
+            day_high = max(day_high, high)
+            day_low = min(day_low, low)
+            day_close = close
+            day_volume += volume or 0
+        if current_day is not None:
+            daily_bars.append((current_day.strftime("%Y-%m-%d"), day_open, day_high, day_low, day_close, day_volume))
+        return daily_bars
+
+    def write_daily_bars(self, db_manager: DatabaseManager, ticker: str, start_date: str, end_date: str, time_zone: str="UTC") -> int:
+        """
+        Writes the daily bars rebuilt from the intraday ones into the Dates and Prices tables,
+        so that the existing daily valuation path can use them.
+        The stored prices of these days are replaced: the last day may have been written while still partial.
+
+        Args:
+            db_manager (DatabaseManager): Manager of the database to fill.
+            ticker (str): Le ticker de l'asset.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+            time_zone (str): Fuseau horaire de la place de cotation.
+        Returns:
+            int: Le nombre de jours écrits.
+        """
+        daily_bars = self.get_daily_bars(ticker, start_date, end_date, time_zone)
+        if not daily_bars:
+            return 0
+        dates = [bar[0] for bar in daily_bars]
+        db_manager.insert_dates_batch(dates)
+        date_ids = db_manager.get_dates_ids(dates)
+        asset_id = db_manager.get_asset_id_by_ticker(ticker)
+        db_manager.insert_prices_batch(asset_id,
+                                       date_ids,
+                                       [(day, open_price, close) for day, open_price, _, _, close, _ in daily_bars],
+                                       replace=True)
+        db_manager.refresh_price_rollups(asset_id, dates[0])
+        return len(daily_bars)
@@ -0,0 +1,229 @@
+"""
+Lot matching of the orders, for the cost basis, the realized and unrealized P&L and the holding periods.
+
+Each buy opens a lot; each sell closes the quantity of the open lots in FIFO (oldest first), LIFO (newest first)
+or AVERAGE (weighted average cost, lots closed oldest first for the holding periods) order. The orders of each asset
+are processed once, in date order: appending newer orders only extends the matching, and only an asset that receives
+a back-dated order has its orders matched again.
+"""
+from collections import deque
+from datetime import date as Date
+from typing import Deque, Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+from .fixed_point import QUANTITY_SCALE
+from .yfinance_interface import DatabaseManager
+
+
+METHODS = ("FIFO", "LIFO", "AVERAGE")
+# Reliquat en dessous duquel un lot est considéré comme soldé : la moitié de la plus petite quantité stockée
+QUANTITY_TOLERANCE = 0.5 / QUANTITY_SCALE
+
+
+def _holding_days(open_date: str, close_date: str) -> int:
+    return (Date.fromisoformat(close_date) - Date.fromisoformat(open_date)).days
+
+
+class Lot:
+    def __init__(self, asset_id: int, open_date: str, quantity: float, unit_cost: float) -> None:
+        self.asset_id = asset_id
+        self.open_date = open_date
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+
+    def __repr__(self) -> str:
+        return f"Lot(asset_id={self.asset_id}, open_date={self.open_date}, quantity={self.quantity}, unit_cost={self.unit_cost})"
+
+
+class ClosedLot:
+    def __init__(self, asset_id: int, open_date: str, close_date: str, quantity: float, unit_cost: float, sale_price: float) -> None:
+        self.asset_id = asset_id
+        self.open_date = open_date
+        self.close_date = close_date
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+        self.sale_price = sale_price
+        self.realized_pnl = (sale_price - unit_cost) * quantity
+        self.holding_days = _holding_days(open_date, close_date)
+
+    def __repr__(self) -> str:
+        return (f"ClosedLot(asset_id={self.asset_id}, open_date={self.open_date}, close_date={self.close_date}, "
+                f"quantity={self.quantity}, realized_pnl={self.realized_pnl})")
+
+
+class _AssetLots:
+    """Matching state of one asset."""
+    def __init__(self) -> None:
+        self.open_lots: Deque[Lot] = deque()
+        self.closed_lots: List[ClosedLot] = []
+        self.orders: List[Tuple[str, float, float]] = []
+        self.quantity_held = 0
+        self.cost_basis = 0
+        # Après chaque date d'ordre : P&L réalisé cumulé, quantité détenue et prix de revient total
+        self.event_dates: List[str] = []
+        self.realized: List[float] = []
+        self.quantities: List[float] = []
+        self.cost_bases: List[float] = []
+
+
+class LotBook:
+    def __init__(self, method: str="FIFO") -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        method : str
+            'FIFO', 'LIFO' or 'AVERAGE'.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+        self.method = method
+        self.last_order_id = 0
+        self._assets: Dict[int, _AssetLots] = {}
+        self._splits: Dict[int, Tuple[Tuple[str, float], ...]] = {}
+
+    @classmethod
+    def from_database(cls, db_manager: DatabaseManager, method: str="FIFO") -> "LotBook":
+        book = cls(method)
+        book.refresh(db_manager)
+        return book
+
+    def refresh(self, db_manager: DatabaseManager) -> int:
+        """
+        Matches the orders inserted in the database since the last refresh, in today's shares (splits).
+        If the splits stored in the database have changed since the last refresh, all the orders are matched again
+        (the orders given to add_orders() directly are then dropped).
+
+        Returns:
+            int: Le nombre d'ordres lus dans la base.
+        """
+        factors = db_manager.adjustment_factors
+        splits = factors.splits()
+        if splits != self._splits:
+            self._assets = {}
+            self.last_order_id = 0
+            self._splits = splits
+        orders = db_manager.get_orders_inserted_after(self.last_order_id)
+        adjusted_orders = []
+        for date, asset_id, quantity, price, order_id in orders:
+            factor = factors.quantity_factor(asset_id, date)
+            adjusted_orders.append((asset_id, date, quantity * factor, price / factor))
+            # Seuls les ordres réellement lus font avancer le curseur
+            self.last_order_id = max(self.last_order_id, order_id)
+        self.add_orders(adjusted_orders)
+        return len(orders)
+
+    def add_orders(self, orders: Iterable[Tuple[int, str, float, float]]) -> None:
+        """
+        Args:
+            orders (Iterable[Tuple[int, str, float, float]]): Les ordres, tel que [[asset_id, date, quantity, price]].
+        """
+        orders_by_asset: Dict[int, List[Tuple[str, float, float]]] = {}
+        for asset_id, date, quantity, price in orders:
+            orders_by_asset.setdefault(asset_id, []).append((date, quantity, price))
+        for asset_id, asset_orders in orders_by_asset.items():
+            asset_orders.sort(key=lambda order: order[0])     # Tri stable : l'ordre d'insertion est conservé le même jour
+            lots = self._assets.setdefault(asset_id, _AssetLots())
+            if lots.orders and asset_orders[0][0] < lots.orders[-1][0]:
+                # Ordre antidaté : seul cet asset est rejoué
+                replayed_orders = sorted(lots.orders + asset_orders, key=lambda order: order[0])
+                lots = self._assets[asset_id] = _AssetLots()
+                asset_orders = replayed_orders
+            for date, quantity, price in asset_orders:
+                self._match(asset_id, lots, date, quantity, price)
+
+    def _match(self, asset_id: int, lots: _AssetLots, date: str, quantity: float, price: float) -> None:
+        lots.orders.append((date, quantity, price))
+        realized = lots.realized[-1] if lots.realized else 0
+        if quantity > 0:
+            lots.open_lots.append(Lot(asset_id, date, quantity, price))
+            lots.quantity_held += quantity
+            lots.cost_basis += quantity * price
+        else:
+            to_sell = -quantity
+            while to_sell > QUANTITY_TOLERANCE and lots.open_lots:
+                lot = lots.open_lots[-1] if self.method == "LIFO" else lots.open_lots[0]
+                sold = min(to_sell, lot.quantity)
+                unit_cost = lots.cost_basis / lots.quantity_held if self.method == "AVERAGE" else lot.unit_cost
+                closed = ClosedLot(asset_id, lot.open_date, date, sold, unit_cost, price)
+                lots.closed_lots.append(closed)
+                realized += closed.realized_pnl
+                lots.quantity_held -= sold
+                lots.cost_basis -= sold * unit_cost
+                lot.quantity -= sold
+                to_sell -= sold
+                if lot.quantity <= QUANTITY_TOLERANCE:
+                    if self.method == "LIFO":
+                        lots.open_lots.pop()
+                    else:
+                        lots.open_lots.popleft()
+            if to_sell > QUANTITY_TOLERANCE:
+                print(f"WARNING: La vente du {date} (asset {asset_id}) dépasse la quantité détenue de {to_sell}, l'excédent est ignoré.")
+            if not lots.open_lots:
+                lots.quantity_held, lots.cost_basis = 0, 0
+
+        if lots.event_dates and lots.event_dates[-1] == date:
+            lots.realized[-1], lots.quantities[-1], lots.cost_bases[-1] = realized, lots.quantity_held, lots.cost_basis
+        else:
+            lots.event_dates.append(date)
+            lots.realized.append(realized)
+            lots.quantities.append(lots.quantity_held)
+            lots.cost_bases.append(lots.cost_basis)
+
+    @property
+    def asset_ids(self) -> List[int]:
+        return list(self._assets)
+
+    def open_lots(self, asset_id: int) -> List[Lot]:
+        """
+        Returns the open lots of an asset, oldest first. In AVERAGE mode their unit cost is the average cost.
+        """
+        lots = self._assets.get(asset_id)
+        if lots is None:
+            return []
+        if self.method == "AVERAGE" and lots.quantity_held:
+            return [Lot(asset_id, lot.open_date, lot.quantity, lots.cost_basis / lots.quantity_held) for lot in lots.open_lots]
+        return list(lots.open_lots)
+
+    def closed_lots(self, asset_id: int=None) -> List[ClosedLot]:
+        """
+        Returns the closed lots of an asset, or of all the assets if asset_id is None, in closing order.
+        """
+        if asset_id is not None:
+            lots = self._assets.get(asset_id)
+            return list(lots.closed_lots) if lots is not None else []
+        return sorted((closed for lots in self._assets.values() for closed in lots.closed_lots), key=lambda closed: closed.close_date)
+
+    def unrealized_lots(self, asset_id: int, date: str, price: float) -> List[Tuple[Lot, float, int]]:
+        """
+        Returns the lots open at the end of the matching with their unrealized P&L and holding period at a date.
+
+        Returns:
+            List[Tuple[Lot, float, int]]: tel que [(lot, unrealized_pnl, holding_days)].
+        """
+        return [(lot, (price - lot.unit_cost) * lot.quantity, _holding_days(lot.open_date, date)) for lot in self.open_lots(asset_id)]
+
+    def pnl_series(self, dates: Sequence[str], asset_ids: Sequence[int], prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the cumulative realized P&L and the unrealized P&L of each asset at each date.
+
+        Args:
+            dates (Sequence[str]): Les dates triées sous forme 'YYYY-MM-DD'.
+            asset_ids (Sequence[int]): Les ids des assets, une colonne par asset.
+            prices (np.ndarray): La matrice dates x assets des prix de clôture (NaN si inconnu).
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Les matrices dates x assets (realized, unrealized). L'unrealized vaut NaN sans prix connu.
+        """
+        realized = np.zeros((len(dates), len(asset_ids)))
+        quantities = np.zeros_like(realized)
+        cost_bases = np.zeros_like(realized)
+        for column, asset_id in enumerate(asset_ids):
+            lots = self._assets.get(asset_id)
+            if lots is None or not lots.event_dates:
+                continue
+            positions = np.searchsorted(np.array(lots.event_dates), np.asarray(dates), side="right") - 1
+            known = positions >= 0
+            realized[known, column] = np.array(lots.realized)[positions[known]]
+            quantities[known, column] = np.array(lots.quantities)[positions[known]]
+            cost_bases[known, column] = np.array(lots.cost_bases)[positions[known]]
+        unrealized = np.where(quantities == 0, 0, quantities * prices - cost_bases)
+        return realized, unrealized
@@ -0,0 +1,93 @@
+"""
+In-memory copy of a SQLite database file, for the read-heavy batch computations.
+
+The file is copied into a ":memory:" database with the backup API. It is then refreshed incrementally: the rows
+appended to the tables with increasing ids are copied from the file attached to the copy, and the small tables are
+copied entirely. If rows known by the copy have been deleted from one of the append-only tables, the whole file is
+copied again. The copy, with the results written to it, can be written back to the file with the backup API.
+"""
+from pathlib import Path
+import sqlite3
+from typing import Dict, Tuple
+
+
+SNAPSHOT_APPEND_TABLES = ("Assets", "Dates", "Prices", "CurrencyRates")     # Tables with increasing ids, copied incrementally
+# Small tables copied in full. Orders can be updated in place, and the triggers its copy fires on DailyCashflows
+# are overwritten by the copy of DailyCashflows, which comes after it.
+SNAPSHOT_COPY_TABLES = ("Settings", "PriceShards", "PriceRollups", "Ingestions", "IngestionBlocks", "CorporateActions", "CorporateActionsChecks", "Orders", "DailyCashflows")
+
+
+class MemorySnapshot:
+    def __init__(self, source_conn: sqlite3.Connection, db_path: Path) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        source_conn : sqlite3.Connection
+            Connection to the database file.
+        db_path : Path
+            Path of the database file, attached to the copy by the incremental refreshes.
+        """
+        self.source_conn = source_conn
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(":memory:")
+        self._version: int = None
+        # (row count, highest id) of each append-only table of the file, at the last refresh
+        self._marks: Dict[str, Tuple[int, int]] = None
+
+    def _source_version(self) -> int:
+        return self.source_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self, full: bool=False) -> bool:
+        """
+        Brings the copy up to date with the file, if the file has been written since the last refresh.
+        The first refresh, or full=True, copies the whole file with the backup API.
+
+        Returns:
+            bool: True if the copy has been modified.
+        """
+        source_version = self._source_version()
+        if not full and source_version == self._version:
+            return False
+        appended = False
+        if not full and self._marks is not None:
+            self.conn.execute("ATTACH DATABASE ? AS source", (str(self.db_path),))
+            try:
+                appended = self._copy_appended_rows()
+                if appended:
+                    self._marks = self._table_marks("source")
+            finally:
+                self.conn.execute("DETACH DATABASE source")
+        if not appended:
+            self.source_conn.backup(self.conn)
+            self._marks = self._table_marks("main")
+        self._version = source_version
+        return True
+
+    def _table_marks(self, schema: str) -> Dict[str, Tuple[int, int]]:
+        return {table: self.conn.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {schema}.{table}").fetchone() for table in SNAPSHOT_APPEND_TABLES}
+
+    def _copy_appended_rows(self) -> bool:
+        """
+        Copies the rows appended to the attached file since the last refresh, and the small tables entirely.
+        Returns False, without copying anything, if rows already copied have been deleted from the file.
+        """
+        for table, (count, max_id) in self._marks.items():
+            if self.conn.execute(f"SELECT COUNT(*) FROM source.{table} WHERE id <= ?", (max_id,)).fetchone()[0] != count:
+                return False
+        with self.conn:
+            for table, (_, max_id) in self._marks.items():
+                self.conn.execute(f"INSERT OR REPLACE INTO main.{table} SELECT * FROM source.{table} WHERE id > ?", (max_id,))
+            for table in SNAPSHOT_COPY_TABLES:
+                self.conn.execute(f"DELETE FROM main.{table}")
+                self.conn.execute(f"INSERT INTO main.{table} SELECT * FROM source.{table}")
+        return True
+
+    def write_back(self) -> None:
+        """
+        Writes the copy back to the file with the backup API.
+        Refused if the file has been written by another connection since the last refresh, to not lose these writes.
+        """
+        if self._source_version() != self._version:
+            raise ValueError(f"{self.db_path} has been modified since the last refresh of the snapshot, call refresh_snapshot() first.")
+        self.conn.backup(self.source_conn)
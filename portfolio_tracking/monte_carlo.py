@@ -0,0 +1,169 @@
+"""
+Monte Carlo projection of the wallet valuation.
+
+The daily log-returns of the assets currently held are estimated from their stored closes, then future paths are
+simulated for all the assets at once, either by bootstrapping whole days of history (which keeps the correlations
+between assets) or from a multivariate normal law fitted on that history. Paths are simulated by chunks to cap the
+memory of the (paths x days x assets) arrays, and the chunks are spread over a process pool for large runs.
+The result is given as percentile bands of the valuation at each future session.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import os
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .price_matrix import as_of_price_matrix
+from .yfinance_interface import DatabaseManager
+
+
+METHODS = ("bootstrap", "normal")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_LOOKBACK_DAYS = 3 * 365
+DEFAULT_CHUNK_SIZE = 2_000_000      # Nombre maximal de rendements (paths x days x assets) tirés par chunk
+PARALLEL_MIN_PATHS = 20_000         # En dessous, le coût de lancement des processus dépasse le gain
+
+
+class ReturnsModel:
+    def __init__(self, asset_ids: Sequence[int], initial_values: np.ndarray, log_returns: np.ndarray) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        asset_ids : Sequence[int]
+            Ids of the assets, one column per asset.
+        initial_values : np.ndarray
+            Current value (quantity x last close) of each asset.
+        log_returns : np.ndarray
+            Historical daily log-returns, as a (days x assets) matrix without NaN.
+        """
+        self.asset_ids = list(asset_ids)
+        self.initial_values = np.asarray(initial_values, dtype=np.float64)
+        self.log_returns = np.asarray(log_returns, dtype=np.float64)
+        self.mean = self.log_returns.mean(axis=0)
+        self.covariance = np.atleast_2d(np.cov(self.log_returns, rowvar=False))
+
+    @classmethod
+    def from_database(cls, db_manager: DatabaseManager, as_of_date: str, lookback_days: int=DEFAULT_LOOKBACK_DAYS) -> "ReturnsModel":
+        """
+        Estimates the model from the assets held at as_of_date and their closes over the lookback period.
+
+        Args:
+            db_manager (DatabaseManager): Manager of the database.
+            as_of_date (str): La date de départ de la projection sous forme 'YYYY-MM-DD'.
+            lookback_days (int): Nombre de jours calendaires d'historique utilisés pour estimer les rendements.
+        Returns:
+            ReturnsModel: Le modèle estimé.
+        """
+        # Quantités en actions d'aujourd'hui (splits), comme les closes ajustés par Yahoo Finance
+        assets_held = {asset_id: quantity for asset_id, quantity in db_manager.get_wallet_quantities_at_date(as_of_date).items() if quantity != 0}
+        if not assets_held:
+            raise ValueError(f"No assets held on {as_of_date}.")
+        asset_ids = sorted(assets_held)
+        quantities = np.array([assets_held[asset_id] for asset_id in asset_ids], dtype=np.float64)
+
+        start_date = (datetime.strptime(as_of_date, "%Y-%m-%d") - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+        dates = [row[0] for row in db_manager.get_dates(start_date, as_of_date)]
+        prices = as_of_price_matrix(dates,
+                                    asset_ids,
+                                    db_manager.get_all_assets_prices_between_dates(start_date, as_of_date),
+                                    db_manager.get_all_assets_last_prices_before_date(start_date),
+                                    max_staleness_days=None)
+        last_prices = prices[-1] if len(dates) else np.full(len(asset_ids), np.nan)
+        if np.isnan(last_prices).any():
+            raise ValueError(f"No price known on {as_of_date} for the assets {np.array(asset_ids)[np.isnan(last_prices)].tolist()}.")
+
+        log_returns = np.diff(np.log(prices), axis=0)
+        # Seuls les jours où tous les assets ont un rendement connu sont gardés, pour conserver les corrélations
+        log_returns = log_returns[~np.isnan(log_returns).any(axis=1)]
+        if len(log_returns) < 2:
+            raise ValueError(f"Not enough price history between {start_date} and {as_of_date} to estimate the returns.")
+        return cls(asset_ids, quantities * last_prices, log_returns)
+
+
+def simulate_paths(model: ReturnsModel, nb_paths: int, horizon: int, method: str="bootstrap", seed=None) -> np.ndarray:
+    """
+    Simulates valuation paths, vectorized over paths x days x assets.
+
+    Args:
+        model (ReturnsModel): The estimated returns.
+        nb_paths (int): Number of paths.
+        horizon (int): Number of simulated sessions.
+        method (str): 'bootstrap' (random days of history) or 'normal' (multivariate normal law).
+        seed (int | np.random.SeedSequence, optional): Seed of the random generator.
+
+    Returns:
+        np.ndarray: The (nb_paths x (horizon + 1)) valuations, the first column being the current valuation.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+    generator = np.random.default_rng(seed)
+    if method == "bootstrap":
+        days = generator.integers(0, len(model.log_returns), size=(nb_paths, horizon))
+        log_returns = model.log_returns[days]
+    else:
+        log_returns = generator.multivariate_normal(model.mean, model.covariance, size=(nb_paths, horizon), method="cholesky")
+    # Valeur de chaque asset le long du chemin, puis somme sur les assets
+    growth = np.exp(np.cumsum(log_returns, axis=1, out=log_returns))
+    valuations = np.empty((nb_paths, horizon + 1))
+    valuations[:, 0] = model.initial_values.sum()
+    np.matmul(growth, model.initial_values, out=valuations[:, 1:])
+    return valuations
+
+
+def _simulate_chunk(arguments: Tuple[ReturnsModel, int, int, str, np.random.SeedSequence]) -> np.ndarray:
+    model, nb_paths, horizon, method, seed = arguments
+    return simulate_paths(model, nb_paths, horizon, method, seed)
+
+
+def project(model: ReturnsModel, nb_paths: int=10_000, horizon: int=252, method: str="bootstrap", percentiles: Sequence[float]=DEFAULT_PERCENTILES, seed: int=None, chunk_size: int=DEFAULT_CHUNK_SIZE, max_workers: int=None) -> Dict[float, np.ndarray]:
+    """
+    Projects the valuation of the wallet and summarizes the paths as percentile bands.
+
+    Args:
+        model (ReturnsModel): The estimated returns.
+        nb_paths (int): Number of simulated paths.
+        horizon (int): Number of simulated sessions.
+        method (str): 'bootstrap' or 'normal'.
+        percentiles (Sequence[float]): The percentiles of the bands.
+        seed (int, optional): Seed, the result does not depend on the number of workers.
+        chunk_size (int): Maximal number of drawn returns (paths x days x assets) per chunk.
+        max_workers (int, optional): Number of processes. Defaults to the number of cores for large runs, 1 otherwise.
+
+    Returns:
+        Dict[float, np.ndarray]: The valuation at each session (horizon + 1 values) for each percentile, as {percentile: values}.
+    """
+    paths_per_chunk = max(1, chunk_size // (max(horizon, 1) * len(model.asset_ids)))
+    chunk_sizes = [min(paths_per_chunk, nb_paths - start) for start in range(0, nb_paths, paths_per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunks = [(model, size, horizon, method, chunk_seed) for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if max_workers is None:
+        max_workers = os.cpu_count() if nb_paths >= PARALLEL_MIN_PATHS else 1
+    if max_workers == 1 or len(chunks) <= 1:
+        valuations = np.vstack([_simulate_chunk(chunk) for chunk in chunks])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            valuations = np.vstack(list(executor.map(_simulate_chunk, chunks)))
+    bands = np.percentile(valuations, percentiles, axis=0)
+    return {percentile: band for percentile, band in zip(percentiles, bands)}
+
+
+def future_sessions(as_of_date: str, horizon: int) -> List[str]:
+    """
+    Returns as_of_date followed by the next horizon weekdays, as 'YYYY-MM-DD', to label the projected sessions.
+    """
+    start = np.datetime64(as_of_date, "D")
+    return np.datetime_as_string(np.concatenate([[start], np.busday_offset(start, np.arange(1, horizon + 1), roll="forward")])).tolist()
+
+
+def project_wallet(db_manager: DatabaseManager, as_of_date: str, nb_paths: int=10_000, horizon: int=252, method: str="bootstrap", lookback_days: int=DEFAULT_LOOKBACK_DAYS, percentiles: Sequence[float]=DEFAULT_PERCENTILES, seed: int=None, max_workers: int=None) -> Dict:
+    """
+    Projects the valuation of the assets held at as_of_date.
+
+    Returns:
+        Dict: {'dates': [date], 'percentiles': {percentile: [valuation]}}.
+    """
+    model = ReturnsModel.from_database(db_manager, as_of_date, lookback_days)
+    bands = project(model, nb_paths, horizon, method, percentiles, seed, max_workers=max_workers)
+    return {"dates": future_sessions(as_of_date, horizon),
+            "percentiles": {percentile: band.tolist() for percentile, band in bands.items()}}
@@ -1,38 +1,70 @@
-import matplotlib.pyplot as plt
-
-
-def plot_single_chart(dates_and_prices, value, figure_id, title, xlabel, ylabel, style='', xscale='linear', yscale='linear'):
-    plt.figure(figure_id)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.xscale(xscale)
-    plt.ylabel(ylabel)
-    plt.yscale(yscale)
-    ymin = min(0, min(dates_and_prices[value][:])*1.05)
-    ymax = max(0, max(dates_and_prices[value][:])*1.05)
-    plt.ylim(ymin, ymax)
-    plt.grid(True)
-    plt.plot(dates_and_prices['dates'][:], dates_and_prices[value][:], style, label=value)
-    plt.legend()
-    plt.show(block=False)
+from .downsampling import DEFAULT_MAX_POINTS, choose_period, lttb
 
 
-def plot_multi_charts(dates_and_prices, values, figure_id, title, xlabel, ylabel, xscale='linear', yscale='linear'):
-    plt.figure(figure_id)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.xscale(xscale)
-    plt.ylabel(ylabel)
-    plt.yscale(yscale)
+def draw_chart(ax, series, title, xlabel, ylabel, styles=None, xscale='linear', yscale='linear', max_points=DEFAULT_MAX_POINTS):
+    """
+    Draws one or several series on a matplotlib Axes, without using the global pyplot state.
+    series is a dict such as {label: (dates, values)}; each series is decimated independently to keep its own extrema.
+    """
+    styles = {} if styles is None else styles
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_xscale(xscale)
+    ax.set_ylabel(ylabel)
+    ax.set_yscale(yscale)
+    # Réduire les séries au nombre de points réellement affichables en conservant leur forme
+    decimated = {label: lttb(dates, values, max_points) for label, (dates, values) in series.items()}
     ymin = 0
     ymax = 0
-    for value in values:
-        ymin = min(ymin, min(dates_and_prices[value][:])*1.05)
-        ymax = max(ymax, max(dates_and_prices[value][:])*1.05)
-    plt.ylim(ymin, ymax)
-    plt.grid(True)
-    for value in values:
-        plt.plot(dates_and_prices['dates'][:], dates_and_prices[value][:], label=value)
-    plt.legend()
+    for _, values in decimated.values():
+        ymin = min(ymin, min(values)*1.05)
+        ymax = max(ymax, max(values)*1.05)
+    ax.set_ylim(ymin, ymax)
+    ax.grid(True)
+    for label, (dates, values) in decimated.items():
+        ax.plot(dates, values, styles.get(label, ''), label=label)
+    ax.legend()
+
+
+def plot_single_chart(dates_and_prices, value, figure_id, title, xlabel, ylabel, style='', xscale='linear', yscale='linear', max_points=DEFAULT_MAX_POINTS):
+    import matplotlib.pyplot as plt
+    figure = plt.figure(figure_id)
+    draw_chart(figure.gca(),
+               {value: (dates_and_prices['dates'], dates_and_prices[value])},
+               title, xlabel, ylabel, {value: style}, xscale, yscale, max_points)
     plt.show(block=False)
 
+
+def plot_multi_charts(dates_and_prices, values, figure_id, title, xlabel, ylabel, xscale='linear', yscale='linear', max_points=DEFAULT_MAX_POINTS):
+    import matplotlib.pyplot as plt
+    figure = plt.figure(figure_id)
+    draw_chart(figure.gca(),
+               {value: (dates_and_prices['dates'], dates_and_prices[value]) for value in values},
+               title, xlabel, ylabel, None, xscale, yscale, max_points)
+    plt.show(block=False)
+
+
+def get_asset_closes_for_plot(db_manager, asset_id, start_date, end_date, max_points=DEFAULT_MAX_POINTS):
+    """
+    Returns the closes of an asset at the finest resolution that fits in max_points:
+    the daily prices for short ranges, otherwise the weekly, monthly or yearly rollups.
+    """
+    period = choose_period(start_date, end_date, max_points)
+    if period is None:
+        rows = db_manager.get_one_asset_prices_between_dates(asset_id, start_date, end_date)
+        return {'dates': [row[0] for row in rows], 'close': [row[1] for row in rows]}
+    rows = db_manager.get_price_rollups(asset_id, period, start_date, end_date)
+    return {'dates': [row[0] for row in rows], 'close': [row[4] for row in rows]}
+
+
+def get_wallet_valuations_for_plot(wallet, max_points=DEFAULT_MAX_POINTS):
+    """
+    Returns the valuations of a wallet at the finest resolution that fits in max_points.
+    """
+    if not wallet.valuations:
+        wallet.calculate_wallet_valuation()
+    period = choose_period(wallet.dates[0], wallet.dates[-1], max_points)
+    if period is None:
+        return {'dates': wallet.dates, 'valuation': wallet.valuations}
+    rollups = wallet.get_valuation_rollups(period)
+    return {'dates': [row[0] for row in rollups], 'valuation': [row[4] for row in rollups]}
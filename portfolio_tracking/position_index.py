@@ -0,0 +1,100 @@
+"""
+Cumulative position index.
+
+For each asset, keeps the sorted dates of its orders and the running quantity held after each of these dates,
+so that "how many shares did I hold on date X" is answered by a binary search instead of summing all the orders.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+class PositionIndex:
+    def __init__(self) -> None:
+        self._dates: Dict[int, List[str]] = {}
+        self._quantities: Dict[int, List[float]] = {}
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Tuple[int, str, float]]) -> "PositionIndex":
+        """
+        Builds the index from orders.
+
+        Args:
+            orders (Iterable[Tuple[int, str, float]]): Les ordres, tel que [[asset_id, date, quantity]], dans n'importe quel ordre.
+        Returns:
+            PositionIndex: L'index construit.
+        """
+        index = cls()
+        for asset_id, date, quantity in sorted(orders, key=lambda order: (order[0], order[1])):
+            dates = index._dates.setdefault(asset_id, [])
+            quantities = index._quantities.setdefault(asset_id, [])
+            if dates and dates[-1] == date:
+                quantities[-1] += quantity
+            else:
+                dates.append(date)
+                quantities.append((quantities[-1] if quantities else 0) + quantity)
+        return index
+
+    @property
+    def asset_ids(self) -> List[int]:
+        return list(self._dates)
+
+    def add_order(self, asset_id: int, date: str, quantity: float) -> None:
+        """
+        Adds an order to the index. Appending an order after the last one is O(1),
+        a back-dated order shifts the running quantities of the following dates.
+
+        Args:
+            asset_id (int): Id de l'asset.
+            date (str): La date de l'ordre sous forme 'YYYY-MM-DD'.
+            quantity (float): La quantité achetée (valeur positive) ou vendue (valeur négative).
+        """
+        dates = self._dates.setdefault(asset_id, [])
+        quantities = self._quantities.setdefault(asset_id, [])
+        position = bisect_left(dates, date)
+        if position == len(dates) or dates[position] != date:
+            dates.insert(position, date)
+            quantities.insert(position, quantities[position - 1] if position > 0 else 0)
+        for following in range(position, len(quantities)):
+            quantities[following] += quantity
+
+    def quantity_at(self, asset_id: int, date: str) -> float:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+            date (str): La date sous forme 'YYYY-MM-DD' (les ordres de ce jour sont inclus).
+        Returns:
+            float: La quantité détenue à cette date, 0 si aucun ordre n'avait encore été passé.
+        """
+        dates = self._dates.get(asset_id)
+        if not dates:
+            return 0
+        position = bisect_right(dates, date) - 1
+        return self._quantities[asset_id][position] if position >= 0 else 0
+
+    def quantities_at(self, asset_id: int, dates: Sequence[str]) -> List[float]:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+            dates (Sequence[str]): Les dates sous forme 'YYYY-MM-DD'.
+        Returns:
+            List[float]: La quantité détenue à chaque date.
+        """
+        return [self.quantity_at(asset_id, date) for date in dates]
+
+    def wallet_at(self, date: str) -> Dict[int, float]:
+        """
+        Args:
+            date (str): La date sous forme 'YYYY-MM-DD'.
+        Returns:
+            Dict[int, float]: La quantité détenue de chaque asset à cette date, tel que {asset_id: quantity}.
+        """
+        return {asset_id: self.quantity_at(asset_id, date) for asset_id in self._dates}
+
+    def wallet_at_dates(self, dates: Sequence[str]) -> Dict[int, List[float]]:
+        """
+        Args:
+            dates (Sequence[str]): Les dates sous forme 'YYYY-MM-DD'.
+        Returns:
+            Dict[int, List[float]]: Les quantités détenues de chaque asset à chaque date, tel que {asset_id: [quantity]}.
+        """
+        return {asset_id: self.quantities_at(asset_id, dates) for asset_id in self._dates}
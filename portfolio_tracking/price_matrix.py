@@ -0,0 +1,156 @@
+"""
+Dense date x asset matrices built from the rows of the database, and as-of forward-filling of prices.
+
+Exchanges do not all trade on the same days: on a date where one exchange is closed but another one is open,
+the closed asset has no price in Prices. Its last known close is carried forward onto the union of the dates,
+up to a maximal staleness, in one vectorized pass over the whole matrix.
+"""
+from typing import Iterable, Sequence, Tuple
+import numpy as np
+
+
+DEFAULT_MAX_PRICE_STALENESS_DAYS = 7     # Couvre les week-ends prolongés et les fermetures de Pâques/Noël
+FETCH_CHUNK_SIZE = 4096
+DAY_ROW_DTYPE = np.dtype([("day", np.int64), ("asset_id", np.int64), ("value", np.float64)])
+
+
+def dates_to_ordinals(dates: Sequence[str]) -> np.ndarray:
+    """
+    Converts 'YYYY-MM-DD' dates to day numbers (days since 1970-01-01).
+    """
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def build_matrix(dates: Sequence[str], asset_ids: Sequence[int], rows: Iterable[Tuple[str, int, float]], fill_value: float=np.nan) -> np.ndarray:
+    """
+    Scatters (date, asset_id, value) rows into a dates x assets matrix.
+    Rows whose date or asset is not in dates/asset_ids are ignored.
+
+    Args:
+        dates (Sequence[str]): Les dates triées sous forme 'YYYY-MM-DD', une ligne par date.
+        asset_ids (Sequence[int]): Les ids des assets, une colonne par asset.
+        rows (Iterable[Tuple[str, int, float]]): Les valeurs, tel que [[date, asset_id, value]].
+        fill_value (float): Valeur des cellules sans donnée.
+    Returns:
+        np.ndarray: La matrice de taille (len(dates), len(asset_ids)).
+    """
+    matrix = np.full((len(dates), len(asset_ids)), fill_value, dtype=np.float64)
+    rows = list(rows)
+    if not rows or not len(dates) or not len(asset_ids):
+        return matrix
+    row_dates, row_assets, row_values = zip(*rows)
+
+    sorted_dates = np.asarray(dates)
+    date_positions = np.searchsorted(sorted_dates, np.asarray(row_dates)).clip(0, len(dates) - 1)
+    asset_order = np.argsort(asset_ids)
+    sorted_assets = np.asarray(asset_ids)[asset_order]
+    asset_positions = np.searchsorted(sorted_assets, np.asarray(row_assets)).clip(0, len(asset_ids) - 1)
+
+    known = (sorted_dates[date_positions] == np.asarray(row_dates)) & (sorted_assets[asset_positions] == np.asarray(row_assets))
+    values = np.array(row_values, dtype=np.float64)
+    matrix[date_positions[known], asset_order[asset_positions[known]]] = values[known]
+    return matrix
+
+
+def fill_matrix_from_cursor(matrix: np.ndarray, days: np.ndarray, asset_ids: Sequence[int], cursor, chunk_size: int=FETCH_CHUNK_SIZE) -> np.ndarray:
+    """
+    Streams (day, asset_id, value) rows from a database cursor into a preallocated dates x assets matrix,
+    chunk_size rows at a time, without materializing the whole result as Python tuples.
+    Rows whose day or asset is not in days/asset_ids are ignored.
+
+    Args:
+        matrix (np.ndarray): La matrice de taille (len(days), len(asset_ids)), remplie sur place.
+        days (np.ndarray): Les dates triées des lignes, en jours depuis le 1970-01-01 (voir dates_to_ordinals).
+        asset_ids (Sequence[int]): Les ids des assets, une colonne par asset.
+        cursor (sqlite3.Cursor): Curseur renvoyant des lignes (day, asset_id, value).
+        chunk_size (int): Nombre de lignes converties à la fois.
+    Returns:
+        np.ndarray: La matrice remplie.
+    """
+    if not len(days) or not len(asset_ids):
+        return matrix
+    asset_order = np.argsort(asset_ids)
+    sorted_assets = np.asarray(asset_ids)[asset_order]
+    while True:
+        rows = np.array(cursor.fetchmany(chunk_size), dtype=DAY_ROW_DTYPE)
+        if not len(rows):
+            return matrix
+        day_positions = np.searchsorted(days, rows["day"]).clip(0, len(days) - 1)
+        asset_positions = np.searchsorted(sorted_assets, rows["asset_id"]).clip(0, len(sorted_assets) - 1)
+        known = (days[day_positions] == rows["day"]) & (sorted_assets[asset_positions] == rows["asset_id"])
+        matrix[day_positions[known], asset_order[asset_positions[known]]] = rows["value"][known]
+
+
+def carry_forward(prices: np.ndarray, initial_prices: np.ndarray, initial_ordinals: np.ndarray, ordinals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Carries the last known price of each asset forward onto every row of the matrix, without staleness limit.
+
+    Args:
+        prices (np.ndarray): La matrice dates x assets des prix, NaN là où il n'y a pas de cotation.
+        initial_prices (np.ndarray): Dernier prix connu de chaque asset avant la première ligne (NaN si aucun).
+        initial_ordinals (np.ndarray): Numéro du jour de chacun de ces prix initiaux.
+        ordinals (np.ndarray): Numéro du jour de chaque ligne.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (filled, source_ordinals) : la matrice complétée et le numéro du jour de la cotation
+            dont vient chaque prix, qui permet de reprendre le report à partir d'une ligne.
+    """
+    nb_dates, nb_assets = prices.shape
+    # La ligne 0 contient les prix initiaux, les lignes suivantes la matrice
+    extended = np.vstack([initial_prices, prices])
+    rows = np.arange(nb_dates + 1)[:, None]
+    last_known = np.maximum.accumulate(np.where(np.isnan(extended), 0, rows), axis=0)[1:]
+    columns = np.arange(nb_assets)[None, :]
+    filled = extended[last_known, columns]
+    extended_ordinals = np.concatenate([[0], ordinals])
+    source_ordinals = np.where(last_known == 0, initial_ordinals[None, :], extended_ordinals[last_known])
+    return filled, source_ordinals
+
+
+def forward_fill_prices(prices: np.ndarray, dates: Sequence[str], max_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS, initial_prices: np.ndarray=None, initial_dates: Sequence[str]=None) -> np.ndarray:
+    """
+    As-of join: carries the last known price of each asset forward onto every date of the matrix.
+    A price older than max_staleness_days (calendar days) is considered unknown (NaN).
+
+    Args:
+        prices (np.ndarray): La matrice dates x assets des prix, NaN là où il n'y a pas de cotation.
+        dates (Sequence[str]): Les dates triées correspondant aux lignes, sous forme 'YYYY-MM-DD'.
+        max_staleness_days (int): Ancienneté maximale d'un prix reporté, None pour ne pas limiter.
+        initial_prices (np.ndarray, optional): Dernier prix connu de chaque asset avant dates[0] (NaN si aucun).
+        initial_dates (Sequence[str], optional): Date de chacun de ces prix initiaux.
+    Returns:
+        np.ndarray: La matrice des prix complétée.
+    """
+    nb_dates, nb_assets = prices.shape
+    if nb_dates == 0 or nb_assets == 0:
+        return prices.copy()
+    ordinals = dates_to_ordinals(dates)
+    if initial_prices is None:
+        initial_prices = np.full(nb_assets, np.nan)
+        initial_ordinals = np.zeros(nb_assets, dtype=np.int64)
+    else:
+        initial_ordinals = np.array([np.datetime64(date or "1970-01-01", "D") for date in initial_dates]).astype(np.int64)
+    filled, source_ordinals = carry_forward(prices, initial_prices, initial_ordinals, ordinals)
+    if max_staleness_days is not None:
+        filled[ordinals[:, None] - source_ordinals > max_staleness_days] = np.nan
+    return filled
+
+
+def as_of_price_matrix(dates: Sequence[str], asset_ids: Sequence[int], price_data: Iterable[Tuple[str, int, float]], initial_price_data: Iterable[Tuple[str, int, float]]=(), max_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS) -> np.ndarray:
+    """
+    Builds the dates x assets matrix of the close prices, carried forward onto the dates without quotation.
+
+    Args:
+        dates (Sequence[str]): Les dates triées sous forme 'YYYY-MM-DD'.
+        asset_ids (Sequence[int]): Les ids des assets, une colonne par asset.
+        price_data (Iterable[Tuple[str, int, float]]): Les prix de clôture, tel que [[date, asset_id, close]].
+        initial_price_data (Iterable[Tuple[str, int, float]], optional): Le dernier prix de chaque asset avant dates[0], tel que [[date, asset_id, close]].
+        max_staleness_days (int): Ancienneté maximale d'un prix reporté, None pour ne pas limiter.
+    Returns:
+        np.ndarray: La matrice des prix, NaN là où aucun prix assez récent n'est connu.
+    """
+    initial_prices = {asset_id: (date, close) for date, asset_id, close in initial_price_data}
+    return forward_fill_prices(build_matrix(dates, asset_ids, price_data),
+                               dates,
+                               max_staleness_days,
+                               initial_prices=np.array([initial_prices.get(asset_id, (None, np.nan))[1] for asset_id in asset_ids], dtype=np.float64),
+                               initial_dates=[initial_prices.get(asset_id, (None, None))[0] for asset_id in asset_ids])
@@ -0,0 +1,175 @@
+"""
+Per-year sharding of the Dates and Prices tables.
+
+A closed year can be archived: its Dates and Prices rows are moved into their own database file next to the main one
+(<db name>_prices_<year>.db), which is compacted and then only attached, read-only, when a query reaches this year.
+A range query is split into chronological segments, each one run on the database holding its years, and the rows
+of the segments are concatenated. The open years stay in the main database, which keeps the working set small.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+from typing import Iterable, Iterator, List, Tuple
+
+
+MAIN_SCHEMA = "main"
+WRITE_SCHEMA = "prices_write"
+MAX_ATTACHED_SHARDS = 8     # SQLite attaches at most 10 databases by default
+
+
+def shard_path(db_path: Path, year: int) -> Path:
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}_prices_{year}.db")
+
+
+def year_bounds(year: int) -> Tuple[str, str]:
+    return f"{year:04d}-01-01", f"{year:04d}-12-31"
+
+
+class PriceShards:
+    def __init__(self, conn: sqlite3.Connection, db_path: Path, years: Iterable[int]=()) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            Connection to the main database, on which the shards are attached.
+        db_path : Path
+            Path of the main database file.
+        years : Iterable[int]
+            The archived years.
+        """
+        self.conn = conn
+        self.db_path = Path(db_path)
+        self.years: List[int] = sorted(years)
+        self._attached: OrderedDict = OrderedDict()
+
+    def __bool__(self) -> bool:
+        return bool(self.years)
+
+    def path(self, year: int) -> Path:
+        return shard_path(self.db_path, year)
+
+    def schema(self, year: int) -> str:
+        """
+        Returns the schema holding the dates of a year, attaching its shard read-only on first use.
+        The least recently used shard is detached when MAX_ATTACHED_SHARDS are attached.
+        """
+        if year not in self.years:
+            return MAIN_SCHEMA
+        schema = self._attached.get(year)
+        if schema is not None:
+            self._attached.move_to_end(year)
+            return schema
+        if len(self._attached) >= MAX_ATTACHED_SHARDS:
+            _, oldest = self._attached.popitem(last=False)
+            self.conn.execute(f"DETACH DATABASE {oldest}")
+        schema = f"prices_{year}"
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"{self.path(year).absolute().as_uri()}?mode=ro",))
+        self._attached[year] = schema
+        return schema
+
+    def segments(self, start_date: str, end_date: str) -> Iterator[Tuple[str, str, str]]:
+        """
+        Splits a date range into chronological segments held by a single database.
+        Each shard is attached when its segment is reached, so a segment must be queried before asking for the next one.
+
+        Yields:
+            Tuple[str, str, str]: (schema, segment_start, segment_end).
+        """
+        current = start_date
+        for year in self.years:
+            first_day, last_day = year_bounds(year)
+            if last_day < current:
+                continue
+            if first_day > end_date:
+                break
+            if current < first_day:
+                yield MAIN_SCHEMA, current, year_bounds(year - 1)[1]
+            yield self.schema(year), max(current, first_day), min(end_date, last_day)
+            current = year_bounds(year + 1)[0]
+        if current <= end_date:
+            yield MAIN_SCHEMA, current, end_date
+
+    def schemas(self) -> Iterator[str]:
+        """
+        Yields the main schema then the schema of every shard, attached one after the other.
+        """
+        yield MAIN_SCHEMA
+        for year in self.years:
+            yield self.schema(year)
+
+    def write(self, year: int, query: str, rows: List[tuple]) -> None:
+        """
+        Runs a write query ({schema} being the shard) on the shard of an archived year, attached read-write for the time of the write.
+        """
+        schema = self._attached.pop(year, None)
+        if schema is not None:
+            self.conn.execute(f"DETACH DATABASE {schema}")
+        self.conn.execute(f"ATTACH DATABASE ? AS {WRITE_SCHEMA}", (str(self.path(year)),))
+        try:
+            with self.conn:
+                self.conn.executemany(query.format(schema=WRITE_SCHEMA), rows)
+                # The main file is written too, so that other connections see the write in its data_version
+                self.conn.execute("UPDATE PriceShards SET writes = writes + 1 WHERE year = ?", (year,))
+        finally:
+            self.conn.execute(f"DETACH DATABASE {WRITE_SCHEMA}")
+
+    def archive(self, year: int) -> Path:
+        """
+        Moves the Dates and Prices rows of a closed year from the main database into the file of the year, then compacts it.
+
+        Args:
+            year (int): The year to archive, which must be over.
+        Returns:
+            Path: The file of the archived year.
+        """
+        if year >= datetime.now().year:
+            raise ValueError(f"Only a closed year can be archived, {year} is not over.")
+        if year in self.years:
+            raise ValueError(f"{year} is already archived.")
+        path = self.path(year)
+        if path.exists():
+            raise ValueError(f"{path} already exists.")
+
+        # The file of the year reuses the schema of Dates and Prices of the main database
+        schema = self.conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name IN ('Dates', 'Prices') AND sql IS NOT NULL").fetchall()
+        shard = sqlite3.connect(path)
+        with shard:
+            for (sql,) in schema:
+                shard.execute(sql)
+        shard.close()
+
+        first_day, last_day = year_bounds(year)
+        self.conn.execute(f"ATTACH DATABASE ? AS {WRITE_SCHEMA}", (str(path),))
+        try:
+            with self.conn:
+                self.conn.execute(f"INSERT INTO {WRITE_SCHEMA}.Dates SELECT * FROM main.Dates WHERE date BETWEEN ? AND ?", (first_day, last_day))
+                self.conn.execute(f"""
+                INSERT INTO {WRITE_SCHEMA}.Prices
+                SELECT p.* FROM main.Prices p JOIN main.Dates d ON p.date_id = d.id WHERE d.date BETWEEN ? AND ?
+                """, (first_day, last_day))
+                self.conn.execute("DELETE FROM main.Prices WHERE date_id IN (SELECT id FROM main.Dates WHERE date BETWEEN ? AND ?)", (first_day, last_day))
+                self.conn.execute("DELETE FROM main.Dates WHERE date BETWEEN ? AND ?", (first_day, last_day))
+                self.conn.execute("INSERT INTO PriceShards (year) VALUES (?)", (year,))
+        finally:
+            self.conn.execute(f"DETACH DATABASE {WRITE_SCHEMA}")
+        self.years = sorted(self.years + [year])
+        self.compact(year)
+        return path
+
+    def compact(self, year: int) -> None:
+        """
+        Rebuilds the file of an archived year (VACUUM).
+        """
+        if year not in self.years:
+            raise ValueError(f"{year} is not archived.")
+        shard = sqlite3.connect(self.path(year))
+        shard.execute("VACUUM")
+        shard.close()
+
+    def detach_all(self) -> None:
+        for schema in self._attached.values():
+            self.conn.execute(f"DETACH DATABASE {schema}")
+        self._attached.clear()
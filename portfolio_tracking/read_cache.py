@@ -0,0 +1,39 @@
+"""
+LRU cache of the results of the read methods of DatabaseManager, dropped as soon as the database is written.
+"""
+import functools
+
+
+_NOT_CACHED = object()
+
+
+def cached_read(method):
+    """
+    Caches the result of a read method of DatabaseManager, keyed by method and arguments, when its read cache is enabled.
+    The whole cache is dropped as soon as the database has been written, by another connection (get_data_version())
+    or through this manager (the count of its writes, bumped after each commit).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.read_cache_size:
+            return method(self, *args, **kwargs)
+        state = (self.get_data_version(), self._writes)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        with self._read_cache_lock:
+            if state != self._read_cache_state:
+                self._read_cache.clear()
+                self._read_cache_state = state
+            result = self._read_cache.get(key, _NOT_CACHED)
+            if result is not _NOT_CACHED:
+                self._read_cache.move_to_end(key)
+                self.read_cache_hits += 1
+        if result is _NOT_CACHED:
+            result = method(self, *args, **kwargs)
+            with self._read_cache_lock:
+                if state == self._read_cache_state:
+                    self._read_cache[key] = result
+                    if len(self._read_cache) > self.read_cache_size:
+                        self._read_cache.popitem(last=False)
+        # A copy of the list, so that the caller can modify it without altering the cache
+        return list(result) if isinstance(result, list) else result
+    return wrapper
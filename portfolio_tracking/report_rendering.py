@@ -0,0 +1,195 @@
+"""
+Headless batch rendering of the per-asset and per-wallet charts.
+
+Charts are drawn with the object-oriented Figure API on an Agg canvas, without pyplot nor the global backend,
+so that they can be rendered in parallel in a process pool. Each worker configures matplotlib once,
+then reuses that setup for all the charts it renders; in the current process the settings only apply to the report. The data is read from the database in the parent
+process and already reduced to the displayable resolution, so only small payloads are sent to the workers.
+
+Usage:
+    python -m portfolio_tracking.report_rendering --db histories/data_base.db --out report --format png
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+from .downsampling import DEFAULT_MAX_POINTS, lttb
+from .ploting import draw_chart, get_asset_closes_for_plot, get_wallet_valuations_for_plot
+from .yfinance_interface import HISTORIES_DIR_PATH, DatabaseManager, _normalized_name
+
+
+REPORT_FORMATS = ("png", "svg")
+DEFAULT_FIGSIZE = (10, 6)
+DEFAULT_DPI = 100
+DEFAULT_RC_PARAMS = {
+    "figure.autolayout": True,
+    "axes.grid": True,
+    "path.simplify": True,
+    "agg.path.chunksize": 10000,
+}
+
+
+class ChartJob:
+    def __init__(self, path: Path, series: Dict[str, Tuple[Sequence[str], Sequence[float]]], title: str, xlabel: str, ylabel: str, yscale: str='linear') -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        path : Path
+            Output file, whose suffix ('.png' or '.svg') gives the format.
+        series : Dict[str, Tuple[Sequence[str], Sequence[float]]]
+            Series to draw, as {label: (dates, values)}.
+        title : str
+            Title of the chart.
+        xlabel : str
+            Label of the x axis.
+        ylabel : str
+            Label of the y axis.
+        yscale : str='linear'
+            Scale of the y axis.
+        """
+        self.path = Path(path)
+        self.series = series
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.yscale = yscale
+
+
+def _init_worker(rc_params: Dict=None) -> None:
+    """Configures the shared style once per worker process."""
+    import matplotlib
+    matplotlib.rcParams.update(DEFAULT_RC_PARAMS if rc_params is None else rc_params)
+
+
+def render_chart(job: ChartJob, figsize: Tuple[float, float]=DEFAULT_FIGSIZE, dpi: int=DEFAULT_DPI) -> Path:
+    """
+    Renders one chart to its file with the Figure API.
+
+    Args:
+        job (ChartJob): The chart to render.
+        figsize (Tuple[float, float]): Size of the figure in inches.
+        dpi (int): Resolution of the raster formats.
+
+    Returns:
+        Path: The path of the rendered file.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    draw_chart(figure.subplots(), job.series, job.title, job.xlabel, job.ylabel, yscale=job.yscale, max_points=DEFAULT_MAX_POINTS)
+    Path.mkdir(job.path.parent, parents=True, exist_ok=True)
+    figure.savefig(job.path, format=job.path.suffix[1:])
+    return job.path
+
+
+def build_asset_jobs(db_manager: DatabaseManager, start_date: str, end_date: str, out_dir: Path, file_format: str="png", max_points: int=DEFAULT_MAX_POINTS) -> List[ChartJob]:
+    """
+    Prepares one price chart per asset of the database.
+
+    Args:
+        db_manager (DatabaseManager): Manager of the database to read.
+        start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+        end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        out_dir (Path): Directory of the rendered files.
+        file_format (str): 'png' or 'svg'.
+        max_points (int): Maximal number of points per series.
+
+    Returns:
+        List[ChartJob]: The charts to render, assets without prices are skipped.
+    """
+    if file_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown format '{file_format}', expected one of {REPORT_FORMATS}")
+    jobs = []
+    for asset_id, short_name, ticker, currency in db_manager.get_all_assets():
+        closes = get_asset_closes_for_plot(db_manager, asset_id, start_date, end_date, max_points)
+        if not closes['dates']:
+            continue
+        jobs.append(ChartJob(path=Path(out_dir) / f"{_normalized_name(ticker)}.{file_format}",
+                             series={short_name: (closes['dates'], closes['close'])},
+                             title=f"{short_name} ({ticker})",
+                             xlabel="Date",
+                             ylabel=f"Close ({currency})"))
+    return jobs
+
+
+def build_wallet_jobs(wallet, out_dir: Path, name: str="wallet", file_format: str="png", max_points: int=DEFAULT_MAX_POINTS) -> List[ChartJob]:
+    """
+    Prepares the valuation and TWRR charts of a wallet whose evaluation dates are set.
+
+    Args:
+        wallet (Wallet): The wallet to render.
+        out_dir (Path): Directory of the rendered files.
+        name (str): Name of the wallet, used in the file names.
+        file_format (str): 'png' or 'svg'.
+        max_points (int): Maximal number of points per series.
+
+    Returns:
+        List[ChartJob]: The charts to render.
+    """
+    if file_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown format '{file_format}', expected one of {REPORT_FORMATS}")
+    valuations = get_wallet_valuations_for_plot(wallet, max_points)
+    twrr_cumulated, _ = wallet.calculate_wallet_TWRR()
+    # Les deux séries sont réduites ici, pour n'envoyer aux workers que les points affichables
+    return [
+        ChartJob(path=Path(out_dir) / f"{name}_valuation.{file_format}",
+                 series={"valuation": lttb(valuations['dates'], valuations['valuation'], max_points)},
+                 title=f"{name} valuation",
+                 xlabel="Date",
+                 ylabel=f"Valuation ({wallet.currency})"),
+        ChartJob(path=Path(out_dir) / f"{name}_twrr.{file_format}",
+                 series={"twrr": lttb(wallet.dates, twrr_cumulated, max_points)},
+                 title=f"{name} TWRR",
+                 xlabel="Date",
+                 ylabel="TWRR (base 100)"),
+    ]
+
+
+def render_report(jobs: List[ChartJob], max_workers: int=None, rc_params: Dict=None) -> List[Path]:
+    """
+    Renders all the charts in a process pool, using every core by default.
+
+    Args:
+        jobs (List[ChartJob]): The charts to render.
+        max_workers (int, optional): Number of processes. Defaults to the number of cores.
+            With max_workers=1 the charts are rendered in the current process, whose matplotlib settings are restored afterwards.
+        rc_params (Dict, optional): matplotlib settings shared by all the charts.
+
+    Returns:
+        List[Path]: The paths of the rendered files, in the order of the jobs.
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        import matplotlib
+        with matplotlib.rc_context(DEFAULT_RC_PARAMS if rc_params is None else rc_params):
+            return [render_chart(job) for job in jobs]
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(jobs) // (4 * max_workers))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(rc_params,)) as executor:
+        return list(executor.map(render_chart, jobs, chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the per-asset charts of the database as image files.")
+    parser.add_argument("--db", type=Path, default=HISTORIES_DIR_PATH/"data_base.db", help="Path of the SQLite database.")
+    parser.add_argument("--out", type=Path, default=HISTORIES_DIR_PATH/"report", help="Output directory.")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="png")
+    parser.add_argument("--start-date", default=None, help="Defaults to the date of the first order.")
+    parser.add_argument("--end-date", default=datetime.now().strftime('%Y-%m-%d'))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    start_date = args.start_date if args.start_date is not None else db_manager.get_first_date()
+    jobs = build_asset_jobs(db_manager, start_date, args.end_date, args.out, args.format)
+    paths = render_report(jobs, args.workers)
+    print(f"{len(paths)} graphiques enregistrés dans {args.out}")
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,94 @@
+"""
+Vectorized return series computed from valuations and cashflows held in numpy arrays.
+
+Same conventions as Wallet.calculate_wallet_TWRR(): the return of a sub-period is
+(value - (previous value + cashflow)) / (previous value + cashflow), and 1 when the denominator is zero.
+
+TWRRIndex stores the prefix sums of the log-returns of the sub-periods, so that the TWRR between any two dates is
+the exponential of a difference of two prefix sums: one query costs O(1) (plus a binary search of the dates) instead
+of recomputing the whole cumulated series for a new evaluation window.
+"""
+from typing import Sequence, Tuple
+import numpy as np
+from .wallet_data import ROUNDING_VALUE
+
+
+def _exact_returns(valuations: np.ndarray, cashflows: np.ndarray) -> np.ndarray:
+    valuations = np.asarray(valuations, dtype=np.float64)
+    previous = np.concatenate([[0.0], valuations[:-1]]) + np.asarray(cashflows, dtype=np.float64)
+    returns = np.ones_like(valuations)
+    np.divide(valuations - previous, previous, out=returns, where=previous != 0)
+    return returns
+
+
+def sub_period_returns(valuations: np.ndarray, cashflows: np.ndarray) -> np.ndarray:
+    """
+    Args:
+        valuations (np.ndarray): La valorisation du portefeuille à chaque date.
+        cashflows (np.ndarray): Le flux de trésorerie (achats - ventes) de chaque date.
+    Returns:
+        np.ndarray: Le rendement de chaque sous-période, la première partant d'une valorisation nulle.
+    """
+    return _exact_returns(valuations, cashflows).round(ROUNDING_VALUE)
+
+
+def twrr_series(valuations: np.ndarray, cashflows: np.ndarray, normalized_wallet_value: float=100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the cumulated TWRR and the TWRR of each sub-period in one pass.
+    The sub-period returns are chained unrounded, both series are rounded once at the end.
+
+    Args:
+        valuations (np.ndarray): La valorisation du portefeuille à chaque date.
+        cashflows (np.ndarray): Le flux de trésorerie de chaque date.
+        normalized_wallet_value (float): La valeur de départ du TWRR cumulé.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (twrr_cumulated, twrr).
+    """
+    twrr = _exact_returns(valuations, cashflows)
+    twrr_cumulated = normalized_wallet_value * np.cumprod(1 + twrr)
+    return twrr_cumulated.round(ROUNDING_VALUE), twrr.round(ROUNDING_VALUE)
+
+
+class TWRRIndex:
+    def __init__(self, dates: Sequence[str], valuations: np.ndarray, cashflows: np.ndarray) -> None:
+        """
+        Args:
+            dates (Sequence[str]): The sorted dates as 'YYYY-MM-DD'.
+            valuations (np.ndarray): The valuation of the wallet at each date.
+            cashflows (np.ndarray): The cashflow (purchases - sales) of each date.
+        """
+        self.dates = np.asarray(dates, dtype="U10")
+        growths = 1 + _exact_returns(valuations, cashflows)
+        # A zero (or negative) growth wipes out the TWRR of the whole window: it is counted apart from the log
+        total_losses = growths <= 0
+        self._log_prefix = np.concatenate([[0.0], np.cumsum(np.log(np.where(total_losses, 1.0, growths)))])
+        self._loss_prefix = np.concatenate([[0], np.cumsum(total_losses)])
+
+    def _positions(self, dates) -> np.ndarray:
+        # Position + 1 of the last date <= date, 0 if the date precedes the first one
+        return np.searchsorted(self.dates, np.asarray(dates, dtype="U10"), side="right")
+
+    def windows(self, start_dates: Sequence[str], end_dates: Sequence[str]) -> np.ndarray:
+        """
+        Vectorized TWRR of many (start, end) windows.
+        The TWRR of a window chains the sub-periods after the last date <= start_date, up to the last date <= end_date,
+        so that it equals cumulated[end] / cumulated[start] - 1 on the cumulated series of twrr_series().
+        A start_date before the first date also counts the first sub-period.
+
+        Args:
+            start_dates (Sequence[str]): The start dates as 'YYYY-MM-DD'.
+            end_dates (Sequence[str]): The end dates as 'YYYY-MM-DD'.
+        Returns:
+            np.ndarray: The TWRR of each window (0 if end_date <= start_date).
+        """
+        starts, ends = self._positions(start_dates), self._positions(end_dates)
+        ends = np.maximum(starts, ends)
+        twrr = np.expm1(self._log_prefix[ends] - self._log_prefix[starts])
+        twrr[self._loss_prefix[ends] > self._loss_prefix[starts]] = -1.0
+        return twrr.round(ROUNDING_VALUE)
+
+    def between(self, start_date: str, end_date: str) -> float:
+        """
+        TWRR between two dates, in O(1) after the binary search of the dates (see windows()).
+        """
+        return float(self.windows([start_date], [end_date])[0])
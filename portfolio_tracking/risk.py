@@ -0,0 +1,217 @@
+"""
+Cross-asset covariance of the daily log-returns and Value at Risk of the current holdings.
+
+The log-returns of every asset of the database are computed on the forward-filled closes and kept in memory. Their
+covariance matrix is maintained with online (Welford) updates: ingesting one more day costs O(assets²), whatever the
+length of the history, so that a nightly update does not recompute anything from the full history. An asset without
+a price on a day (not listed yet) only leaves out the pairs it belongs to, each pair having its own count and means.
+
+The risk of the holdings is reported as a parametric (normal) VaR/CVaR, from the covariance matrix, and as a
+historical VaR/CVaR, from the P&L the current positions would have made on each past day.
+"""
+from statistics import NormalDist
+from typing import Dict, List, Tuple
+import numpy as np
+from .price_matrix import forward_fill_prices
+from .yfinance_interface import DatabaseManager
+
+
+DEFAULT_CONFIDENCE = 0.99
+FIRST_DATE = "0001-01-01"
+LAST_DATE = "9999-12-31"
+
+
+class CovarianceTracker:
+    def __init__(self) -> None:
+        self.asset_ids = np.empty(0, dtype=np.int64)
+        self.dates: List[str] = []
+        self.last_prices = np.empty(0)
+        self._log_returns: List[np.ndarray] = []
+        # Statistics of each pair (i, j), over the days where both assets have a return:
+        # _counts[i, j] the number of days, _means[i, j] the mean return of i, _comoments[i, j] the sum of the products of the deviations
+        self._counts = np.zeros((0, 0), dtype=np.int64)
+        self._means = np.zeros((0, 0))
+        self._comoments = np.zeros((0, 0))
+
+    @classmethod
+    def from_database(cls, db_manager: DatabaseManager, end_date: str=LAST_DATE) -> "CovarianceTracker":
+        """
+        Builds the tracker from the whole price history stored up to end_date.
+        """
+        tracker = cls()
+        tracker.update(db_manager, end_date)
+        return tracker
+
+    def _add_assets(self, asset_ids: np.ndarray) -> np.ndarray:
+        """
+        Adds a column for the unknown assets, and returns the column of each of the given assets.
+        """
+        new_ids = asset_ids[~np.isin(asset_ids, self.asset_ids)]
+        if len(new_ids):
+            nb_new = len(new_ids)
+            self.asset_ids = np.concatenate([self.asset_ids, new_ids])
+            self.last_prices = np.concatenate([self.last_prices, np.full(nb_new, np.nan)])
+            self._log_returns = [np.concatenate([row, np.full(nb_new, np.nan)]) for row in self._log_returns]
+            self._counts = np.pad(self._counts, (0, nb_new))
+            self._means = np.pad(self._means, (0, nb_new))
+            self._comoments = np.pad(self._comoments, (0, nb_new))
+        return self._columns(asset_ids)
+
+    def _columns(self, asset_ids: np.ndarray) -> np.ndarray:
+        order = np.argsort(self.asset_ids)
+        return order[np.searchsorted(self.asset_ids, asset_ids, sorter=order)]
+
+    def add_day(self, date: str, log_returns: np.ndarray) -> None:
+        """
+        Ingests the log-returns of one day (NaN for an asset without return), in O(assets²).
+
+        Args:
+            date (str): The date as 'YYYY-MM-DD'.
+            log_returns (np.ndarray): The log-return of each asset, in the order of asset_ids.
+        """
+        known = ~np.isnan(log_returns)
+        pairs = known[:, None] & known[None, :]
+        returns = np.where(known, log_returns, 0.0)
+        self._counts += pairs
+        deltas = np.where(pairs, returns[:, None] - self._means, 0.0)
+        self._means += np.divide(deltas, self._counts, out=np.zeros_like(deltas), where=pairs)
+        # Welford: deviation from the old mean of i times deviation from the new mean of j, on the same pair
+        self._comoments += np.where(pairs, deltas * (returns[None, :] - self._means.T), 0.0)
+        self._log_returns.append(np.asarray(log_returns, dtype=np.float64))
+        self.dates.append(date)
+
+    def update(self, db_manager: DatabaseManager, end_date: str=LAST_DATE) -> int:
+        """
+        Ingests the days stored after the last ingested one, up to end_date.
+        A day already ingested is not revised if one of its closes is written afterwards.
+
+        Args:
+            db_manager (DatabaseManager): Manager of the database.
+            end_date (str): The last date to ingest as 'YYYY-MM-DD'.
+        Returns:
+            int: The number of ingested days.
+        """
+        start_date = FIRST_DATE
+        if self.dates:
+            start_date = str(np.datetime64(self.dates[-1], "D") + 1)
+        if start_date > end_date:
+            return 0
+        dates, asset_ids, closes = db_manager.get_all_assets_prices_arrays(start_date, end_date)
+        if not len(dates):
+            return 0
+        columns = self._add_assets(asset_ids)
+        prices = np.full((len(dates), len(self.asset_ids)), np.nan)
+        prices[:, columns] = closes
+        str_dates = dates.astype(str).tolist()
+        prices = forward_fill_prices(prices, str_dates, max_staleness_days=None, initial_prices=self.last_prices, initial_dates=[None] * len(self.asset_ids))
+        log_returns = np.diff(np.log(np.vstack([self.last_prices, prices])), axis=0)
+        for date, day_returns in zip(str_dates, log_returns):
+            self.add_day(date, day_returns)
+        self.last_prices = prices[-1]
+        return len(str_dates)
+
+    @property
+    def log_returns(self) -> np.ndarray:
+        """
+        The (days x assets) matrix of the ingested log-returns, NaN before the first price of an asset.
+        """
+        if not self._log_returns:
+            return np.empty((0, len(self.asset_ids)))
+        return np.vstack(self._log_returns)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.where(np.diag(self._counts) > 0, np.diag(self._means), np.nan)
+
+    @property
+    def covariance(self) -> np.ndarray:
+        """
+        The sample covariance matrix, each pair being estimated on the days where both assets have a return (NaN under 2 days).
+        """
+        denominators = self._counts - 1
+        return np.divide(self._comoments, denominators, out=np.full(self._comoments.shape, np.nan), where=denominators > 0)
+
+    @property
+    def correlation(self) -> np.ndarray:
+        covariance = self.covariance
+        deviations = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return covariance / np.outer(deviations, deviations)
+
+    def holding_values(self, db_manager: DatabaseManager) -> np.ndarray:
+        """
+        Returns the value (quantity x last close) of each asset held on the last ingested day, 0 if not held.
+        """
+        date = self.dates[-1]
+        _, asset_ids, quantities = db_manager.get_all_assets_quantities_arrays(date, date)
+        values = np.zeros(len(self.asset_ids))
+        if len(quantities):
+            known = np.isin(asset_ids, self.asset_ids)
+            values[self._columns(asset_ids[known])] = quantities[-1, known]
+        held = values != 0
+        if np.isnan(self.last_prices[held]).any():
+            raise ValueError(f"No price known for the held assets {self.asset_ids[held & np.isnan(self.last_prices)].tolist()}.")
+        values[held] *= self.last_prices[held]
+        return values
+
+    def parametric_var(self, values: np.ndarray, confidence: float=DEFAULT_CONFIDENCE, horizon_days: int=1) -> Tuple[float, float]:
+        """
+        Value at Risk and Conditional VaR under a normal law of the returns, the P&L being approximated by values · returns.
+
+        Args:
+            values (np.ndarray): The held value of each asset, in the order of asset_ids.
+            confidence (float): The confidence level (e.g. 0.99).
+            horizon_days (int): The horizon in sessions, the mean and the variance being assumed proportional to it.
+        Returns:
+            Tuple[float, float]: (VaR, CVaR), as positive losses.
+        """
+        held = values != 0
+        covariance = self.covariance[np.ix_(held, held)]
+        if np.isnan(covariance).any():
+            raise ValueError("Not enough history to estimate the covariance of the held assets.")
+        mean = horizon_days * float(values[held] @ self.mean[held])
+        deviation = float(np.sqrt(horizon_days * max(values[held] @ covariance @ values[held], 0.0)))
+        quantile = NormalDist().inv_cdf(confidence)
+        return deviation * quantile - mean, deviation * NormalDist().pdf(quantile) / (1 - confidence) - mean
+
+    def historical_var(self, values: np.ndarray, confidence: float=DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+        """
+        Value at Risk and Conditional VaR from the daily P&L the holdings would have made on each past day
+        where all the held assets have a return.
+
+        Returns:
+            Tuple[float, float]: (VaR, CVaR), as positive losses.
+        """
+        held = values != 0
+        log_returns = self.log_returns[:, held]
+        log_returns = log_returns[~np.isnan(log_returns).any(axis=1)]
+        if not len(log_returns):
+            raise ValueError("No past day with a return for all the held assets.")
+        profits = np.expm1(log_returns) @ values[held]
+        var = -float(np.quantile(profits, 1 - confidence))
+        return var, -float(profits[profits <= -var].mean())
+
+
+def portfolio_risk(db_manager: DatabaseManager, tracker: CovarianceTracker=None, confidence: float=DEFAULT_CONFIDENCE) -> Dict:
+    """
+    Updates the tracker with the new days and reports the risk of the holdings on the last ingested day.
+
+    Args:
+        db_manager (DatabaseManager): Manager of the database.
+        tracker (CovarianceTracker, optional): The tracker to update, built from the whole history if absent.
+        confidence (float): The confidence level.
+    Returns:
+        Dict: {'date', 'value', 'parametric': {'var', 'cvar'}, 'historical': {'var', 'cvar'}}.
+    """
+    if tracker is None:
+        tracker = CovarianceTracker.from_database(db_manager)
+    else:
+        tracker.update(db_manager)
+    if not tracker.dates:
+        raise ValueError("No price stored in the database.")
+    values = tracker.holding_values(db_manager)
+    parametric, historical = tracker.parametric_var(values, confidence), tracker.historical_var(values, confidence)
+    return {"date": tracker.dates[-1],
+            "value": float(values.sum()),
+            "parametric": {"var": parametric[0], "cvar": parametric[1]},
+            "historical": {"var": historical[0], "cvar": historical[1]}}
@@ -0,0 +1,262 @@
+"""
+Per-exchange trading calendars.
+
+Each exchange is described by a rule in EXCHANGE_RULES (trading weekdays, fixed holidays, holidays relative to Easter,
+"n-th weekday of a month" holidays, one-off closures). A fixed holiday is either 'MM-DD' or ['MM-DD', first year]
+for a holiday introduced after the start of the history. The rules can be extended or overridden with a local JSON file
+(histories/trading_calendars.json by default) having the same structure, ex:
+    {"exchanges": {"XPAR": {"extra_closures": ["2024-12-24"]}}, "suffixes": {".MI": "XMIL"}}
+
+The calendars tell which session should be the last one available for a ticker, so that refreshes can skip
+assets that are already up to date, and which sessions are missing in the stored prices.
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import json
+from pathlib import Path
+from typing import Dict, List, Set
+from .yfinance_interface import HISTORIES_DIR_PATH, DatabaseManager
+
+
+CALENDAR_RULES_FILENAME = "trading_calendars.json"
+DEFAULT_EXCHANGE = "XNYS"
+
+EXCHANGE_RULES: Dict[str, Dict] = {
+    "XPAR": {   # Euronext Paris (mêmes jours que Amsterdam, Bruxelles, Lisbonne)
+        "weekdays": [0, 1, 2, 3, 4],
+        "fixed_holidays": ["01-01", "05-01", "12-25", "12-26"],
+        "easter_offsets": [-2, 1],   # Vendredi saint, lundi de Pâques
+    },
+    "XETR": {   # Xetra (Francfort)
+        "weekdays": [0, 1, 2, 3, 4],
+        "fixed_holidays": ["01-01", "05-01", "12-24", "12-25", "12-26", "12-31"],
+        "easter_offsets": [-2, 1],
+    },
+    "XLON": {   # London Stock Exchange
+        "weekdays": [0, 1, 2, 3, 4],
+        "fixed_holidays": ["01-01", "12-25", "12-26"],
+        "observance": "next_weekday",
+        "easter_offsets": [-2, 1],
+        "nth_weekdays": [[5, 0, 1], [5, 0, -1], [8, 0, -1]],   # [mois, jour de la semaine, rang (-1 = dernier)]
+    },
+    "XNYS": {   # New York Stock Exchange / Nasdaq
+        "weekdays": [0, 1, 2, 3, 4],
+        "fixed_holidays": ["01-01", ["06-19", 2022], "07-04", "12-25"],   # Juneteenth depuis 2022
+        "observance": "nearest_weekday",
+        "saturday_unobserved": ["01-01"],   # Un 1er janvier tombant un samedi n'est pas reporté au 31 décembre
+        "easter_offsets": [-2],
+        "nth_weekdays": [[1, 0, 3], [2, 0, 3], [5, 0, -1], [9, 0, 1], [11, 3, 4]],
+    },
+    "FX": {     # Marché des changes : ouvert en semaine
+        "weekdays": [0, 1, 2, 3, 4],
+    },
+    "CRYPTO": {
+        "weekdays": [0, 1, 2, 3, 4, 5, 6],
+    },
+}
+
+TICKER_SUFFIXES: Dict[str, str] = {
+    ".PA": "XPAR",
+    ".AS": "XPAR",
+    ".BR": "XPAR",
+    ".LS": "XPAR",
+    ".DE": "XETR",
+    ".F": "XETR",
+    ".L": "XLON",
+    "=X": "FX",
+    "-USD": "CRYPTO",
+    "-EUR": "CRYPTO",
+}
+
+
+def _easter(year: int) -> date:
+    """Computes the date of Easter Sunday (Gregorian calendar, anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, rank: int) -> date:
+    if rank > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (rank - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _to_date(day) -> date:
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return datetime.strptime(str(day)[:10], "%Y-%m-%d").date()
+
+
+class TradingCalendar:
+    def __init__(self, exchange: str, rules: Dict) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        exchange : str
+            Code of the exchange (ex: 'XPAR').
+        rules : Dict
+            Rules of the exchange, with the keys of EXCHANGE_RULES.
+        """
+        self.exchange = exchange
+        self.weekdays: Set[int] = set(rules.get("weekdays", [0, 1, 2, 3, 4]))
+        self.fixed_holidays: List = rules.get("fixed_holidays", [])
+        self.observance: str = rules.get("observance")
+        self.saturday_unobserved: Set[str] = set(rules.get("saturday_unobserved", []))
+        self.easter_offsets: List[int] = rules.get("easter_offsets", [])
+        self.nth_weekdays: List[List[int]] = rules.get("nth_weekdays", [])
+        self.extra_closures: Set[date] = {_to_date(day) for day in rules.get("extra_closures", [])}
+        self._holidays_by_year: Dict[int, Set[date]] = {}
+
+    def _observed(self, holiday: date) -> date:
+        if holiday.weekday() not in (5, 6) or self.observance is None:
+            return holiday
+        if self.observance == "nearest_weekday":
+            return holiday + timedelta(days=-1 if holiday.weekday() == 5 else 1)
+        return holiday + timedelta(days=7 - holiday.weekday())    # "next_weekday"
+
+    def holidays(self, year: int) -> Set[date]:
+        """
+        Returns the holidays of the exchange for a year.
+        """
+        if year not in self._holidays_by_year:
+            holidays: Set[date] = set()
+            for fixed_holiday in self.fixed_holidays:
+                month_day, first_year = (fixed_holiday, None) if isinstance(fixed_holiday, str) else fixed_holiday
+                if first_year is not None and year < first_year:
+                    continue
+                holiday = datetime.strptime(f"{year}-{month_day}", "%Y-%m-%d").date()
+                if holiday.weekday() != 5 or month_day not in self.saturday_unobserved:
+                    holiday = self._observed(holiday)
+                while holiday in holidays:   # Ex: 25 et 26 décembre tombant un week-end
+                    holiday += timedelta(days=1)
+                holidays.add(holiday)
+            easter = _easter(year)
+            holidays.update(easter + timedelta(days=offset) for offset in self.easter_offsets)
+            holidays.update(_nth_weekday(year, month, weekday, rank) for month, weekday, rank in self.nth_weekdays)
+            holidays.update(day for day in self.extra_closures if day.year == year)
+            self._holidays_by_year[year] = holidays
+        return self._holidays_by_year[year]
+
+    def is_session(self, day) -> bool:
+        """
+        Args:
+            day (str | date): La date sous forme 'YYYY-MM-DD' ou date.
+        Returns:
+            bool: True si la place est ouverte ce jour-là.
+        """
+        day = _to_date(day)
+        return day.weekday() in self.weekdays and day not in self.holidays(day.year)
+
+    def previous_session(self, day) -> str:
+        """
+        Returns the last session strictly before the given day, as 'YYYY-MM-DD'.
+        """
+        day = _to_date(day) - timedelta(days=1)
+        while not self.is_session(day):
+            day -= timedelta(days=1)
+        return day.strftime("%Y-%m-%d")
+
+    def next_session(self, day) -> str:
+        """
+        Returns the first session on or after the given day, as 'YYYY-MM-DD'.
+        """
+        day = _to_date(day)
+        while not self.is_session(day):
+            day += timedelta(days=1)
+        return day.strftime("%Y-%m-%d")
+
+    def sessions_between(self, start_date, end_date) -> List[str]:
+        """
+        Returns all the sessions between two dates (inclusive), as 'YYYY-MM-DD'.
+        """
+        day, end = _to_date(start_date), _to_date(end_date)
+        sessions = []
+        while day <= end:
+            if self.is_session(day):
+                sessions.append(day.strftime("%Y-%m-%d"))
+            day += timedelta(days=1)
+        return sessions
+
+
+def load_rules(rules_path: Path=HISTORIES_DIR_PATH/CALENDAR_RULES_FILENAME) -> None:
+    """
+    Extends EXCHANGE_RULES and TICKER_SUFFIXES with a local JSON rules file, if it exists.
+    The rules of an exchange already known are updated key by key.
+    """
+    if not Path(rules_path).is_file():
+        return
+    with open(rules_path, 'r', encoding='utf-8') as rules_file:
+        local_rules = json.load(rules_file)
+    for exchange, rules in local_rules.get("exchanges", {}).items():
+        EXCHANGE_RULES.setdefault(exchange, {}).update(rules)
+    TICKER_SUFFIXES.update(local_rules.get("suffixes", {}))
+    get_calendar.cache_clear()
+
+
+def get_exchange(ticker: str) -> str:
+    """
+    Guesses the exchange of a ticker from its Yahoo Finance suffix (ex: 'GNFT.PA' -> 'XPAR').
+    """
+    for suffix, exchange in sorted(TICKER_SUFFIXES.items(), key=lambda item: -len(item[0])):
+        if ticker.upper().endswith(suffix.upper()):
+            return exchange
+    return DEFAULT_EXCHANGE
+
+
+@lru_cache(maxsize=None)
+def get_calendar(exchange: str) -> TradingCalendar:
+    if exchange not in EXCHANGE_RULES:
+        raise ValueError(f"Unknown exchange '{exchange}', expected one of {sorted(EXCHANGE_RULES)}")
+    return TradingCalendar(exchange, EXCHANGE_RULES[exchange])
+
+
+def get_ticker_calendar(ticker: str) -> TradingCalendar:
+    return get_calendar(get_exchange(ticker))
+
+
+def last_expected_session(ticker: str, end_date) -> str:
+    """
+    Returns the last session whose data should be available when downloading up to end_date (exclusive,
+    like yfinance): the session of end_date itself may not be closed yet.
+
+    Args:
+        ticker (str): Le ticker de l'asset.
+        end_date (str | date): La date de fin du téléchargement.
+    Returns:
+        str: La date de la dernière séance attendue, sous forme 'YYYY-MM-DD'.
+    """
+    return get_ticker_calendar(ticker).previous_session(end_date)
+
+
+def find_price_gaps(db_manager: DatabaseManager, asset_id: int, ticker: str, start_date: str, end_date: str) -> List[str]:
+    """
+    Lists the sessions of the exchange of the asset for which no price is stored.
+
+    Args:
+        db_manager (DatabaseManager): Manager of the database.
+        asset_id (int): Id de l'asset.
+        ticker (str): Le ticker de l'asset, qui détermine sa place de cotation.
+        start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+        end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+    Returns:
+        List[str]: Les séances sans prix, sous forme 'YYYY-MM-DD'.
+    """
+    stored_dates = {row[0] for row in db_manager.get_one_asset_prices_between_dates(asset_id, start_date, end_date)}
+    return [session for session in get_ticker_calendar(ticker).sessions_between(start_date, end_date) if session not in stored_dates]
+
+
+load_rules()
@@ -0,0 +1,324 @@
+"""
+Long-running valuation server.
+
+Keeps a DatabaseManager, the price/quantity dictionaries and the computed series of the wallet warm in memory,
+and answers valuation, TWRR and position queries over local HTTP (TCP or Unix socket) in JSON.
+Each request first checks SQLite's `PRAGMA data_version`: when new prices or orders have been appended,
+only the part of the series starting at the earliest affected date is recomputed. Any other write (an order updated
+or deleted, a corporate action, a price of an archived year) reloads everything.
+
+Usage:
+    python -m portfolio_tracking.valuation_server --db histories/data_base.db --port 8765
+    python -m portfolio_tracking.valuation_server --db histories/data_base.db --unix /tmp/portfolio.sock
+"""
+import argparse
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from pathlib import Path
+import socketserver
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from .price_matrix import DEFAULT_MAX_PRICE_STALENESS_DAYS, carry_forward, dates_to_ordinals
+from .wallet_data import ROUNDING_VALUE, _extend_TWRR, _rounded
+from .yfinance_interface import HISTORIES_DIR_PATH, DatabaseManager
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class WarmWallet:
+    def __init__(self, db_manager: DatabaseManager, start_date: str=None, end_date: str=None, normalized_wallet_value: float=100, max_price_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        db_manager : DatabaseManager
+            Manager of the database to serve.
+        start_date : str=None
+            First evaluation date ('YYYY-MM-DD'). If None, the date of the first order is used.
+        end_date : str=None
+            Last evaluation date ('YYYY-MM-DD'). If None, the current date is used at each refresh.
+        normalized_wallet_value : float=100
+            Initial normalized value of the wallet for the TWRR calculation.
+        max_price_staleness_days : int=DEFAULT_MAX_PRICE_STALENESS_DAYS
+            Maximal age in days of a price carried forward onto a date where its exchange was closed.
+        """
+        self.db_manager = db_manager
+        self.start_date = start_date
+        self.end_date = end_date
+        self.normalized_wallet_value = normalized_wallet_value
+        self.max_price_staleness_days = max_price_staleness_days
+        self.dates: List[str] = []
+        self.assets_held: List[Tuple[int, str, float]] = []
+        self.price_dict: Dict[Tuple[str, int], float] = {}
+        self.initial_price_data: List[Tuple[str, int, float]] = []
+        self.quantity_dict: Dict[Tuple[str, int], float] = {}
+        self.cashflows_dict: Dict[str, float] = {}
+        self.valuations: List[float] = []
+        self.twrr_cumulated: List[float] = []
+        self.twrr: List[float] = []
+        # Matrices dates x assets des prix reportés et du jour de leur cotation, qui amorcent le recalcul d'une fin de série
+        self._asset_ids: List[int] = []
+        self._prices = np.empty((0, 0))
+        self._price_ordinals = np.empty((0, 0), dtype=np.int64)
+        self._data_version: int = None
+        self._last_ids: Dict[str, int] = {}
+        self._write_markers: Dict[str, str] = {}
+        self.load()
+
+    def _evaluation_window(self) -> Tuple[str, str]:
+        start_date = self.start_date if self.start_date is not None else self.db_manager.get_first_date()
+        end_date = self.end_date if self.end_date is not None else datetime.now().strftime('%Y-%m-%d')
+        return start_date, end_date
+
+    def _load_dates(self) -> None:
+        self.dates = [row[0] for row in self.db_manager.get_dates(*self._evaluation_window())]
+
+    def _load_quantities_and_cashflows(self, start_index: int) -> None:
+        """Reloads the assets held, quantities and cashflows from dates[start_index] to the end of the window."""
+        self.assets_held = self.db_manager.get_assets_held_between_dates(self.dates[0], self.dates[-1])
+        quantities_data = self.db_manager.get_all_assets_quantities_between_dates(self.dates[start_index], self.dates[-1])
+        self.quantity_dict.update({(row[0], row[1]): row[2] for row in quantities_data})
+        cashflows_data = self.db_manager.get_all_cashflows_between_dates(self.dates[start_index], self.dates[-1])
+        self.cashflows_dict.update({row[0]: row[1] for row in cashflows_data})
+
+    def _recompute_from(self, start_index: int) -> None:
+        """
+        Recomputes the valuations and the TWRR from dates[start_index] to the end of the window, the prefix being kept.
+        Prices are carried forward from the row before start_index, so only the rows of the suffix are built.
+        """
+        asset_ids = [asset_id for asset_id, _, _ in self.assets_held]
+        if asset_ids != self._asset_ids:
+            # Nouvelle colonne : les matrices sont reconstruites sur toute la fenêtre
+            self._asset_ids = asset_ids
+            start_index = 0
+        dates = self.dates[start_index:]
+        closes = np.array([[self.price_dict.get((date, asset_id), np.nan) for asset_id in asset_ids] for date in dates], dtype=np.float64).reshape(len(dates), len(asset_ids))
+        quantities = np.array([[self.quantity_dict.get((date, asset_id), 0) for asset_id in asset_ids] for date in dates], dtype=np.float64).reshape(len(dates), len(asset_ids))
+        if start_index == 0:
+            initial_prices = {asset_id: (date, close) for date, asset_id, close in self.initial_price_data}
+            seed_prices = np.array([initial_prices.get(asset_id, (None, np.nan))[1] for asset_id in asset_ids], dtype=np.float64)
+            seed_ordinals = dates_to_ordinals([initial_prices.get(asset_id, ("1970-01-01", None))[0] for asset_id in asset_ids])
+        else:
+            seed_prices, seed_ordinals = self._prices[start_index - 1], self._price_ordinals[start_index - 1]
+        ordinals = dates_to_ordinals(dates)
+        prices, price_ordinals = carry_forward(closes, seed_prices, seed_ordinals, ordinals)
+        self._prices = np.concatenate([self._prices[:start_index], prices]) if start_index else prices
+        self._price_ordinals = np.concatenate([self._price_ordinals[:start_index], price_ordinals]) if start_index else price_ordinals
+
+        if self.max_price_staleness_days is not None:
+            prices = np.where(ordinals[:, None] - price_ordinals > self.max_price_staleness_days, np.nan, prices)
+        # Un asset sans prix connu (ou trop ancien) est valorisé à 0
+        valuations = np.where(np.isnan(prices), 0, prices * quantities).sum(axis=1)
+        del self.valuations[start_index:]
+        self.valuations.extend(round(valuation, ROUNDING_VALUE) for valuation in valuations.tolist())
+        _extend_TWRR(self.twrr_cumulated, self.twrr, self.dates, self.valuations, self.cashflows_dict, start_index, self.normalized_wallet_value)
+
+    def load(self) -> None:
+        """
+        (Re)loads everything from the database.
+        """
+        self._data_version = self.db_manager.get_data_version()
+        self._last_ids = self.db_manager.get_last_inserted_ids()
+        self._write_markers = self.db_manager.get_write_markers(self._last_ids["Orders"])
+        self.price_dict = {}
+        self.quantity_dict = {}
+        self.cashflows_dict = {}
+        self._asset_ids = []
+        self._load_dates()
+        if not self.dates:
+            self.assets_held, self.valuations, self.twrr_cumulated, self.twrr = [], [], [], []
+            return
+        price_data = self.db_manager.get_all_assets_prices_between_dates(self.dates[0], self.dates[-1])
+        self.price_dict = {(row[0], row[1]): row[2] for row in price_data}
+        self.initial_price_data = self.db_manager.get_all_assets_last_prices_before_date(self.dates[0])
+        self._load_quantities_and_cashflows(0)
+        self._recompute_from(0)
+
+    def refresh(self) -> bool:
+        """
+        Updates the in-memory data with what has been written in the database since the last call.
+        Only the series from the earliest affected date onwards are recomputed.
+
+        Returns:
+            bool: True if something changed.
+        """
+        data_version = self.db_manager.get_data_version()
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+
+        last_ids = self.db_manager.get_last_inserted_ids()
+        if any(last_ids[table] < self._last_ids[table] for table in last_ids) \
+                or self.db_manager.get_write_markers(self._last_ids["Orders"]) != self._write_markers:
+            # Des lignes ont été supprimées ou modifiées, ou bien un split, un dividende ou une année archivée a été écrit :
+            # seuls les ajouts se suivent par id, on repart donc de zéro
+            self.load()
+            return True
+        if last_ids == self._last_ids:
+            return False
+
+        new_prices = self.db_manager.get_prices_inserted_after(self._last_ids["Prices"])
+        new_orders = self.db_manager.get_orders_inserted_after(self._last_ids["Orders"])
+        previous_dates = self.dates
+        self._load_dates()
+        if not previous_dates or not self.dates or self.dates[0] != previous_dates[0]:
+            # Le début de la fenêtre a bougé (ex: ordre plus ancien que le premier) : on repart de zéro
+            self.load()
+            return True
+        self._last_ids = last_ids
+        self._write_markers = self.db_manager.get_write_markers(last_ids["Orders"])
+
+        # Index de la première date qui a changé
+        for date_id, (previous_date, date) in enumerate(zip(previous_dates, self.dates)):
+            if previous_date != date:
+                start_index = date_id
+                break
+        else:
+            start_index = min(len(previous_dates), len(self.dates))
+        for date, asset_id, close in new_prices:
+            self.price_dict[(date, asset_id)] = close
+        if new_prices:
+            start_index = min(start_index, bisect_left(self.dates, new_prices[0][0]))
+        if new_orders:
+            start_index = min(start_index, bisect_left(self.dates, new_orders[0][0]))
+
+        if start_index < len(self.dates):
+            if new_orders or self.dates[start_index:] != previous_dates[start_index:]:
+                self._load_quantities_and_cashflows(start_index)
+            self._recompute_from(start_index)
+        return True
+
+    def _slice(self, start_date: str=None, end_date: str=None) -> slice:
+        start = 0 if start_date is None else bisect_left(self.dates, start_date)
+        end = len(self.dates) if end_date is None else bisect_right(self.dates, end_date)
+        return slice(start, end)
+
+    def get_valuation(self, start_date: str=None, end_date: str=None) -> Dict[str, List]:
+        """
+        Returns the valuation series between two dates (the whole window by default).
+        """
+        window = self._slice(start_date, end_date)
+        return {"dates": self.dates[window], "valuations": self.valuations[window]}
+
+    def get_TWRR(self, start_date: str=None, end_date: str=None) -> Dict[str, List]:
+        """
+        Returns the cumulative and sub-period TWRR series between two dates (the whole window by default).
+        """
+        window = self._slice(start_date, end_date)
+        return {"dates": self.dates[window], "twrr_cumulated": _rounded(self.twrr_cumulated[window]), "twrr": _rounded(self.twrr[window])}
+
+    def get_positions(self, date: str=None) -> Dict:
+        """
+        Returns the quantity held for each asset at the given date, or at the last known date before it.
+        """
+        if not self.dates:
+            return {"date": None, "positions": []}
+        date_id = len(self.dates) - 1 if date is None else bisect_right(self.dates, date) - 1
+        if date_id < 0:
+            raise ValueError(f"No data before {date}.")
+        position_date = self.dates[date_id]
+        positions = [{"asset_id": asset_id,
+                      "short_name": short_name,
+                      "quantity": self.quantity_dict.get((position_date, asset_id), 0)}
+                     for asset_id, short_name, _ in self.assets_held]
+        return {"date": position_date, "positions": positions}
+
+
+ROUTES = {
+    "/valuation": WarmWallet.get_valuation,
+    "/twrr": WarmWallet.get_TWRR,
+    "/positions": WarmWallet.get_positions,
+}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    warm_wallet: WarmWallet = None
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send_json(404, {"error": f"Unknown route {url.path}, expected one of {sorted(ROUTES)}"})
+            return
+        try:
+            self.warm_wallet.refresh()
+            body = route(self.warm_wallet, **params)
+        except (TypeError, ValueError) as error:
+            self._send_json(400, {"error": str(error)})
+            return
+        self._send_json(200, body)
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Les sockets Unix n'ont pas d'adresse client
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class _UnixHTTPServer(socketserver.UnixStreamServer):
+    pass
+
+
+def create_server(db_path: Path=HISTORIES_DIR_PATH/"data_base.db", host: str=DEFAULT_HOST, port: int=DEFAULT_PORT, unix_socket: Path=None, start_date: str=None, end_date: str=None) -> socketserver.BaseServer:
+    """
+    Creates the valuation server. The database is opened in the calling thread,
+    so serve_forever() must be called from the same thread.
+
+    Args:
+        db_path (Path): Path of the database to serve.
+        host (str): Host to listen on, when unix_socket is None.
+        port (int): Port to listen on, when unix_socket is None.
+        unix_socket (Path, optional): Path of the Unix socket to listen on instead of TCP.
+        start_date (str, optional): First evaluation date ('YYYY-MM-DD').
+        end_date (str, optional): Last evaluation date ('YYYY-MM-DD').
+
+    Returns:
+        socketserver.BaseServer: The server, ready to serve_forever().
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {
+        "warm_wallet": WarmWallet(DatabaseManager(db_path), start_date, end_date)
+    })
+    if unix_socket is not None:
+        Path(unix_socket).unlink(missing_ok=True)
+        return _UnixHTTPServer(str(unix_socket), handler)
+    return HTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve wallet valuation, TWRR and positions from a warm in-memory state.")
+    parser.add_argument("--db", type=Path, default=HISTORIES_DIR_PATH/"data_base.db", help="Path of the SQLite database.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", type=Path, default=None, help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--start-date", default=None)
+    parser.add_argument("--end-date", default=None)
+    args = parser.parse_args()
+
+    server = create_server(args.db, args.host, args.port, args.unix, args.start_date, args.end_date)
+    print(f"Serving valuation queries on {args.unix or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+
+    main()
@@ -1,8 +1,15 @@
 from datetime import datetime
 from pathlib import Path
 from time import sleep
-from typing import Dict, List, Tuple
-from yfinance_interface import ASSETS_JSON_FILENAME, HISTORIES_DIR_PATH, HISTORY_FILENAME_SUFIX, DatabaseManager, Asset, Order, load_assets_json_file
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+import numpy as np
+from .downsampling import ohlc_rollup
+from .fixed_point import exact_valuations, price_scale, to_fixed
+from .price_matrix import DEFAULT_MAX_PRICE_STALENESS_DAYS, as_of_price_matrix, build_matrix, forward_fill_prices
+from .yfinance_interface import ASSETS_JSON_FILENAME, HISTORIES_DIR_PATH, HISTORY_FILENAME_SUFIX, DatabaseManager, Asset, Order, load_assets_json_file
+
+if TYPE_CHECKING:
+    from .returns import TWRRIndex
 # import numpy_financial as npf
 # import QuantLib as ql
 
@@ -34,17 +41,25 @@ def _calculate_TWRR_for_sub_period(previous_wallet_value: float, current_wallet_
     if previous_wallet_value + cash_flow == 0:
         print("ERREUR: Division par zero car previous_wallet_value + cash_flow = 0")
         return 1
-    return round((current_wallet_value - (previous_wallet_value + cash_flow)) / (previous_wallet_value + cash_flow), ROUNDING_VALUE)
+    return (current_wallet_value - (previous_wallet_value + cash_flow)) / (previous_wallet_value + cash_flow)
 
 
 def _calculate_current_share_value(current_wallet_value: float, cash_flow: float, previous_wallet_value: float, previous_share_value: float) -> float:  # OK !
-    return round((current_wallet_value - cash_flow) / previous_wallet_value * previous_share_value, ROUNDING_VALUE)
+    return (current_wallet_value - cash_flow) / previous_wallet_value * previous_share_value
 
 
 def _current_share_value_2(current_wallet_value: float, cash_flow: float, nb_share: float, current_share_value: float) -> Tuple[float, float]:  # OK !
     if cash_flow != 0:
         nb_share = current_wallet_value / current_share_value
-    return round(current_wallet_value / nb_share, ROUNDING_VALUE), round(nb_share, ROUNDING_VALUE)
+    return current_wallet_value / nb_share, nb_share
+
+
+def _rounded(values: Iterable[float]) -> List[float]:
+    """
+    Rounds a series when it is returned: the series are chained without rounding, so that the exact
+    valuations of the fixed-point mode are not degraded step after step.
+    """
+    return [round(value, ROUNDING_VALUE) for value in values]
 
 
 def _check_dates_boundaries(start: datetime, end: datetime, lower_bound: datetime, upper_bound: datetime) -> Tuple[datetime, datetime]:
@@ -58,14 +73,108 @@ def _check_dates_boundaries(start: datetime, end: datetime, lower_bound: datetim
     return start, end
 
 
+def _calculate_valuations(dates: List[str], assets_held: List[Tuple[int, str, float]], price_data: Iterable[Tuple[str, int, float]], quantities_data: Iterable[Tuple[str, int, float]], initial_price_data: Iterable[Tuple[str, int, float]]=(), max_price_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS) -> List[float]:
+    """
+    Calculates the total valuation of the held assets for each date.
+    The last known close of each asset is carried forward onto the dates where its exchange was closed
+    (up to max_price_staleness_days), instead of valuing it at 0.
+
+    Args:
+        dates (List[str]): The dates to valuate, in 'YYYY-MM-DD' format.
+        assets_held (List[Tuple[int, str, float]]): The assets held, as returned by DatabaseManager.get_assets_held_between_dates().
+        price_data (Iterable[Tuple[str, int, float]]): The close prices, as [(date, asset_id, close)].
+        quantities_data (Iterable[Tuple[str, int, float]]): The quantities held, as [(date, asset_id, quantity)].
+        initial_price_data (Iterable[Tuple[str, int, float]], optional): The last close of each asset before dates[0], as [(date, asset_id, close)].
+        max_price_staleness_days (int, optional): Maximal age in days of a carried forward price, None for no limit.
+
+    Returns:
+        List[float]: A list of valuations corresponding to each date.
+    """
+    asset_ids = [asset_id for asset_id, _, _ in assets_held]
+    prices = as_of_price_matrix(dates, asset_ids, price_data, initial_price_data, max_price_staleness_days)
+    quantities = build_matrix(dates, asset_ids, quantities_data, fill_value=0)
+    # Un asset sans prix connu (ou trop ancien) est valorisé à 0
+    valuations = np.where(np.isnan(prices), 0, prices * quantities).sum(axis=1)
+    return _rounded(valuations.tolist())
+
+
+def _calculate_exact_valuations(db_manager: DatabaseManager, dates: List[str], assets_held: List[Tuple[int, str, float]], max_price_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS) -> List[float]:
+    """
+    Fixed-point variant of _calculate_valuations(): prices and quantities are read in storage units (scaled integers),
+    summed with int64 arithmetic and converted to float once per date, so no intermediate rounding is needed.
+
+    Args:
+        db_manager (DatabaseManager): The manager of a database in fixed-point mode.
+        dates (List[str]): The dates to valuate, in 'YYYY-MM-DD' format.
+        assets_held (List[Tuple[int, str, float]]): The assets held, as returned by DatabaseManager.get_assets_held_between_dates().
+        max_price_staleness_days (int, optional): Maximal age in days of a carried forward price, None for no limit.
+
+    Returns:
+        List[float]: A list of valuations corresponding to each date, None if no price is known.
+    """
+    session_dates, asset_ids, closes = db_manager.get_all_assets_prices_arrays(dates[0], dates[-1], stored_units=True)
+    _, _, quantities = db_manager.get_all_assets_quantities_arrays(dates[0], dates[-1], stored_units=True)
+    columns = np.searchsorted(asset_ids, [asset_id for asset_id, _, _ in assets_held])
+    closes = closes[:, columns]
+    if np.isnan(closes).all():
+        return None
+
+    currencies = {asset_id: currency for asset_id, _, _, currency in db_manager.get_all_assets()}
+    price_scales = np.array([price_scale(currencies[asset_id]) for asset_id in asset_ids[columns].tolist()], dtype=np.int64)
+    initial_prices = {asset_id: (date, close) for date, asset_id, close in db_manager.get_all_assets_last_prices_before_date(dates[0])}
+    initial = [initial_prices.get(asset_id, (None, None)) for asset_id in asset_ids[columns].tolist()]
+    prices = forward_fill_prices(closes,
+                                 session_dates,
+                                 max_price_staleness_days,
+                                 initial_prices=np.array([np.nan if close is None else to_fixed(close, scale) for (_, close), scale in zip(initial, price_scales.tolist())], dtype=np.float64),
+                                 initial_dates=[date for date, _ in initial])
+    return _rounded(exact_valuations(quantities[:, columns], prices, price_scales).tolist())
+
+
+def _extend_TWRR(twrr_cumulated: List[float], twrr: List[float], dates: List[str], valuations: List[float], cashflows_dict: Dict[str, float], start_index: int, normalized_wallet_value: float=100) -> None:
+    """
+    (Re)calculates in place the TWRR series from start_index to the end of dates.
+    Values before start_index are kept, so that only the affected part of the series is recomputed.
+    The values are not rounded, the caller rounds them with _rounded() when it returns them.
+
+    Args:
+        twrr_cumulated (List[float]): The cumulative TWRR series to update.
+        twrr (List[float]): The sub-period TWRR series to update.
+        dates (List[str]): The dates of the series, in 'YYYY-MM-DD' format.
+        valuations (List[float]): The wallet valuations corresponding to each date.
+        cashflows_dict (Dict[str, float]): The cashflows, as {date: cashflow}.
+        start_index (int): Index of the first date to recompute.
+        normalized_wallet_value (float, optional): The initial normalized value of the wallet. Defaults to 100.
+
+    Returns:
+        None
+    """
+    del twrr_cumulated[start_index:]
+    del twrr[start_index:]
+    for date_id in range(start_index, len(dates)):
+        twrr.append(_calculate_TWRR_for_sub_period(
+            previous_wallet_value=valuations[date_id - 1] if date_id > 0 else 0,
+            current_wallet_value=valuations[date_id],
+            cash_flow=cashflows_dict.get(dates[date_id])
+            )
+        )
+        previous_twrr_cumulated = twrr_cumulated[-1] if date_id > 0 else normalized_wallet_value
+        twrr_cumulated.append(previous_twrr_cumulated * (1 + twrr[-1]))
+
+
 class Wallet:
-    def __init__(self, currency: str="EUR") -> None:
+    def __init__(self, currency: str="EUR", db_manager: DatabaseManager=None, max_price_staleness_days: int=DEFAULT_MAX_PRICE_STALENESS_DAYS, read_cache_size: int=0) -> None:
         self.currency = currency
-        self.db_manager = DatabaseManager()
+        self.max_price_staleness_days = max_price_staleness_days
+        # read_cache_size n'est utilisé que si la base est ouverte ici (voir DatabaseManager)
+        self.db_manager = DatabaseManager(read_cache_size=read_cache_size) if db_manager is None else db_manager
         self.assets: List[Asset] = []
         self.evaluation_dates: Tuple[str, str] = ()
         self.dates: List[str] = []
         self.valuations = []
+        self.valuation_rollups: Dict[str, List[Tuple[str, float, float, float, float]]] = {}
+        self.twrr_index: "TWRRIndex" = None
+        self.cashflows_dict: Dict[str, float] = None
 
     def _set_dates(self) -> None:
         self.dates = [row[0] for row in self.db_manager.get_dates(self.evaluation_dates[0], self.evaluation_dates[1])]
@@ -92,6 +201,8 @@ class Wallet:
 
         self.evaluation_dates = (_start_date.strftime('%Y-%m-%d'), _end_date.strftime('%Y-%m-%d'))
         self._set_dates()
+        self.twrr_index = None
+        self.cashflows_dict = None
 
     def add_assets(self, list_of_assets: List[Asset]) -> None:
         for asset in list_of_assets:
@@ -100,6 +211,7 @@ class Wallet:
                 self.assets.append(asset)
             if asset.orders != None :
                 asset.add_orders(self.db_manager, asset.orders)
+                self.cashflows_dict = None
 
 
     def remove_asset(self, ticker: str) -> None:
@@ -152,6 +264,18 @@ class Wallet:
             print(f"ERROR: No assets held between {dates[0]} and {dates[1]}.")
             return [], []
 
+        if self.db_manager.fixed_point:
+            valuations = _calculate_exact_valuations(self.db_manager, dates, assets_held, self.max_price_staleness_days)
+            if valuations is None:
+                print("ERROR: No price data found for the specified date range.")
+                return [], []
+            self.dates = dates
+            self.valuations = valuations
+            self.valuation_rollups = {}
+            self.twrr_index = None
+            self.cashflows_dict = None
+            return self.valuations
+
         price_data = self.db_manager.get_all_assets_prices_between_dates(dates[0], dates[-1])
         if not price_data:
             print("ERROR: No price data found for the specified date range.")
@@ -160,22 +284,77 @@ class Wallet:
         # Retrieve all quantities in a single query
         quantities_data = self.db_manager.get_all_assets_quantities_between_dates(dates[0], dates[-1])
 
-        # Convert price_data to a dictionary for quick access
-        price_dict = {(row[0], row[1]): row[2] for row in price_data}
-        quantity_dict = {(row[0], row[1]): row[2] for row in quantities_data}
+        # Last known prices before the period, carried forward until the first quotation of each asset
+        initial_price_data = self.db_manager.get_all_assets_last_prices_before_date(dates[0])
 
-        # Initialiser les listes pour les valorisations et les investissements
-        valuations: List[float]= []
-        # Boucler sur chaque date de la période
-        for date in dates:
-            total_valuation = sum(
-                price_dict.get((date, asset_id), 0) * quantity_dict.get((date, asset_id), 0) for asset_id, _, _ in assets_held
-            )
-            # Ajouter la valorisation et l'investissement total pour cette date
-            valuations.append(round(total_valuation, ROUNDING_VALUE))
-        self.valuations = valuations
+        self.dates = dates
+        self.valuations = _calculate_valuations(dates, assets_held, price_data, quantities_data, initial_price_data, self.max_price_staleness_days)
+        self.valuation_rollups = {}
+        self.twrr_index = None
+        self.cashflows_dict = None
         return self.valuations
 
+    def get_valuation_rollups(self, period: str) -> List[Tuple[str, float, float, float, float]]:
+        """
+        Returns the weekly, monthly or yearly OHLC rollups of the wallet valuation.
+        They are computed once per valuation and kept alongside it.
+
+        Args:
+            period (str): 'W' (week), 'M' (month) or 'Y' (year).
+
+        Returns:
+            List[Tuple[str, float, float, float, float]]: A list such as [(period_start, open, high, low, close)].
+        """
+        if not self.valuations:
+            self.calculate_wallet_valuation()
+        if period not in self.valuation_rollups:
+            self.valuation_rollups[period] = ohlc_rollup(self.dates, self.valuations, period)
+        return self.valuation_rollups[period]
+
+    def get_TWRR_index(self) -> "TWRRIndex":
+        """
+        Returns the prefix sums of the log sub-period returns of the evaluation window.
+        They are computed once per valuation and kept alongside it.
+        """
+        # Import local : returns.py importe ROUNDING_VALUE depuis ce module
+        from .returns import TWRRIndex
+        if not self.valuations:
+            self.calculate_wallet_valuation()
+        if self.twrr_index is None:
+            cashflows_dict = self._get_cashflows_dict()
+            cashflows = np.array([cashflows_dict.get(date, 0) for date in self.dates], dtype=np.float64)
+            self.twrr_index = TWRRIndex(self.dates, np.array(self.valuations, dtype=np.float64), cashflows)
+        return self.twrr_index
+
+    def _get_cashflows_dict(self) -> Dict[str, float]:
+        """
+        Returns the cashflows of the evaluation window as {date: cashflow}.
+        They are read once per valuation and kept alongside it.
+        """
+        if self.cashflows_dict is None:
+            self.cashflows_dict = dict(self.db_manager.get_all_cashflows_between_dates(self.dates[0], self.dates[-1]))
+        return self.cashflows_dict
+
+    def calculate_wallet_TWRR_between(self, start_date: str, end_date: str) -> float:
+        """
+        Calculates the TWRR between two dates of the evaluation window in constant time,
+        without calling set_evaluation_dates() again. The sub-periods after the last date <= start_date are chained.
+
+        Args:
+            start_date (str): The start date in 'YYYY-MM-DD' format.
+            end_date (str): The end date in 'YYYY-MM-DD' format.
+
+        Returns:
+            float: The TWRR of the window (0.05 for +5 %).
+        """
+        return self.get_TWRR_index().between(start_date, end_date)
+
+    def calculate_wallet_TWRR_windows(self, start_dates: List[str], end_dates: List[str]) -> np.ndarray:
+        """
+        Vectorized calculate_wallet_TWRR_between() for many (start, end) windows in one call.
+        """
+        return self.get_TWRR_index().windows(start_dates, end_dates)
+
     def calculate_wallet_share_value(self, init_share_value: float=100) -> List[float]:    # OK !
         """
         Calculates the share value of the wallet based on its valuations and cash flows.
@@ -191,12 +370,8 @@ class Wallet:
         if not self.valuations:
             self.calculate_wallet_valuation()
 
-        dates = [row[0] for row in self.db_manager.get_dates(self.evaluation_dates[0], self.evaluation_dates[1])]
-
-        # Retrieve all cashflows
-        cashflows_data = self.db_manager.get_all_cashflows_between_dates(dates[0], dates[-1])
-        # Convert cashflows_data to a dictionary for quick access
-        cashflows_dict = {row[0]: row[1] for row in cashflows_data}
+        dates = self.dates
+        cashflows_dict = self._get_cashflows_dict()
 
         share_value: List[float] = [_calculate_current_share_value(
             current_wallet_value=self.valuations[0],
@@ -215,7 +390,7 @@ class Wallet:
             )
             for date_id, date in enumerate(dates[1:], 1)
         )
-        return share_value
+        return _rounded(share_value)
 
     def get_wallet_share_value_2(self, init_nb_share: float=1) -> Tuple[List[float], List[float]]:    # OK !
         """
@@ -234,12 +409,8 @@ class Wallet:
         if not self.valuations:
             self.calculate_wallet_valuation()
 
-        dates = [row[0] for row in self.db_manager.get_dates(self.evaluation_dates[0], self.evaluation_dates[1])]
-
-        # Retrieve all cashflows
-        cashflows_data = self.db_manager.get_all_cashflows_between_dates(dates[0], dates[-1])
-        # Convert cashflows_data to a dictionary for quick access
-        cashflows_dict = {row[0]: row[1] for row in cashflows_data}
+        dates = self.dates
+        cashflows_dict = self._get_cashflows_dict()
 
         share_value_2: List[float] = [self.valuations[0] / init_nb_share]
         share_number_2: List[float] = [init_nb_share]
@@ -253,7 +424,7 @@ class Wallet:
                 )
             share_value_2.append(current_share_value)
             share_number_2.append(nb_part)
-        return share_value_2, share_number_2
+        return _rounded(share_value_2), _rounded(share_number_2)
 
     def calculate_wallet_TWRR(self, normalized_wallet_value: float=100) -> Tuple[List[float], List[float]]:
         """
@@ -271,32 +442,13 @@ class Wallet:
         if not self.valuations:
             self.calculate_wallet_valuation()
 
-        dates = [row[0] for row in self.db_manager.get_dates(self.evaluation_dates[0], self.evaluation_dates[1])]
-
-        # Retrieve all cashflows
-        cashflows_data = self.db_manager.get_all_cashflows_between_dates(dates[0], dates[-1])
-        # Convert cashflows_data and valuations to a dictionary for quick access
-        cashflows_dict = {row[0]: row[1] for row in cashflows_data}
-        valuation_dict = dict(zip(dates, self.valuations))
-
-        twrr: List[float] = [_calculate_TWRR_for_sub_period(
-            previous_wallet_value=0,
-            current_wallet_value=self.valuations[0],
-            cash_flow=cashflows_dict.get(dates[0])
-            )
-        ]
-        twrr_cumulated: List[float] = [round(normalized_wallet_value * (1 + twrr[-1]), ROUNDING_VALUE)]
+        dates = self.dates
+        cashflows_dict = self._get_cashflows_dict()
 
-        for date_id, date in enumerate(dates[1:], 1):
-            twrr.append(_calculate_TWRR_for_sub_period(
-                previous_wallet_value=valuation_dict.get(dates[date_id-1]),
-                current_wallet_value=valuation_dict.get(date),
-                cash_flow=cashflows_dict.get(date)
-                )
-            )
-            twrr_cumulated.append(round(twrr_cumulated[-1] * (1 + twrr[-1]), ROUNDING_VALUE))
-
-        return twrr_cumulated, twrr
+        twrr_cumulated: List[float] = []
+        twrr: List[float] = []
+        _extend_TWRR(twrr_cumulated, twrr, dates, self.valuations, cashflows_dict, 0, normalized_wallet_value)
+        return _rounded(twrr_cumulated), _rounded(twrr)
 
     # def get_wallet_MWRR(self) -> List:  # TODO : impementer cette fonction
     #     """Calculates the money weighted rates of return"""
@@ -320,6 +472,10 @@ class Wallet:
 
 
 def main():
+    """
+    Downloads the histories of the assets of assets_test.json and prints the wallet metrics.
+    The module uses relative imports, so it is run from the package: python -m portfolio_tracking.wallet_data
+    """
     today = datetime.now()
     today_date = today.strftime("%Y-%m-%d")
     end_date = today_date
@@ -0,0 +1,155 @@
+"""
+Binary snapshot of the complete state of a Wallet: currency, assets and their orders, evaluation window,
+dates, valuations, cashflows and valuation rollups.
+
+The file starts with a fixed header (magic, format version, length of the JSON metadata), followed by the JSON
+metadata and by array sections, each aligned on 8 bytes. Loading reads the file once and maps every section with
+np.frombuffer, without copy, so that an analytics process can cold-start without querying the database again:
+the TWRR, the share values and the TWRRIndex of the restored wallet are computed from its valuations and cashflows.
+"""
+import json
+from pathlib import Path
+import struct
+from typing import Dict, Tuple
+import numpy as np
+from .wallet_data import Wallet
+from .yfinance_interface import Asset, DatabaseManager, Order
+
+
+SNAPSHOT_MAGIC = b"PTWALLET"
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct("<8sHI")     # magic, version, longueur des métadonnées JSON
+_ALIGNMENT = 8
+
+
+def _day_numbers(dates) -> np.ndarray:
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _dates(day_numbers: np.ndarray):
+    return day_numbers.astype("datetime64[D]").astype(str).tolist()
+
+
+def _wallet_sections(wallet: Wallet) -> Dict[str, np.ndarray]:
+    orders = [(asset_index, order) for asset_index, asset in enumerate(wallet.assets) for order in asset.orders]
+    cashflows_dict = wallet._get_cashflows_dict() if wallet.valuations else {}
+    sections = {
+        "dates": _day_numbers(wallet.dates),
+        "valuations": np.array(wallet.valuations, dtype=np.float64),
+        "cashflows": np.array([cashflows_dict.get(date, 0) for date in wallet.dates], dtype=np.float64),
+        "order_assets": np.array([asset_index for asset_index, _ in orders], dtype=np.int32),
+        "order_dates": _day_numbers([order.date for _, order in orders]),
+        "order_quantities": np.array([order.quantity for _, order in orders], dtype=np.float64),
+        "order_prices": np.array([order.price for _, order in orders], dtype=np.float64),
+    }
+    for period, rollups in wallet.valuation_rollups.items():
+        sections[f"rollup_{period}_starts"] = _day_numbers([rollup[0] for rollup in rollups])
+        sections[f"rollup_{period}_ohlc"] = np.array([rollup[1:] for rollup in rollups], dtype=np.float64).reshape(len(rollups), 4)
+    return sections
+
+
+def save_wallet_snapshot(wallet: Wallet, path: Path) -> Path:
+    """
+    Writes the state of a wallet to a binary snapshot file.
+
+    Args:
+        wallet (Wallet): The wallet to save.
+        path (Path): The snapshot file.
+
+    Returns:
+        Path: The path of the written file.
+    """
+    path = Path(path)
+    metadata = {
+        "currency": wallet.currency,
+        "max_price_staleness_days": wallet.max_price_staleness_days,
+        "evaluation_dates": list(wallet.evaluation_dates),
+        "db_path": str(wallet.db_manager.db_path),
+        "assets": [{"short_name": asset.short_name, "name": asset.name, "ticker": asset.ticker, "broker": asset.broker, "currency": asset.currency}
+                   for asset in wallet.assets],
+        "rollup_periods": list(wallet.valuation_rollups),
+        "sections": {},
+    }
+    offset = 0
+    sections = []
+    for name, array in _wallet_sections(wallet).items():
+        array = np.ascontiguousarray(array)
+        padding = -offset % _ALIGNMENT
+        offset += padding
+        metadata["sections"][name] = [array.dtype.str, list(array.shape), offset]
+        sections.append((padding, array))
+        offset += array.nbytes
+
+    encoded_metadata = json.dumps(metadata).encode("utf-8")
+    Path.mkdir(path.parent, parents=True, exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(encoded_metadata)))
+        file.write(encoded_metadata)
+        file.write(b"\0" * (-(_HEADER.size + len(encoded_metadata)) % _ALIGNMENT))
+        for padding, array in sections:
+            file.write(b"\0" * padding)
+            file.write(array.tobytes())
+    return path
+
+
+def read_wallet_snapshot(path: Path) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Reads a snapshot file without building the wallet.
+
+    Returns:
+        Tuple[Dict, Dict[str, np.ndarray]]: The metadata and the array sections (read-only views of the file content).
+    """
+    content = Path(path).read_bytes()
+    if len(content) < _HEADER.size:
+        raise ValueError(f"{path} is not a wallet snapshot.")
+    magic, version, metadata_length = _HEADER.unpack_from(content)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a wallet snapshot.")
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"{path} has been written by a newer version (format {version}, supported up to {SNAPSHOT_VERSION}).")
+    metadata = json.loads(content[_HEADER.size:_HEADER.size + metadata_length].decode("utf-8"))
+    data_start = _HEADER.size + metadata_length
+    data_start += -data_start % _ALIGNMENT
+    sections = {}
+    for name, (dtype, shape, offset) in metadata["sections"].items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        sections[name] = np.frombuffer(content, dtype=dtype, count=count, offset=data_start + offset).reshape(shape)
+    return metadata, sections
+
+
+def load_wallet_snapshot(path: Path, db_manager: DatabaseManager=None) -> Wallet:
+    """
+    Rebuilds a wallet from a snapshot file, without querying the database.
+
+    Args:
+        path (Path): The snapshot file.
+        db_manager (DatabaseManager, optional): The manager given to the wallet. Defaults to one opened on the database
+            the wallet was using when it was saved.
+
+    Returns:
+        Wallet: The restored wallet.
+    """
+    metadata, sections = read_wallet_snapshot(path)
+    if db_manager is None:
+        db_manager = DatabaseManager(Path(metadata["db_path"]))
+    wallet = Wallet(metadata["currency"], db_manager, metadata["max_price_staleness_days"])
+
+    orders = [[] for _ in metadata["assets"]]
+    for asset_index, date, quantity, price in zip(sections["order_assets"].tolist(),
+                                                  _dates(sections["order_dates"]),
+                                                  sections["order_quantities"].tolist(),
+                                                  sections["order_prices"].tolist()):
+        orders[asset_index].append(Order(date, quantity, price))
+    wallet.assets = [Asset(asset["short_name"], asset["name"], asset["ticker"], asset["broker"], asset["currency"], asset_orders)
+                     for asset, asset_orders in zip(metadata["assets"], orders)]
+
+    wallet.evaluation_dates = tuple(metadata["evaluation_dates"])
+    wallet.dates = _dates(sections["dates"])
+    wallet.valuations = sections["valuations"].tolist()
+    # Format 1 has no cashflows: they are read from the database on first use
+    if "cashflows" in sections and wallet.valuations:
+        wallet.cashflows_dict = dict(zip(wallet.dates, sections["cashflows"].tolist()))
+    wallet.valuation_rollups = {period: [(start, *ohlc) for start, ohlc in zip(_dates(sections[f"rollup_{period}_starts"]), sections[f"rollup_{period}_ohlc"].tolist())]
+                                for period in metadata["rollup_periods"]}
+    return wallet
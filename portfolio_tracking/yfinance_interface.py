@@ -1,29 +1,126 @@
-from collections import defaultdict
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
 import csv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import hashlib
 import json
 from pathlib import Path
 import sqlite3
-from typing import Dict, List, Tuple
-import pandas as pd
-import yfinance as yf
+import threading
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+import numpy as np
+from .columnar_fetch import ColumnarFetch
+from .connection_pool import ConnectionPool, is_read_query
+from .corporate_actions import ACTION_KINDS, AdjustmentFactors
+from .daily_cashflows import create_daily_cashflows
+from .downsampling import PERIODS, ohlc_rollup, period_start
+from .fixed_point import QUANTITY_SCALE, cashflow_scale, from_fixed, price_scale, storage_mode, to_fixed
+from .memory_snapshot import MemorySnapshot
+from .position_index import PositionIndex
+from .price_shards import MAIN_SCHEMA, PriceShards
+from .read_cache import cached_read
+
+if TYPE_CHECKING:
+    # pandas et yfinance sont lourds à importer : ils ne sont chargés qu'au moment
+    # où un téléchargement ou une lecture de CSV a réellement lieu.
+    import pandas as pd
 
 
 HISTORIES_DIR_PATH = Path(__file__).parent.absolute() / "histories"
 ARCHIVES_DIR_NAME = "Archives"
+ARCHIVES_DB_FILENAME = "archives.db"
 ASSETS_JSON_FILENAME = "assets_real.json"
 HISTORY_FILENAME_SUFIX = 'history.csv'
+MAX_SESSION_GAP_DAYS = 14     # Plus long intervalle attendu entre deux séances de la table Dates
 COLUMNS_ORDER = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
 DICT_CURRENCY = {"EURUSD": "EURUSD=X",
                  "EURGBP": "EURGBP=X"}
 
-class DatabaseManager:
-    def __init__(self, db_path: Path=HISTORIES_DIR_PATH/"data_base.db"):
+class DatabaseManager(ColumnarFetch):
+    def __init__(self, db_path: Path=HISTORIES_DIR_PATH/"data_base.db", read_cache_size: int=0, thread_safe: bool=False, snapshot: bool=False, fixed_point: bool=None):
+        """
+        Args:
+            db_path (Path): Chemin de la base SQLite.
+            read_cache_size (int): Nombre maximal de résultats de lecture gardés en cache (LRU), 0 pour désactiver le cache.
+            thread_safe (bool): Si True, le manager peut être partagé entre threads : chaque thread lit avec sa propre
+                connexion en lecture seule et les écritures passent par une seule connexion, en mode WAL.
+            snapshot (bool): Si True, la base est copiée en mémoire (API de backup de SQLite) et toutes les requêtes
+                portent sur cette copie, rafraîchie par refresh_snapshot() et réécrite dans le fichier par write_back_snapshot().
+            fixed_point (bool): Si True, une nouvelle base stocke les prix, quantités et flux en entiers mis à l'échelle
+                (voir fixed_point.py). Le mode est fixé à la création de la base : None reprend celui de la base existante.
+        """
+        if thread_safe and snapshot:
+            raise ValueError("The thread_safe and snapshot modes cannot be combined.")
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
+        self._pool: ConnectionPool = ConnectionPool(db_path) if thread_safe else None
+        self.conn = self._pool.writer if thread_safe else sqlite3.connect(self.db_path)
+        self.fixed_point = storage_mode(self.conn, self.db_path, fixed_point)
+        self._price_scales: Dict[int, int] = {}
+        self._snapshot: MemorySnapshot = None
+        if snapshot:
+            # Le schéma du fichier est mis à jour, puis le fichier est copié en mémoire
+            self._create_tables()
+            self._snapshot = MemorySnapshot(self.conn, self.db_path)
+            self.conn = self._snapshot.conn
+        # Rend atomiques une écriture et la mise à jour des index en mémoire qui en dépendent
+        self._write_lock = self._pool.write_lock if thread_safe else threading.RLock()
+        self.read_cache_size = read_cache_size
+        self.read_cache_hits = 0
+        self._read_cache: OrderedDict = OrderedDict()
+        self._read_cache_lock = threading.Lock()
+        self._read_cache_state: Tuple[int, int] = None
+        self._writes = 0
         self._create_tables()
+        self._position_index: PositionIndex = None
+        self._adjustment_factors: AdjustmentFactors = None
+        self._indexes_version: int = None
+        # Les index sont reconstruits sous leur propre verrou : une lecture n'attend pas les écritures en cours
+        self._indexes_lock = threading.RLock()
+        if snapshot:
+            self.refresh_snapshot(full=True)
+        self._shards = PriceShards(self.conn, db_path, [year for (year,) in self.conn.execute("SELECT year FROM PriceShards")])
+        if self._shards and thread_safe:
+            raise ValueError(f"{db_path} has archived years, it cannot be opened in thread_safe mode.")
+
+    def refresh_snapshot(self, full: bool=False) -> bool:
+        """
+        Brings the in-memory snapshot up to date with the database file, if the file has been written since the last refresh.
+        The rows appended to the tables with increasing ids are copied incrementally (INSERT OR REPLACE),
+        the small tables are copied entirely. full=True copies the whole file again with the backup API,
+        which is needed to see rows deleted from the file.
+        Unsaved writes made to the snapshot can be overwritten.
+
+        Args:
+            full (bool): Si True, recopie tout le fichier.
+        Returns:
+            bool: True si la copie en mémoire a été modifiée.
+        """
+        if self._snapshot is None:
+            raise ValueError("This DatabaseManager is not in snapshot mode.")
+        if not self._snapshot.refresh(full):
+            return False
+        # Les index et le cache en mémoire suivent data_version et les écritures du manager, qui ne voient pas la copie par backup
+        with self._indexes_lock:
+            self._position_index = None
+            self._adjustment_factors = None
+        with self._read_cache_lock:
+            self._read_cache.clear()
+            self._read_cache_state = None
+        return True
+
+    def write_back_snapshot(self) -> None:
+        """
+        Writes the in-memory snapshot (including the results written to it) back to the database file with the backup API.
+        Refused if the file has been written by another connection since the last refresh, to not lose these writes.
+        """
+        if self._snapshot is None:
+            raise ValueError("This DatabaseManager is not in snapshot mode.")
+        self._snapshot.write_back()
 
     def _create_tables(self):
+        value_type = "INTEGER" if self.fixed_point else "REAL"
         with self.conn:
             self.conn.execute("""CREATE TABLE IF NOT EXISTS Assets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,12 +131,12 @@ class DatabaseManager:
                 currency TEXT NOT NULL
             );
             """)
-            self.conn.execute("""CREATE TABLE IF NOT EXISTS Orders (
+            self.conn.execute(f"""CREATE TABLE IF NOT EXISTS Orders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 asset_id INTEGER NOT NULL,
                 date TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                price REAL NOT NULL,
+                quantity {value_type} NOT NULL,
+                price {value_type} NOT NULL,
                 FOREIGN KEY(asset_id) REFERENCES Assets(id),
                 UNIQUE(asset_id, date, quantity, price)  -- Contrainte d'unicité de l'ordre
             );
@@ -55,12 +152,12 @@ class DatabaseManager:
             """)
             self.conn.execute("""CREATE INDEX IF NOT EXISTS idx_dates_date ON Dates(date);
                 -- Créer un index sur la colonne "date" pour améliorer les performances des requêtes basées sur des dates specifiques""")
-            self.conn.execute("""CREATE TABLE IF NOT EXISTS Prices (
+            self.conn.execute(f"""CREATE TABLE IF NOT EXISTS Prices (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 asset_id INTEGER NOT NULL,
                 date_id INTEGER NOT NULL,
-                open REAL,
-                close REAL,
+                open {value_type},
+                close {value_type},
                 open_other_currency REAL,
                 close_other_currency REAL,
                 FOREIGN KEY(asset_id) REFERENCES Assets(id),
@@ -68,6 +165,54 @@ class DatabaseManager:
                 UNIQUE(asset_id, date_id)  -- Unicité par actif et date
             );
             """)
+            self.conn.execute(f"""CREATE TABLE IF NOT EXISTS PriceRollups (
+                asset_id INTEGER NOT NULL,
+                period TEXT NOT NULL,  -- 'W' (semaine), 'M' (mois) ou 'Y' (année)
+                period_start TEXT NOT NULL,  -- Premier jour de la période au format 'YYYY-MM-DD'
+                open {value_type},
+                high {value_type},
+                low {value_type},
+                close {value_type},
+                FOREIGN KEY(asset_id) REFERENCES Assets(id),
+                PRIMARY KEY(asset_id, period, period_start)
+            ) WITHOUT ROWID;
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS PriceShards (
+                year INTEGER PRIMARY KEY,  -- Année dont les Dates et Prices sont dans leur propre fichier (voir price_shards.py)
+                writes INTEGER NOT NULL DEFAULT 0  -- Nombre d'écritures dans ce fichier, pour que les autres connexions les voient
+            );
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS Ingestions (
+                asset_id INTEGER PRIMARY KEY,
+                source_name TEXT NOT NULL,  -- Fichier d'historique importé
+                last_date TEXT NOT NULL,  -- Dernière date importée depuis ce fichier
+                FOREIGN KEY(asset_id) REFERENCES Assets(id)
+            );
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS IngestionBlocks (
+                asset_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                checksum TEXT NOT NULL,  -- Empreinte des lignes de cette année importées jusqu'à Ingestions.last_date
+                FOREIGN KEY(asset_id) REFERENCES Assets(id),
+                PRIMARY KEY(asset_id, year)
+            ) WITHOUT ROWID;
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS CorporateActions (
+                asset_id INTEGER NOT NULL,
+                date TEXT NOT NULL,  -- Date d'effet (ex-date) de l'opération
+                kind TEXT NOT NULL CHECK(kind IN ('split', 'dividend')),
+                value REAL NOT NULL,  -- Ratio du split ou dividende par action
+                FOREIGN KEY(asset_id) REFERENCES Assets(id),
+                PRIMARY KEY(asset_id, date, kind)
+            ) WITHOUT ROWID;
+            """)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS CorporateActionsChecks (
+                asset_id INTEGER PRIMARY KEY,
+                last_session TEXT NOT NULL,  -- Dernière séance couverte par le dernier téléchargement des opérations
+                FOREIGN KEY(asset_id) REFERENCES Assets(id)
+            );
+            """)
+            create_daily_cashflows(self.conn, value_type)
             self.conn.execute("""CREATE TABLE IF NOT EXISTS CurrencyRates (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 currency_pair TEXT NOT NULL,
@@ -78,17 +223,129 @@ class DatabaseManager:
             );
             """)
 
+    def _get_price_scale(self, asset_id: int) -> int:
+        """
+        Returns the scale of the stored prices of an asset, 1 in floating-point mode.
+        """
+        if not self.fixed_point:
+            return 1
+        scale = self._price_scales.get(asset_id)
+        if scale is None:
+            row = self.execute_query("SELECT currency FROM Assets WHERE id = ?", (asset_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Asset with id {asset_id} not found")
+            scale = self._price_scales[asset_id] = price_scale(row[0])
+        return scale
+
+    def _get_price_scales(self, asset_ids: np.ndarray) -> np.ndarray:
+        return np.array([self._get_price_scale(asset_id) for asset_id in asset_ids.tolist()], dtype=np.int64)
+
+    @property
+    def _quantity_scale(self) -> int:
+        return QUANTITY_SCALE if self.fixed_point else 1
+
+    def _cashflow_scale(self, currency: str) -> int:
+        return cashflow_scale(currency) if self.fixed_point else 1
+
+    def _to_stored(self, value: float, scale: int):
+        return to_fixed(value, scale) if self.fixed_point else value
+
+    def _from_stored(self, value, scale: int) -> float:
+        return from_fixed(value, scale) if self.fixed_point else value
+
+    def _adjusted_quantity(self, factors: AdjustmentFactors, asset_id: int, date: str, quantity):
+        """
+        Converts a stored quantity traded on a date into today's shares (splits), still in storage units.
+        The factors are fetched once by the caller, not once per order.
+        """
+        quantity *= factors.quantity_factor(asset_id, date)
+        return round(quantity) if self.fixed_point else quantity
+
     def execute_query(self, query: str, params: tuple=()):
-        with self.conn:
-            cursor = self.conn.execute(query, params)
+        is_read = is_read_query(query)
+        if self._pool is not None:
+            if is_read:
+                return self._pool.reader.execute(query, params)
+            with self._pool.write() as conn:
+                cursor = conn.execute(query, params)
+        else:
+            with self.conn:
+                cursor = self.conn.execute(query, params)
+        if not is_read:
+            self._count_write()
         return cursor
 
     def execute_many_query(self, query: str, params: List=[]):  # TODO: v"rifier si ça fonctionne bien !
-        with self.conn:
-            cursor = self.conn.executemany(query, params)
-            self.conn.commit()
+        if self._pool is not None:
+            with self._pool.write() as conn:
+                cursor = conn.executemany(query, params)
+        else:
+            with self.conn:
+                cursor = self.conn.executemany(query, params)
+                self.conn.commit()
+        self._count_write()
         return cursor
 
+    def _count_write(self) -> None:
+        # Compté après le commit : un résultat gardé en cache sous le nouveau compte a forcément été lu après l'écriture
+        with self._read_cache_lock:
+            self._writes += 1
+
+    def _fetch_on_segments(self, query: str, start_date: str, end_date: str, params: Dict=None) -> List[tuple]:
+        """
+        Runs a query on each database holding dates between start_date and end_date (see price_shards.py)
+        and concatenates the rows, segment after segment in date order.
+        The query refers to {schema}.Prices and {schema}.Dates, and to the bounds of the segment as :start_date and :end_date.
+        """
+        return [row for cursor in self._cursors_on_segments(query, start_date, end_date, params) for row in cursor.fetchall()]
+
+    def _cursors_on_segments(self, query: str, start_date: str, end_date: str, params: Dict=None) -> Iterator[sqlite3.Cursor]:
+        # Chaque curseur doit être lu avant de passer au segment suivant, qui peut détacher sa base
+        for schema, segment_start, segment_end in self._shards.segments(start_date, end_date):
+            yield self.execute_query(query.format(schema=schema), dict(params or {}, start_date=segment_start, end_date=segment_end))
+
+    def _split_by_shard(self, rows: List, date_index: int=None) -> Tuple[List, Dict[int, List]]:
+        """
+        Splits rows between the main database and the archived years, according to their date (rows[i][date_index], or rows[i]).
+        """
+        if not self._shards:
+            return rows, {}
+        main_rows, archived_rows = [], {}
+        for row in rows:
+            year = int((row if date_index is None else row[date_index])[:4])
+            if year in self._shards.years:
+                archived_rows.setdefault(year, []).append(row)
+            else:
+                main_rows.append(row)
+        return main_rows, archived_rows
+
+    def archive_year(self, year: int, vacuum: bool=True) -> Path:
+        """
+        Moves the Dates and Prices rows of a closed year into their own database file, compacted (see price_shards.py).
+        Queries then read this year from the file attached read-only, and prices written later for this year
+        (ex: history of a new asset) go directly into it. get_prices_inserted_after() only follows the main database.
+
+        Args:
+            year (int): L'année à archiver, qui doit être terminée.
+            vacuum (bool): Si True, la base principale est compactée après le déplacement.
+        Returns:
+            Path: Le fichier de l'année archivée.
+        """
+        if self._pool is not None or self._snapshot is not None:
+            raise ValueError("Years cannot be archived in the thread_safe or snapshot modes.")
+        path = self._shards.archive(year)
+        self._count_write()
+        if vacuum:
+            self.conn.execute("VACUUM")
+        return path
+
+    def compact_archived_year(self, year: int) -> None:
+        """
+        Rebuilds the file of an archived year (VACUUM), after prices have been written to it.
+        """
+        self._shards.compact(year)
+
+    @cached_read
     def get_dates(self, start_date: str, end_date: str) -> List[Tuple[str]]:
         """
         Args:
@@ -99,14 +356,13 @@ class DatabaseManager:
         """
         query = """
         SELECT DISTINCT d.date
-        FROM Dates d
-        WHERE d.date BETWEEN ? AND ?
+        FROM {schema}.Dates d
+        WHERE d.date BETWEEN :start_date AND :end_date
         ORDER BY d.date ASC
         """
-        # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
-        cursor = self.execute_query(query, (start_date, end_date))
-        return cursor.fetchall()
+        return self._fetch_on_segments(query, start_date, end_date)
 
+    @cached_read
     def get_all_assets_prices_between_dates(self, start_date: str, end_date: str) -> List[Tuple[str, int, float]]:
         """
         Args:
@@ -117,16 +373,43 @@ class DatabaseManager:
         """
         query = """
         SELECT d.date, p.asset_id, p.close
-        FROM Prices p
-        JOIN Dates d ON p.date_id = d.id
+        FROM {schema}.Prices p
+        JOIN {schema}.Dates d ON p.date_id = d.id
         JOIN Assets a ON p.asset_id = a.id
-        WHERE d.date BETWEEN ? AND ?
+        WHERE d.date BETWEEN :start_date AND :end_date
         ORDER BY d.date ASC
         """
-        # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
-        cursor = self.execute_query(query, (start_date, end_date))
-        return cursor.fetchall()
+        return self._decode_prices(self._fetch_on_segments(query, start_date, end_date))
 
+    @cached_read
+    def get_all_assets_last_prices_before_date(self, date: str) -> List[Tuple[str, int, float]]:
+        """
+        Récupère le dernier prix connu de chaque asset strictement avant une date, pour initialiser le report des prix.
+        Args:
+            date (str): La date sous forme 'YYYY-MM-DD'.
+        Returns:
+            List[Tuple[str, int, float]]: tel que [[date, asset_id, close]].
+        """
+        # SQLite renvoie les colonnes de la ligne qui réalise le MAX()
+        query = """
+        SELECT MAX(d.date), p.asset_id, p.close
+        FROM {schema}.Prices p
+        JOIN {schema}.Dates d ON p.date_id = d.id
+        WHERE d.date BETWEEN :start_date AND :end_date AND d.date < :date AND p.close IS NOT NULL
+        GROUP BY p.asset_id
+        """
+        last_prices = {}
+        for last_date, asset_id, close in self._fetch_on_segments(query, "0000-01-01", date, {"date": date}):
+            if asset_id not in last_prices or last_date > last_prices[asset_id][0]:
+                last_prices[asset_id] = (last_date, asset_id, close)
+        return self._decode_prices(list(last_prices.values()))
+
+    def _decode_prices(self, rows: List[Tuple[str, int, int]]) -> List[Tuple[str, int, float]]:
+        if not self.fixed_point:
+            return rows
+        return [(date, asset_id, from_fixed(close, self._get_price_scale(asset_id))) for date, asset_id, close in rows]
+
+    @cached_read
     def get_one_asset_prices_between_dates(self, asset_id: int, start_date: str, end_date: str) -> List[Tuple[str, float]]:
         """
         Args:
@@ -138,15 +421,18 @@ class DatabaseManager:
         """
         query = """
         SELECT d.date, p.close
-        FROM Prices p
-        JOIN Dates d ON p.date_id = d.id
-        WHERE p.asset_id = ? AND d.date BETWEEN ? AND ?
+        FROM {schema}.Prices p
+        JOIN {schema}.Dates d ON p.date_id = d.id
+        WHERE p.asset_id = :asset_id AND d.date BETWEEN :start_date AND :end_date
         ORDER BY d.date ASC
         """
-        # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
-        cursor = self.execute_query(query, (asset_id, start_date, end_date))
-        return cursor.fetchall()
+        rows = self._fetch_on_segments(query, start_date, end_date, {"asset_id": asset_id})
+        if not self.fixed_point:
+            return rows
+        scale = self._get_price_scale(asset_id)
+        return [(date, from_fixed(close, scale)) for date, close in rows]
 
+    @cached_read
     def get_one_asset_one_price(self, asset_id: int, date: str) -> List[Tuple[str, float]]:
         """
         Args:
@@ -157,14 +443,17 @@ class DatabaseManager:
         """
         query = """
         SELECT d.date, p.close
-        FROM Prices p
-        JOIN Dates d ON p.date_id = d.id
-        WHERE p.asset_id = ? AND d.date = ?
+        FROM {schema}.Prices p
+        JOIN {schema}.Dates d ON p.date_id = d.id
+        WHERE p.asset_id = :asset_id AND d.date = :start_date
         """
-        # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
-        cursor = self.execute_query(query, (asset_id, date))
-        return cursor.fetchall()
+        rows = self._fetch_on_segments(query, date, date, {"asset_id": asset_id})
+        if not self.fixed_point:
+            return rows
+        scale = self._get_price_scale(asset_id)
+        return [(date, from_fixed(close, scale)) for date, close in rows]
 
+    @cached_read
     def get_assets_held_between_dates(self, start_date: str, end_date: str) -> List[Tuple[int, str, float]]:
         """
         Récupère la liste des assets détenus ou qui ont été détenus entre deux dates données.
@@ -192,7 +481,118 @@ class DatabaseManager:
         """
         # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
         cursor = self.execute_query(query, (end_date, start_date))
-        return cursor.fetchall()
+        if not self.fixed_point:
+            return cursor.fetchall()
+        return [(asset_id, short_name, from_fixed(quantity, QUANTITY_SCALE)) for asset_id, short_name, quantity in cursor.fetchall()]
+
+    def _sync_indexes(self) -> None:
+        """
+        Drops the in-memory indexes (positions and adjustment factors) if another connection has written to the database
+        since they were built. Called once per public method: the lookups themselves never query the database.
+        """
+        with self._indexes_lock:
+            data_version = self.get_data_version()
+            if data_version != self._indexes_version:
+                self._position_index = None
+                self._adjustment_factors = None
+                self._indexes_version = data_version
+
+    def _positions(self) -> PositionIndex:
+        with self._indexes_lock:
+            if self._position_index is None:
+                query = """
+                SELECT asset_id, date, SUM(quantity)
+                FROM Orders
+                GROUP BY asset_id, date
+                """
+                factors = self._factors()
+                self._position_index = PositionIndex.from_orders((asset_id, date, self._adjusted_quantity(factors, asset_id, date, quantity))
+                                                                 for asset_id, date, quantity in self.execute_query(query).fetchall())
+            return self._position_index
+
+    def _factors(self) -> AdjustmentFactors:
+        if self._adjustment_factors is None:
+            self._adjustment_factors = AdjustmentFactors.from_actions(self.get_corporate_actions())
+        return self._adjustment_factors
+
+    @property
+    def position_index(self) -> PositionIndex:
+        """
+        Index of the cumulative positions of each asset, built once from the Orders table and kept up to date by add_order().
+        It is rebuilt if another connection has written to the database in the meantime. Quantities are in storage units.
+        """
+        self._sync_indexes()
+        return self._positions()
+
+    @property
+    def adjustment_factors(self) -> AdjustmentFactors:
+        """
+        Cumulative adjustment factors of the corporate actions, built once from the CorporateActions table.
+        They are rebuilt if another connection has written to the database in the meantime.
+        """
+        self._sync_indexes()
+        return self._factors()
+
+    def insert_corporate_actions(self, asset_id: int, actions: List[Tuple[str, str, float]]) -> None:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+            actions (List[Tuple[str, str, float]]): Les opérations, tel que [[date, kind, value]], kind valant 'split' ou 'dividend'.
+        Returns:
+            None
+        """
+        for _, kind, _ in actions:
+            if kind not in ACTION_KINDS:
+                raise ValueError(f"Unknown corporate action '{kind}', expected one of {ACTION_KINDS}")
+        query = """
+        INSERT OR REPLACE INTO CorporateActions (asset_id, date, kind, value)
+        VALUES (?, ?, ?, ?)
+        """
+        self.execute_many_query(query, [(asset_id, date, kind, value) for date, kind, value in actions])
+        # Les quantités ajustées dépendent des splits : les index seront reconstruits
+        with self._indexes_lock:
+            self._adjustment_factors = None
+            self._position_index = None
+
+    @cached_read
+    def get_corporate_actions(self, asset_id: int=None) -> List[Tuple[int, str, str, float]]:
+        """
+        Args:
+            asset_id (int, optional): Id de l'asset, None pour tous les assets.
+        Returns:
+            List[Tuple[int, str, str, float]]: tel que [[asset_id, date, kind, value]], triées par date.
+        """
+        query = """
+        SELECT asset_id, date, kind, value
+        FROM CorporateActions
+        WHERE ? IS NULL OR asset_id = ?
+        ORDER BY date ASC
+        """
+        return self.execute_query(query, (asset_id, asset_id)).fetchall()
+
+    def get_corporate_actions_checked_session(self, asset_id: int) -> str:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+        Returns:
+            str: La dernière séance couverte par le dernier téléchargement des opérations de l'asset, None s'il n'a jamais eu lieu.
+        """
+        row = self.execute_query("SELECT last_session FROM CorporateActionsChecks WHERE asset_id = ?", (asset_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_corporate_actions_checked_session(self, asset_id: int, last_session: str) -> None:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+            last_session (str): La dernière séance couverte par le téléchargement des opérations, sous forme 'YYYY-MM-DD'.
+        Returns:
+            None
+        """
+        query = """
+        INSERT OR REPLACE INTO CorporateActionsChecks (asset_id, last_session)
+        VALUES (?, ?)
+        """
+        self.execute_query(query, (asset_id, last_session))
 
     def get_asset_total_quantity_at_date(self, asset_id: int, date: str) -> float:
         """
@@ -203,20 +603,29 @@ class DatabaseManager:
         Returns:
             float: Le nombre total d'actions détenues jusqu'à la date donnée.
         """
-        query = """
-        SELECT SUM(o.quantity)
-        FROM Orders o
-        WHERE o.asset_id = ? AND o.date <= ?;
-        """
-        # Exécuter la requête pour récupérer les cours de clôture dans la plage de dates
-        cursor = self.execute_query(query, (asset_id, date))
-        result = cursor.fetchone()
+        # Si aucun ordre n'a été passé pour cet asset jusqu'à cette date, l'index retourne 0
+        return self._from_stored(self.position_index.quantity_at(asset_id, date), QUANTITY_SCALE)
 
-        # Si le résultat est None, cela signifie qu'il n'y a pas eu de transactions pour cet asset jusqu'à cette date
-        total_quantity = result[0] if result[0] is not None else 0
+    def get_asset_quantities_at_dates(self, asset_id: int, dates: List[str]) -> List[float]:
+        """
+        Args:
+            asset_id (int): L'identifiant de l'asset.
+            dates (List[str]): Les dates au format 'YYYY-MM-DD'.
+        Returns:
+            List[float]: Le nombre total d'actions détenues à chaque date.
+        """
+        return [self._from_stored(quantity, QUANTITY_SCALE) for quantity in self.position_index.quantities_at(asset_id, dates)]
 
-        return total_quantity
+    def get_wallet_quantities_at_date(self, date: str) -> Dict[int, float]:
+        """
+        Args:
+            date (str): La date au format 'YYYY-MM-DD'.
+        Returns:
+            Dict[int, float]: Le nombre d'actions détenues de chaque asset à cette date, tel que {asset_id: quantity}.
+        """
+        return {asset_id: self._from_stored(quantity, QUANTITY_SCALE) for asset_id, quantity in self.position_index.wallet_at(date).items()}
 
+    @cached_read
     def get_all_assets_quantities_between_dates(self, start_date: str, end_date: str) -> List[Tuple[str, int, float]]:
         #TODO : à retravailler pour que si on veut les quantités entre deux date (ex 2023-01-01 au 2023-12-31)
         # mais que si à la date de début il n'y à pas d'ordre ce jour-là, la méthode ne retourne pas 0.
@@ -242,28 +651,31 @@ class DatabaseManager:
         # cursor_combined = self.execute_query(query_combined, (start_date, end_date))
         # return cursor_combined.fetchall()
 
+        # Les quantités des ordres sont converties en actions d'aujourd'hui (splits)
         # Fetch the last known quantities before the start date
         query_initial = """
-        SELECT a.id, SUM(COALESCE(o.quantity, 0)) as initial_quantity
+        SELECT a.id, o.date, SUM(COALESCE(o.quantity, 0)) as initial_quantity
         FROM Assets a
         LEFT JOIN Orders o ON a.id = o.asset_id AND o.date < ?
-        GROUP BY a.id;
+        GROUP BY a.id, o.date;
         """
         cursor_initial = self.execute_query(query_initial, (start_date,))
-        initial_quantities = {row[0]: row[1] for row in cursor_initial.fetchall()}
+        factors = self.adjustment_factors
+        initial_quantities = defaultdict(float)
+        for asset_id, date, quantity in cursor_initial.fetchall():
+            initial_quantities[asset_id] += self._adjusted_quantity(factors, asset_id, date, quantity) if date is not None else 0
 
         # Optimized query to fetch dates, assets, and total quantities
         query_combined = """
         SELECT d.date, a.id, COALESCE(SUM(o.quantity), 0) as total_quantity
-        FROM Dates d
+        FROM {schema}.Dates d
         CROSS JOIN Assets a
         LEFT JOIN Orders o ON d.date = o.date AND a.id = o.asset_id
-        WHERE d.date BETWEEN ? AND ?
+        WHERE d.date BETWEEN :start_date AND :end_date
         GROUP BY d.date, a.id
         ORDER BY d.date ASC;
         """
-        cursor_combined = self.execute_query(query_combined, (start_date, end_date))
-        combined_data = cursor_combined.fetchall()
+        combined_data = self._fetch_on_segments(query_combined, start_date, end_date)
 
         results = []
         asset_quantities = defaultdict(float, initial_quantities)  # Start with initial quantities
@@ -271,16 +683,49 @@ class DatabaseManager:
         # Calculate running totals
         for date, asset_id, total_quantity in combined_data:
             # Update the asset quantity based on the total quantity for the current date
-            asset_quantities[asset_id] += total_quantity
+            if total_quantity:
+                asset_quantities[asset_id] += self._adjusted_quantity(factors, asset_id, date, total_quantity)
 
             # If the date is the start date and there are no orders, use the initial quantity
             if date == start_date and asset_quantities[asset_id] == 0:
                 asset_quantities[asset_id] = initial_quantities.get(asset_id, 0)
 
-            results.append((date, asset_id, asset_quantities[asset_id]))
+            results.append((date, asset_id, self._from_stored(asset_quantities[asset_id], QUANTITY_SCALE)))
 
         return results
 
+    @cached_read
+    def get_asset_price_dates_bounds(self, asset_id: int) -> Tuple[str, str]:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+        Returns:
+            Tuple[str, str]: La première et la dernière date pour lesquelles un prix est stocké, (None, None) si aucun.
+        """
+        query = """
+        SELECT MIN(d.date), MAX(d.date)
+        FROM {schema}.Prices p
+        JOIN {schema}.Dates d ON p.date_id = d.id
+        WHERE p.asset_id = ?
+        """
+        bounds = [self.execute_query(query.format(schema=schema), (asset_id,)).fetchone() for schema in self._shards.schemas()]
+        first_dates = [first_date for first_date, _ in bounds if first_date is not None]
+        last_dates = [last_date for _, last_date in bounds if last_date is not None]
+        return (min(first_dates), max(last_dates)) if first_dates else (None, None)
+
+    @cached_read
+    def get_all_assets(self) -> List[Tuple[int, str, str, str]]:
+        """
+        Returns:
+            List[Tuple[int, str, str, str]]: Tous les assets de la base, tel que [[asset_id, short_name, ticker, currency]].
+        """
+        query = """
+        SELECT id, short_name, ticker, currency FROM Assets ORDER BY id ASC
+        """
+        cursor = self.execute_query(query)
+        return cursor.fetchall()
+
+    @cached_read
     def get_asset_id_by_ticker(self, ticker: str) -> int:
         """
         Args:
@@ -314,7 +759,14 @@ class DatabaseManager:
         INSERT OR IGNORE INTO Orders (asset_id, date, quantity, price)
         VALUES (?, ?, ?, ?)
         """
-        self.execute_query(query, (self.get_asset_id_by_ticker(ticker), date, quantity, price))
+        asset_id = self.get_asset_id_by_ticker(ticker)
+        quantity, price = self._to_stored(quantity, QUANTITY_SCALE), self._to_stored(price, self._get_price_scale(asset_id))
+        with self._write_lock, self._indexes_lock:
+            # Un index périmé est abandonné avant d'y ajouter l'ordre
+            self._sync_indexes()
+            cursor = self.execute_query(query, (asset_id, date, quantity, price))
+            if cursor.rowcount == 1 and self._position_index is not None:
+                self._position_index.add_order(asset_id, date, self._adjusted_quantity(self._factors(), asset_id, date, quantity))
 
     def insert_dates_batch(self, dates: List[str]) -> None:
         """
@@ -324,9 +776,13 @@ class DatabaseManager:
             None
         """
         query = """
-        INSERT OR IGNORE INTO Dates (date) VALUES (?)
+        INSERT OR IGNORE INTO {schema}.Dates (date) VALUES (?)
         """
-        self.execute_many_query(query, [(date,) for date in dates])
+        main_dates, archived_dates = self._split_by_shard(dates)
+        self.execute_many_query(query.format(schema=MAIN_SCHEMA), [(date,) for date in main_dates])
+        for year, year_dates in archived_dates.items():
+            self._shards.write(year, query, [(date,) for date in year_dates])
+            self._count_write()
 
     def get_dates_ids(self, dates: List[str]) -> Dict[str, int]:
         """
@@ -336,33 +792,110 @@ class DatabaseManager:
         Returns:
             Dict[str, int]: Retourn un dico tel que {date: id}
         """
-        query = """
-        SELECT id, date FROM Dates WHERE date IN ({})
-        """.format(",".join("?" for _ in dates))
+        main_dates, archived_dates = self._split_by_shard(dates)
+        # Les ids d'une année archivée sont ceux de son fichier, où insert_prices_batch() écrit ses prix
+        dates_by_schema = [(MAIN_SCHEMA, main_dates)] + [(self._shards.schema(year), year_dates) for year, year_dates in archived_dates.items()]
+        date_ids = {}
+        for schema, schema_dates in dates_by_schema:
+            query = """
+            SELECT id, date FROM {}.Dates WHERE date IN ({})
+            """.format(schema, ",".join("?" for _ in schema_dates))
 
-        cursor = self.execute_query(query, (dates))
+            cursor = self.execute_query(query, schema_dates)
 
-        # Créer un dictionnaire {date: id}
-        return {row[1]: row[0] for row in cursor.fetchall()}
+            # Créer un dictionnaire {date: id}
+            date_ids.update({row[1]: row[0] for row in cursor.fetchall()})
+        return date_ids
 
-    def insert_prices_batch(self, asset_id: int, date_ids: Dict[str, int], list_of_entries: List[Tuple[str, float, float]]) -> None:
+    def insert_prices_batch(self, asset_id: int, date_ids: Dict[str, int], list_of_entries: List[Tuple[str, float, float]], replace: bool=False) -> None:
         """
         Args:
             asset_id (int): Id del'asset pour lequel on veut insérer des prix.
             date_ids (Dict[str, int]): Dictionnaire contenant les ids des dates pour lesquelles on veut insérer des prix.
             list_of_entries (List[Tuple[str, float, float]]): Liste de Tuples avec les dates au format 'YYYY-MM-DD' et les prix d'ouverture et de cloture.
+            replace (bool): Si True, les prix déjà stockés pour ces dates sont remplacés au lieu d'être conservés.
         Returns:
             None
         """
         query = """
-        INSERT OR IGNORE INTO Prices (asset_id, date_id, open, close)
+        INSERT OR {} INTO {{schema}}.Prices (asset_id, date_id, open, close)
         VALUES (?, ?, ?, ?)
-        """
+        """.format("REPLACE" if replace else "IGNORE")
         # Préparer les données pour l'insertion
-        data_to_insert = [(asset_id, date_ids[date], open_price, close_price) for date, open_price, close_price in list_of_entries]
+        scale = self._get_price_scale(asset_id)
+        main_entries, archived_entries = self._split_by_shard(list_of_entries, date_index=0)
 
         # Insérer les prix en une seule opération
-        self.execute_many_query(query, data_to_insert)
+        self.execute_many_query(query.format(schema=MAIN_SCHEMA), self._price_rows(asset_id, date_ids, main_entries, scale))
+        for year, year_entries in archived_entries.items():
+            self._shards.write(year, query, self._price_rows(asset_id, date_ids, year_entries, scale))
+            self._count_write()
+
+    def _price_rows(self, asset_id: int, date_ids: Dict[str, int], list_of_entries: List[Tuple[str, float, float]], scale: int) -> List[tuple]:
+        return [(asset_id, date_ids[date], self._to_stored(open_price, scale), self._to_stored(close_price, scale))
+                for date, open_price, close_price in list_of_entries]
+
+    def get_ingestion_state(self, asset_id: int) -> Tuple[str, str, Dict[int, str]]:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+        Returns:
+            Tuple[str, str, Dict[int, str]]: La source du dernier import, sa dernière date et l'empreinte des lignes importées
+                de chaque année, tel que (source_name, last_date, {year: checksum}), ou None si l'asset n'a jamais été importé.
+        """
+        state = self.execute_query("SELECT source_name, last_date FROM Ingestions WHERE asset_id = ?", (asset_id,)).fetchone()
+        if state is None:
+            return None
+        checksums = self.execute_query("SELECT year, checksum FROM IngestionBlocks WHERE asset_id = ?", (asset_id,)).fetchall()
+        return state[0], state[1], dict(checksums)
+
+    def ingest_prices(self, asset_id: int, source_name: str, list_of_entries: List[Tuple[str, float, float]]) -> str:
+        """
+        Imports the history of an asset into Dates and Prices, writing only what Prices does not already hold.
+        The history is cut into one block per year and the checksum of the rows of each block imported last time is kept.
+        A block whose imported rows have changed in the source since (ex: prices corrected by the provider, even years ago)
+        is written again entirely, an unchanged block only gets its rows newer than the last import inserted.
+        Every row of the source is still hashed, but the database only receives the changed blocks and the new rows.
+
+        Args:
+            asset_id (int): Id de l'asset.
+            source_name (str): Nom de la source (fichier) de l'historique.
+            list_of_entries (List[Tuple[str, float, float]]): Liste de Tuples (date 'YYYY-MM-DD', ouverture, clôture), triée par date.
+        Returns:
+            str: La première date insérée ou modifiée, None si rien n'a changé.
+        """
+        if not list_of_entries:
+            return None
+        blocks = _year_blocks(list_of_entries)
+        state = self.get_ingestion_state(asset_id)
+        entries_to_replace, entries_to_insert = [], list_of_entries
+        if state is not None and self.get_asset_price_dates_bounds(asset_id)[1] is not None and state[0] == source_name:
+            _, last_ingested_date, checksums = state
+            entries_to_insert, changed_years = [], []
+            for year, entries in blocks.items():
+                nb_ingested = bisect_right([date for date, _, _ in entries], last_ingested_date)
+                if nb_ingested and _entries_checksum(entries[:nb_ingested]) != checksums.get(year):
+                    # Bloc corrigé dans la source, ou lignes plus anciennes que le premier import
+                    entries_to_replace += entries
+                    if year in checksums:
+                        changed_years.append(year)
+                else:
+                    entries_to_insert += entries[nb_ingested:]
+            if changed_years:
+                print(f"WARNING: L'historique déjà importé depuis {source_name} a changé pour les années {changed_years}, elles sont réconciliées.")
+
+        for entries, replace in ((entries_to_replace, True), (entries_to_insert, False)):
+            if entries:
+                dates = [date for date, _, _ in entries]
+                self.insert_dates_batch(dates)
+                self.insert_prices_batch(asset_id, self.get_dates_ids(dates), entries, replace=replace)
+        self.execute_query("INSERT OR REPLACE INTO Ingestions (asset_id, source_name, last_date) VALUES (?, ?, ?)",
+                           (asset_id, source_name, list_of_entries[-1][0]))
+        self.execute_query("DELETE FROM IngestionBlocks WHERE asset_id = ?", (asset_id,))
+        self.execute_many_query("INSERT INTO IngestionBlocks (asset_id, year, checksum) VALUES (?, ?, ?)",
+                                [(asset_id, year, _entries_checksum(entries)) for year, entries in blocks.items()])
+        written_dates = [entries[0][0] for entries in (entries_to_replace, entries_to_insert) if entries]
+        return min(written_dates) if written_dates else None
 
     def insert_one_asset(self, short_name: str, name: str, ticker: str, broker: str, currency: str) -> None:
         """
@@ -398,6 +931,7 @@ class DatabaseManager:
     #     print('ERROR: try to get the price for a date before your first order for this asset.')
     #     return 1
 
+    @cached_read
     def get_all_cashflows_between_dates(self, start_date: str, end_date: str) -> List[Tuple[str, float]]:
         """
         Calculate the total cashflows for each days between strat and end date.
@@ -409,20 +943,75 @@ class DatabaseManager:
         Returns:
             List[Tuple[str, float]]: tel que [[date, cashflows]].
         """
+        # Deux parcours d'index sur la plage de dates, fusionnés ici : les dates sans ordre ont un flux nul
         query = """
-        SELECT d.date, COALESCE(SUM(o.quantity * o.price), 0) AS total_cashflow
-        FROM Dates d
-        LEFT JOIN Orders o ON d.date = o.date
-        WHERE d.date BETWEEN ? AND ?
-        GROUP BY d.date
-        ORDER BY d.date ASC;
+        SELECT date, currency, SUM(cashflow) AS total_cashflow
+        FROM DailyCashflows
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date, currency
         """
         cursor = self.execute_query(query, (start_date, end_date))
-        cashflows_data  = cursor.fetchall()
+        daily_cashflows = {}
+        # Sommes exactes par devise en mode fixed_point, converties une seule fois
+        for date, currency, total_cashflow in cursor.fetchall():
+            daily_cashflows[date] = daily_cashflows.get(date, 0) + self._from_stored(total_cashflow, self._cashflow_scale(currency))
         cursor.close()
+        cashflows_data = [(date, daily_cashflows.get(date, 0)) for (date,) in self.get_dates(start_date, end_date)]
+
+        dividends = self._dividend_payments([date for date, _ in cashflows_data])
+        if dividends:
+            cashflows = dict(cashflows_data)
+            for session_date, amount in dividends:
+                cashflows[session_date] -= amount
+            cashflows_data = list(cashflows.items())
 
         return cashflows_data
 
+    def _dividend_payments(self, dates: List[str]) -> List[Tuple[str, float]]:
+        """
+        Returns the dividends received on the given sessions of Dates, as [(session_date, amount)].
+        Les dividendes versés sortent du portefeuille : ils sont retranchés des flux, le jour du détachement.
+        A dividend whose ex-date is not in Dates (ex: a holiday of the other markets) is counted on the next session.
+        """
+        if not dates:
+            return []
+        # Les dividendes détachés depuis la séance précédant la fenêtre tombent sur sa première séance
+        first_date = datetime.strptime(dates[0], "%Y-%m-%d")
+        previous_sessions = self.get_dates((first_date - timedelta(days=MAX_SESSION_GAP_DAYS)).strftime("%Y-%m-%d"),
+                                           (first_date - timedelta(days=1)).strftime("%Y-%m-%d"))
+        start_date = dates[0]
+        if previous_sessions:
+            start_date = (datetime.strptime(previous_sessions[-1][0], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        payments = []
+        positions = self.position_index
+        for ex_date, asset_id, dividend in self._factors().dividends_between(start_date, dates[-1]):
+            # Le dividende revient aux actions détenues à la clôture de la veille du détachement
+            quantity = positions.quantity_at(asset_id, (datetime.strptime(ex_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d"))
+            if quantity:
+                payments.append((dates[bisect_left(dates, ex_date)], self._from_stored(quantity, QUANTITY_SCALE) * dividend))
+        return payments
+
+    @cached_read
+    def get_daily_cashflows(self, start_date: str, end_date: str) -> List[Tuple[str, int, str, float]]:
+        """
+        Args:
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        Returns:
+            List[Tuple[str, int, str, float]]: Les flux nets des ordres par jour et par asset, tel que [[date, asset_id, currency, cashflow]].
+        """
+        query = """
+        SELECT date, asset_id, currency, cashflow
+        FROM DailyCashflows
+        WHERE date BETWEEN ? AND ?
+        ORDER BY date ASC, asset_id ASC
+        """
+        rows = self.execute_query(query, (start_date, end_date)).fetchall()
+        if not self.fixed_point:
+            return rows
+        return [(date, asset_id, currency, from_fixed(cashflow, cashflow_scale(currency))) for date, asset_id, currency, cashflow in rows]
+
+    @cached_read
     def get_first_date(self) -> str:
         """
         Retrieves the earliest transaction date from the orders.
@@ -441,8 +1030,145 @@ class DatabaseManager:
         cursor.close()
         return result[0] if result[0] is not None else datetime.now().strftime('%Y-%m-%d')
 
+    def refresh_price_rollups(self, asset_id: int, start_date: str=None) -> None:
+        """
+        Recomputes the weekly, monthly and yearly OHLC rollups of an asset from its daily prices.
+        Only the periods from the one containing start_date onwards are recomputed.
+        Args:
+            asset_id (int): Id de l'asset.
+            start_date (str, optional): Première date modifiée sous forme 'YYYY-MM-DD'. Si None, tout est recalculé.
+        Returns:
+            None
+        """
+        for period in PERIODS:
+            first_date = "0000-01-01" if start_date is None else period_start(start_date, period)
+            query = """
+            SELECT d.date, p.open, p.close
+            FROM {schema}.Prices p
+            JOIN {schema}.Dates d ON p.date_id = d.id
+            WHERE p.asset_id = :asset_id AND d.date BETWEEN :start_date AND :end_date
+            ORDER BY d.date ASC
+            """
+            rows = self._fetch_on_segments(query, first_date, "9999-12-31", {"asset_id": asset_id})
+            rollups = ohlc_rollup(dates=[row[0] for row in rows],
+                                  closes=[row[2] for row in rows],
+                                  period=period,
+                                  opens=[row[1] for row in rows])
+            self.execute_query("DELETE FROM PriceRollups WHERE asset_id = ? AND period = ? AND period_start >= ?",
+                               (asset_id, period, first_date))
+            self.execute_many_query("""
+            INSERT OR REPLACE INTO PriceRollups (asset_id, period, period_start, open, high, low, close)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(asset_id, period) + rollup for rollup in rollups])
+
+    @cached_read
+    def get_price_rollups(self, asset_id: int, period: str, start_date: str, end_date: str) -> List[Tuple[str, float, float, float, float]]:
+        """
+        Args:
+            asset_id (int): Id de l'asset.
+            period (str): 'W', 'M' ou 'Y'.
+            start_date (str): La date de début sous forme 'YYYY-MM-DD'.
+            end_date (str): La date de fin sous forme 'YYYY-MM-DD'.
+        Returns:
+            List[Tuple[str, float, float, float, float]]: tel que [[period_start, open, high, low, close]].
+        """
+        query = """
+        SELECT period_start, open, high, low, close
+        FROM PriceRollups
+        WHERE asset_id = ? AND period = ? AND period_start BETWEEN ? AND ?
+        ORDER BY period_start ASC
+        """
+        cursor = self.execute_query(query, (asset_id, period, period_start(start_date, period), end_date))
+        if not self.fixed_point:
+            return cursor.fetchall()
+        scale = self._get_price_scale(asset_id)
+        return [(start, *(from_fixed(value, scale) for value in ohlc)) for start, *ohlc in cursor.fetchall()]
+
+    def get_data_version(self) -> int:
+        """
+        Returns SQLite's `PRAGMA data_version`, which changes each time another connection commits to the database file.
+        In thread_safe mode, it is read on a connection of the pool dedicated to it, whatever the calling thread,
+        and the commits of the writer of the pool count as made by another connection.
+        Returns:
+            int: The current data version.
+        """
+        if self._pool is not None:
+            return self._pool.data_version()
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get_last_inserted_ids(self) -> Dict[str, int]:
+        """
+        Returns the highest id of the append-only tables, to detect what has been written since a previous call.
+        Returns:
+            Dict[str, int]: tel que {table_name: max_id}.
+        """
+        query = """
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM Dates),
+               (SELECT COALESCE(MAX(id), 0) FROM Prices),
+               (SELECT COALESCE(MAX(id), 0) FROM Orders)
+        """
+        dates_id, prices_id, orders_id = self.execute_query(query).fetchone()
+        return {"Dates": dates_id, "Prices": prices_id, "Orders": orders_id}
+
+    def get_write_markers(self, last_order_id: int) -> Dict[str, str]:
+        """
+        Returns digests of the writes that get_last_inserted_ids() cannot see: orders updated or deleted up to
+        last_order_id, corporate actions stored, and prices written to the file of an archived year.
+
+        Args:
+            last_order_id (int): Id du dernier ordre déjà connu.
+        Returns:
+            Dict[str, str]: tel que {table_name: digest}.
+        """
+        queries = {"Orders": ("SELECT id, asset_id, date, quantity, price FROM Orders WHERE id <= ? ORDER BY id", (last_order_id,)),
+                   "CorporateActions": ("SELECT asset_id, date, kind, value FROM CorporateActions ORDER BY asset_id, date, kind", ()),
+                   "PriceShards": ("SELECT year, writes FROM PriceShards ORDER BY year", ())}
+        return {table: hashlib.sha1(repr(self.execute_query(query, params).fetchall()).encode("utf-8")).hexdigest()
+                for table, (query, params) in queries.items()}
+
+    def get_prices_inserted_after(self, price_id: int) -> List[Tuple[str, int, float]]:
+        """
+        Args:
+            price_id (int): Id du dernier prix déjà connu.
+        Returns:
+            List[Tuple[str, int, float]]: Les prix insérés depuis, tel que [[date, asset_id, close]].
+        """
+        query = """
+        SELECT d.date, p.asset_id, p.close
+        FROM Prices p
+        JOIN Dates d ON p.date_id = d.id
+        WHERE p.id > ?
+        ORDER BY d.date ASC
+        """
+        cursor = self.execute_query(query, (price_id,))
+        return self._decode_prices(cursor.fetchall())
+
+    def get_orders_inserted_after(self, order_id: int) -> List[Tuple[str, int, float, float, int]]:
+        """
+        Args:
+            order_id (int): Id du dernier ordre déjà connu.
+        Returns:
+            List[Tuple[str, int, float, float, int]]: Les ordres insérés depuis, tel que [[date, asset_id, quantity, price, order_id]].
+        """
+        query = """
+        SELECT o.date, o.asset_id, o.quantity, o.price, o.id
+        FROM Orders o
+        WHERE o.id > ?
+        ORDER BY o.date ASC, o.id ASC
+        """
+        cursor = self.execute_query(query, (order_id,))
+        if not self.fixed_point:
+            return cursor.fetchall()
+        return [(date, asset_id, from_fixed(quantity, QUANTITY_SCALE), from_fixed(price, self._get_price_scale(asset_id)), order_id)
+                for date, asset_id, quantity, price, order_id in cursor.fetchall()]
+
     def close(self):
-        self.conn.close()
+        if self._pool is not None:
+            self._pool.close()
+        else:
+            self.conn.close()
+        if self._snapshot is not None:
+            self._snapshot.source_conn.close()
 
 
 class Order:
@@ -494,6 +1220,7 @@ class Asset:
         self.broker = broker
         self.currency = currency
         self.orders: List[Order] = [] if list_of_orders is None else list_of_orders
+        self.quantity: float = sum(order.quantity for order in self.orders)
 
     def _order_already_exist(self, order: Order) -> bool:
         # TODO: Améliorer cette méthode pour plus de granularité
@@ -506,6 +1233,7 @@ class Asset:
             db_manager.add_order(self.ticker, order.date, order.quantity, order.price)    # On peut l'optimiser avec un executmany en utilisant directement la liste
             if not self._order_already_exist(order):
                 self.orders.append(order)
+                self.quantity += order.quantity
 
     def to_dict(self) -> Dict:
         return {
@@ -530,10 +1258,8 @@ class Asset:
         return self.orders[0].date
 
     def _get_last_detention_date(self, date) :
-        self.quantity = 0
-        for order in self.orders:
-            self.quantity += order.quantity
-
+        import pandas as pd
+        # self.quantity est tenue à jour à chaque ajout d'ordre
         if self.quantity == 0 :
             if pd.to_datetime(self.orders[-1].date) + pd.Timedelta(days=1) <= pd.to_datetime(date) :
                 return pd.to_datetime(self.orders[-1].date) + pd.Timedelta(days=1)
@@ -544,6 +1270,7 @@ class Asset:
         """
         Récupère la première date du fichier CSV.
         """
+        import pandas as pd
 
         try:
             first_row = pd.read_csv(file_path, usecols=["Date"]).head(1)
@@ -567,6 +1294,7 @@ class Asset:
         """
         Récupère la dernière date du fichier CSV.
         """
+        import pandas as pd
 
         try:
             last_row = pd.read_csv(file_path, usecols=["Date"]).tail(1)
@@ -585,11 +1313,35 @@ class Asset:
 
 
     def _get_data_from_archives(self, file_path: Path, start_date: str, end_date: str) -> pd.DataFrame:
-        # TODO: vérifier que les dates demandes sont bien dans l'archive!
-        archived_data = pd.read_csv(file_path, index_col='Date', parse_dates=True)
-
-        # Filtrer les données archivées pour la période demandée
-        return archived_data.loc[start_date:end_date]
+        """
+        Lit la période demandée dans les archives : dans le store compressé s'il contient cet asset,
+        sinon dans le fichier CSV. Les séances manquantes de la période sont signalées.
+        """
+        import io
+        import pandas as pd
+        from .archive_store import ArchiveStore
+        from .trading_calendar import last_expected_session
+        # Le store compare des chaînes 'YYYY-MM-DD' : _update_with_new_data() peut passer un pd.Timestamp
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        store_path = Path(file_path).parent / ARCHIVES_DB_FILENAME
+        csv_text = None
+        if store_path.is_file():
+            store = ArchiveStore(store_path)
+            csv_text = store.read_csv_text(Path(file_path).stem, start_date, end_date)
+            if csv_text is not None:
+                # end_date est exclue par yfinance : la séance de ce jour-là n'est pas attendue
+                gaps = store.find_gaps(Path(file_path).stem, self.ticker, start_date, last_expected_session(self.ticker, end_date))
+                if gaps:
+                    print(f"WARNING: {len(gaps)} séances manquent dans les archives de {self.short_name} entre {start_date} et {end_date} (ex: {', '.join(gaps[:5])}).")
+            store.close()
+        if csv_text is None:
+            if not Path(file_path).is_file():
+                return pd.DataFrame()
+            archived_data = pd.read_csv(file_path, index_col='Date', parse_dates=True)
+            # Filtrer les données archivées pour la période demandée
+            return archived_data.loc[start_date:end_date]
+        return pd.read_csv(io.StringIO(csv_text), index_col='Date', parse_dates=True)
 
     def _reorgenize_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -601,17 +1353,20 @@ class Asset:
         """
         Télécharge les données de bourse pour la période donnée.
         """
+        import yfinance as yf
         # TODO : Why not use yf.Ticker("the_ticker").history() ?
+        # Close n'est ajusté que des splits (les dividendes sont comptés comme flux, voir CorporateActions)
         data:pd.DataFrame = yf.download(tickers=self.ticker,
                                         start=start_date,
                                         end=end_date,
-                                        interval=interval)
+                                        interval=interval,
+                                        auto_adjust=False)
 
         if data.empty:
             # If the download failed, check the Archives directory if there is data for this asset.
             archives_dir_path = Path(save_dir / ARCHIVES_DIR_NAME)
             file_path = archives_dir_path / f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}"
-            if file_path.is_file() :
+            if file_path.is_file() or (archives_dir_path / ARCHIVES_DB_FILENAME).is_file():
                 return self._get_data_from_archives(file_path=file_path,
                                                     start_date=start_date,
                                                     end_date=end_date)
@@ -627,6 +1382,7 @@ class Asset:
         """
         Combine les nouvelles données avec les données existantes.
         """
+        import pandas as pd
         if first_dataframe.empty and second_dataframe.empty:
             # Si les deux entrées sont vides, retourner un warning et un dataframe vide.
             print("WARNIGN: first_dataframe and second_dataframe are empty.")
@@ -658,6 +1414,7 @@ class Asset:
         """
         Télécharge et ajoute les données manquantes antérieures à la première date du fichier existant.
         """
+        import pandas as pd
         old_data = self._download_data(start_date=start_date,
                                        end_date=pd.to_datetime(end_date).strftime('%Y-%m-%d'),
                                        interval=interval,
@@ -672,7 +1429,8 @@ class Asset:
         """
         Télécharge et ajoute les données manquantes postérieures à la dernière date du fichier existant.
         """
-        new_data = self._download_data(start_date=pd.to_datetime(start_date) + pd.Timedelta(days=1),
+        import pandas as pd
+        new_data = self._download_data(start_date=(pd.to_datetime(start_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
                                        end_date=end_date,
                                        interval=interval,
                                        save_dir=save_dir,
@@ -683,12 +1441,14 @@ class Asset:
         print(f'Le fichier CSV a été mis à jour avec de nouvelles données et sauvegardé sous {file_path}')
 
     def _update_history(self, file_path: Path, start_date: str, end_date: str, save_dir: Path, filename_sufix: str, interval: str) -> pd.DataFrame:
-        # FIXME : Ne fonctionne surement pas avec les jour fériers !
+        import pandas as pd
+        from .trading_calendar import get_ticker_calendar, last_expected_session
         first_date = self._get_first_date_from_csv(file_path)
         last_date = self._get_last_date_from_csv(file_path)
 
-        need_older_data: bool = pd.to_datetime(start_date) < pd.to_datetime(first_date)
-        need_newer_data: bool = pd.to_datetime(last_date) + pd.Timedelta(days=2) < pd.to_datetime(end_date)
+        # Les week-ends et jours fériés de la place de cotation ne sont pas des données manquantes
+        need_older_data: bool = get_ticker_calendar(self.ticker).next_session(start_date) < first_date
+        need_newer_data: bool = last_date < last_expected_session(self.ticker, end_date)
 
         # Vérifier si des données plus anciennes doivent être téléchargées
         if need_older_data :
@@ -700,7 +1460,6 @@ class Asset:
                                        filename_sufix=filename_sufix)
 
         # Vérifier si des données plus récentes doivent être téléchargées
-        # TODO: change the value "2" of pd.Timedelta(days=2) to "1", but need to manage case of dalayed data
         if need_newer_data :
             self._update_with_new_data(file_path=file_path,
                                        start_date=last_date,
@@ -718,6 +1477,7 @@ class Asset:
         """
         Télécharge les données boursières et met à jour le fichier CSV avec les nouvelles données.
         """
+        import pandas as pd
         file_path = save_dir / Path(f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}")
 
         if not file_path.is_file() :
@@ -742,6 +1502,7 @@ class Asset:
         """
         Convertit les prix d'un actif dans la devise locale vers l'euro, en utilisant l'historique des taux de change.
         """
+        import pandas as pd
         # Synchroniser les index des deux DataFrames (les dates doivent correspondre)
         price_data.index = pd.to_datetime(price_data.index)
         currency_data.index = pd.to_datetime(currency_data.index)
@@ -818,37 +1579,120 @@ class Asset:
         else:
             print(f"Conversion non effectuée pour {self.ticker}.")
 
+    def _download_intraday_history(self, end_date: str, save_dir: Path, interval: str, db_manager: DatabaseManager=None) -> None:
+        """
+        Télécharge les barres intraday et les range dans le store partitionné par actif et par mois,
+        puis reconstruit les barres journalières dans la base de données.
+        """
+        import pandas as pd
+        import yfinance as yf
+        from .intraday_store import INTRADAY_DIR_NAME, IntradayStore
+
+        store = IntradayStore(save_dir / INTRADAY_DIR_NAME)
+        last_timestamp = store.get_last_timestamp(self.ticker)
+        if last_timestamp is None:
+            start_date = self.orders[0].date
+        else:
+            start_date = datetime.fromtimestamp(last_timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+
+        # Non ajustées, comme les barres journalières de _download_data()
+        data: pd.DataFrame = yf.download(tickers=self.ticker,
+                                         start=start_date,
+                                         end=end_date,
+                                         interval=interval,
+                                         auto_adjust=False)
+        if data.empty:
+            print(f"Aucune donnée intraday n'a été téléchargée pour {self.ticker} entre {start_date} et {end_date}.")
+            return
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+
+        index = data.index if data.index.tz is not None else data.index.tz_localize("UTC")
+        timestamps = (index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        bars = list(zip(timestamps.tolist(),
+                        data["Open"].tolist(),
+                        data["High"].tolist(),
+                        data["Low"].tolist(),
+                        data["Close"].tolist(),
+                        data["Volume"].tolist()))
+        store.insert_bars(self.ticker, bars)
+        print(f"{len(bars)} barres intraday ({interval}) enregistrées pour {self.ticker}.")
+
+        if db_manager != None:
+            store.write_daily_bars(db_manager, self.ticker, start_date, end_date, str(index.tz))
+
+    def _download_corporate_actions(self, db_manager: DatabaseManager, end_date: str) -> None:
+        """
+        Télécharge les splits et dividendes de l'asset et les enregistre dans la table CorporateActions.
+        Only done when end_date covers sessions that the previous download of the actions did not,
+        even if the prices of these sessions are already stored.
+        """
+        import yfinance as yf
+        from .trading_calendar import last_expected_session
+        asset_id = db_manager.get_asset_id_by_ticker(self.ticker)
+        last_session = last_expected_session(self.ticker, end_date)
+        checked_session = db_manager.get_corporate_actions_checked_session(asset_id)
+        if checked_session is not None and checked_session >= last_session:
+            return
+        actions: pd.DataFrame = yf.Ticker(self.ticker).actions
+        db_manager.set_corporate_actions_checked_session(asset_id, last_session)
+        if actions is None or actions.empty:
+            return
+        records = []
+        for date, row in actions.iterrows():
+            date = date.strftime('%Y-%m-%d')
+            if row.get("Stock Splits", 0):
+                records.append((date, "split", float(row["Stock Splits"])))
+            if row.get("Dividends", 0):
+                records.append((date, "dividend", float(row["Dividends"])))
+        if records:
+            db_manager.insert_corporate_actions(asset_id, records)
+
+    def _is_up_to_date(self, db_manager: DatabaseManager, end_date: str, save_dir: Path, filename_sufix: str) -> bool:
+        """
+        Vérifie, sans rien télécharger ni relire le CSV, si les prix stockés couvrent déjà toutes les séances attendues
+        entre le premier ordre et end_date, selon le calendrier de la place de cotation.
+        """
+        from .trading_calendar import get_ticker_calendar, last_expected_session
+        file_path = save_dir / Path(f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}")
+        if not file_path.is_file() or not self.orders:
+            return False
+        try:
+            first_date, last_date = db_manager.get_asset_price_dates_bounds(db_manager.get_asset_id_by_ticker(self.ticker))
+        except ValueError:
+            return False
+        if first_date is None:
+            return False
+        first_order_date = min(order.date for order in self.orders)
+        return (first_date <= get_ticker_calendar(self.ticker).next_session(first_order_date)
+                and last_date >= last_expected_session(self.ticker, end_date))
+
     def download_history(self, end_date: str, save_dir: Path, filename_sufix: str=HISTORY_FILENAME_SUFIX, interval: str='1d', db_manager: DatabaseManager=None) -> None:
+        import pandas as pd
+        from .intraday_store import INTRADAY_INTERVALS
         Path.mkdir(save_dir, parents=True, exist_ok=True)
 
+        if interval in INTRADAY_INTERVALS:
+            # Les tables Dates/Prices ne stockent qu'un prix par jour : les barres intraday vont dans leur propre store
+            self._download_intraday_history(end_date, save_dir, interval, db_manager)
+            return
+
         last_detention_date = self._get_last_detention_date(end_date)
+        if db_manager != None and self._is_up_to_date(db_manager, last_detention_date, save_dir, filename_sufix):
+            print(f"Aucune nouvelle donnée à télécharger pour {self.short_name}, les données sont déjà à jour.")
+            # Les prix sont à jour, mais un split ou un dividende peut avoir été publié sans nouvelle ligne de prix
+            data = pd.read_csv(save_dir / Path(f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}"), index_col='Date', parse_dates=True)
+        else:
+            data = self._get_history(end_date=last_detention_date,
+                                     save_dir=save_dir,
+                                     filename_sufix=filename_sufix,
+                                     interval=interval)
+            if db_manager != None:
+                self._ingest_history(data, db_manager, filename_sufix)
 
-        data = self._get_history(end_date=last_detention_date,
-                                 save_dir=save_dir,
-                                 filename_sufix=filename_sufix,
-                                 interval=interval)
         if db_manager != None:
-            data.reset_index(inplace=True)  # Réinitialiser l'index pour convertir la date en une colonne normale
-            # Convertir la colonne Date en format texte 'YYYY-MM-DD'
-            data['Date'] = data['Date'].dt.strftime('%Y-%m-%d')
-            # Remplacer les valeurs "null" ou NaN dans la colonne 'Open'
-            data['Open'] = data['Open'].replace('null', pd.NA)
-            data['Open'] = data['Open'].ffill()  # Utiliser la méthode forward fill pour remplacer les NaN
-            # Remplacer les valeurs "null" ou NaN dans la colonne 'Close'
-            data['Close'] = data['Close'].replace('null', pd.NA)
-            data['Close'] = data['Close'].ffill()  # Utiliser la méthode forward fill pour remplacer les NaN
-            # Filtrer les colonnes d'intérêt : 'Date', 'Open', 'Close'
-            data_to_insert = data[['Date', 'Open', 'Close']]
-            # Convertir le DataFrame en une liste de tuples
-            records = data_to_insert.to_records(index=False)  # Convertit le DataFrame en une liste de tuples sans l'index
-            list_of_records = list(records)  # Transformation en une liste pour être utilisé avec SQLite
-            # Extraire les dates
-            unique_dates = list(set([date for date, _, _ in list_of_records]))
-            # Étape 1 : Insérer toutes les dates en une seule fois
-            db_manager.insert_dates_batch(unique_dates)
-            # Étape 2 : Récupérer les IDs des dates
-            date_ids = db_manager.get_dates_ids(unique_dates)
-            db_manager.insert_prices_batch(db_manager.get_asset_id_by_ticker(self.ticker), date_ids, list_of_records)
+            # Enregistrer les splits et dividendes, appliqués aux quantités et aux flux lors des requêtes
+            self._download_corporate_actions(db_manager, last_detention_date)
 
         if not data.empty :
             # TODO: get wallet currency instead
@@ -861,6 +1705,33 @@ class Asset:
                                       interval,
                                       db_manager)
 
+    def _ingest_history(self, data: pd.DataFrame, db_manager: DatabaseManager, filename_sufix: str) -> None:
+        """
+        Importe dans la base les lignes de l'historique plus récentes que les prix stockés, puis met à jour les agrégats.
+        """
+        import pandas as pd
+        data = data.reset_index()  # Réinitialiser l'index pour convertir la date en une colonne normale
+        # Convertir la colonne Date en format texte 'YYYY-MM-DD'
+        data['Date'] = data['Date'].dt.strftime('%Y-%m-%d')
+        # Remplacer les valeurs "null" ou NaN dans la colonne 'Open'
+        data['Open'] = data['Open'].replace('null', pd.NA)
+        data['Open'] = data['Open'].ffill()  # Utiliser la méthode forward fill pour remplacer les NaN
+        # Remplacer les valeurs "null" ou NaN dans la colonne 'Close'
+        data['Close'] = data['Close'].replace('null', pd.NA)
+        data['Close'] = data['Close'].ffill()  # Utiliser la méthode forward fill pour remplacer les NaN
+        # Filtrer les colonnes d'intérêt : 'Date', 'Open', 'Close'
+        data_to_insert = data[['Date', 'Open', 'Close']]
+        # Convertir le DataFrame en une liste de tuples triée par date, sans doublon
+        list_of_records = sorted(dict(zip(data_to_insert['Date'], zip(data_to_insert['Open'], data_to_insert['Close']))).items())
+        list_of_records = [(date, open_price, close_price) for date, (open_price, close_price) in list_of_records]
+        # Étape 1 : N'insérer que les lignes plus récentes que celles déjà stockées (ou tout réconcilier si le fichier a changé)
+        asset_id = db_manager.get_asset_id_by_ticker(self.ticker)
+        source_name = f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}"
+        first_changed_date = db_manager.ingest_prices(asset_id, source_name, list_of_records)
+        # Étape 2 : Mettre à jour les agrégats hebdomadaires, mensuels et annuels
+        if first_changed_date is not None:
+            db_manager.refresh_price_rollups(asset_id, first_changed_date)
+
     # def load_history(self, db_manager: DatabaseManager, asset_name: str, start_date: str, end_date: str) -> pd.DataFrame:
     #     db_manager.execute_query("""SELECT * FROM Prices (asset_id, date, quantity, price)
     #         VALUES (?, ?, ?, ?)
@@ -870,6 +1741,7 @@ class Asset:
         """
         Charge l'historique des prix de l'action à partir d'un fichier CSV et met à jour les attributs `dates` et `closes`.
         """
+        import pandas as pd
         csv_filename = Path(f"{_normalized_name(self.short_name)}_{self.currency}_{filename_sufix}")
         file_path = save_dir / csv_filename
 
@@ -944,6 +1816,22 @@ class Asset:
 #         return list(sorted(dates_temp))
 
 
+def _entries_checksum(entries) -> str:
+    """Empreinte SHA-1 de lignes (date, ouverture, clôture), insensible au type exact des nombres."""
+    checksum = hashlib.sha1()
+    for date, open_price, close_price in entries:
+        checksum.update(f"{date},{float(open_price)!r},{float(close_price)!r}\n".encode("utf-8"))
+    return checksum.hexdigest()
+
+
+def _year_blocks(entries: List[Tuple[str, float, float]]) -> Dict[int, List[Tuple[str, float, float]]]:
+    """Découpe des lignes triées par date en un bloc par année, dans l'ordre des années."""
+    blocks = defaultdict(list)
+    for entry in entries:
+        blocks[int(entry[0][:4])].append(entry)
+    return blocks
+
+
 def _normalized_name(name: str) -> str:
     return name.replace(' ', '_')\
         .replace('-', '_')\
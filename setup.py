@@ -22,9 +22,11 @@ setup(
     packages=find_packages(),
     install_requires=[
         "yfinance",
+        "numpy",
         "matplotlib",  # Ajoutez ici toutes les dépendances requises par votre projet
     ],
     extras_require={
-            'dev' : ["pytest"]
+            'dev' : ["pytest"],
+            'arrow' : ["pyarrow"]
         },
 )
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from portfolio_tracking.analytics_export import asset_matrices, export_asset_matrices, export_wallet, wallet_columns
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def _wallet(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75),
+                                                                      ("2024-01-03", 3.8, 4.0),
+                                                                      ("2024-01-04", 4.0, 4.5)])
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    return wallet
+
+
+def test_wallet_columns(tmp_path):
+    wallet = _wallet(tmp_path)
+    columns = wallet_columns(wallet)
+    assert(columns["date"].dtype == np.dtype("datetime64[D]"))
+    assert(columns["valuation"].tolist() == wallet.calculate_wallet_valuation())
+    assert(columns["cashflow"].tolist() == [7.5, 0, 0])
+    assert(columns["twrr_cumulated"].tolist() == wallet.calculate_wallet_TWRR()[0])
+
+    matrices = asset_matrices(wallet)
+    assert(matrices["prices"].tolist() == [[3.75], [4.0], [4.5]])
+    assert(matrices["quantities"].tolist() == [[2], [2], [2]])
+
+
+def test_export(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    wallet = _wallet(tmp_path)
+    path = export_wallet(wallet, tmp_path / "wallet.arrow")
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    assert(table.column_names == ["date", "valuation", "cashflow", "share_value", "share_number", "twrr", "twrr_cumulated"])
+    assert(table.schema.field("date").type == pa.date32())
+    assert(table.column("valuation").to_pylist() == wallet.valuations)
+
+    export_asset_matrices(wallet, tmp_path / "prices.arrow", tmp_path / "positions.arrow")
+    prices = pa.ipc.open_file(pa.memory_map(str(tmp_path / "prices.arrow"))).read_all()
+    assert(prices.column("GNFT.PA").to_pylist() == [3.75, 4.0, 4.5])
@@ -0,0 +1,47 @@
+import pandas as pd
+import yfinance
+from portfolio_tracking.archive_store import ArchiveStore
+from portfolio_tracking.yfinance_interface import Asset
+
+
+ARCHIVE_CSV = """Date,Open,High,Low,Close,Adj Close,Volume
+2023-12-28,3.5,3.6,3.4,3.55,3.55,1000
+2023-12-29,3.55,3.7,3.5,3.6,3.6,1200
+2024-01-02,3.6,3.8,3.6,3.75,3.75,900
+2024-01-04,3.75,3.9,3.7,3.8,3.8,800
+"""
+
+
+def test_archive_store(tmp_path):
+    csv_path = tmp_path / "Genfit_EUR_history.csv"
+    csv_path.write_text(ARCHIVE_CSV, encoding="utf-8")
+    store = ArchiveStore(tmp_path / "archives.db")
+    assert(store.import_directory(tmp_path) == {"Genfit_EUR_history": 4})
+    assert(store.get_names() == ["Genfit_EUR_history"])
+    assert(store.get_coverage("Genfit_EUR_history") == ("2023-12-28", "2024-01-04"))
+
+    # Seul le bloc de 2024 est lu
+    assert(store.read_csv_text("Genfit_EUR_history", "2024-01-01", "2024-01-31").splitlines() == ARCHIVE_CSV.splitlines()[:1] + ARCHIVE_CSV.splitlines()[3:])
+    assert(store.read_csv_text("Unknown_EUR_history", "2024-01-01", "2024-01-31") is None)
+    assert(store.find_gaps("Genfit_EUR_history", "GNFT.PA", "2023-12-28", "2024-01-05") == ["2024-01-03", "2024-01-05"])
+
+    # Une ligne réécrite remplace l'ancienne, les autres lignes de l'année sont conservées
+    store.write_rows("Genfit_EUR_history", ARCHIVE_CSV.splitlines()[0].split(","), [["2024-01-03", "3.75", "3.8", "3.7", "3.78", "3.78", "500"]])
+    assert(len(list(store.iter_lines("Genfit_EUR_history", "2024-01-01", "2024-12-31"))) == 3)
+    assert(store.find_gaps("Genfit_EUR_history", "GNFT.PA", "2024-01-02", "2024-01-04") == [])
+
+
+def test_empty_download_reads_archive_store(tmp_path, monkeypatch):
+    archives_dir = tmp_path / "Archives"
+    archives_dir.mkdir()
+    (archives_dir / "Genfit_EUR_history.csv").write_text(ARCHIVE_CSV, encoding="utf-8")
+    ArchiveStore(archives_dir / "archives.db").import_directory(archives_dir)
+    (archives_dir / "Genfit_EUR_history.csv").unlink()
+    file_path = tmp_path / "Genfit_EUR_history.csv"
+    file_path.write_text("\n".join(ARCHIVE_CSV.splitlines()[:3]) + "\n", encoding="utf-8")
+    # Le téléchargement ne renvoie rien : les séances manquantes sont lues dans archives.db
+    monkeypatch.setattr(yfinance, "download", lambda **kwargs: pd.DataFrame())
+    asset = Asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    asset._update_with_new_data(file_path, "2023-12-29", "2024-01-05", "1d", tmp_path, "history.csv")
+    data = pd.read_csv(file_path, index_col="Date")
+    assert(data.index.tolist() == ["2023-12-28", "2023-12-29", "2024-01-02", "2024-01-04"])
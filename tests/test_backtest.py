@@ -0,0 +1,61 @@
+import numpy as np
+from portfolio_tracking.backtest import Backtest, dca, rebalance
+from portfolio_tracking.returns import twrr_series
+from portfolio_tracking.wallet_data import _extend_TWRR
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+DATES = ["2024-01-30", "2024-01-31", "2024-02-01", "2024-02-02", "2024-03-01"]
+PRICES = np.array([[10.0, 20.0], [11.0, 20.0], [10.0, 25.0], [12.0, np.nan], [8.0, 40.0]])
+
+
+def test_twrr_series_matches_wallet():
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    valuations = [100.0, 110.0, 0.0, 50.0]
+    cashflows = [100.0, 0.0, -110.0, 0.0]
+    twrr_cumulated, twrr = [], []
+    _extend_TWRR(twrr_cumulated, twrr, dates, valuations, dict(zip(dates, cashflows)), 0)
+    vectorized_cumulated, vectorized_twrr = twrr_series(np.array(valuations), np.array(cashflows))
+    assert(np.allclose(vectorized_twrr, twrr))
+    assert(np.allclose(vectorized_cumulated, twrr_cumulated))
+
+
+def test_dca():
+    backtest = Backtest(DATES, [1, 2], PRICES)
+    assert(backtest.rebalancing_indices("M").tolist() == [0, 2, 4])
+    result = backtest.run(dca([100, 200]), frequency="M")
+    assert(np.allclose(result.quantities[-1], [10 + 10 + 12.5, 10 + 8 + 5]))
+    assert(np.allclose(result.cashflows, [300, 0, 300, 0, 300]))
+    assert(np.isclose(result.valuations[3], 20 * 12 + 0))    # Prix inconnu : l'asset est valorisé à 0
+
+
+def test_rebalance_invests_once():
+    backtest = Backtest(DATES, [1, 2], np.full((len(DATES), 2), 10.0))
+    strategy = rebalance([0.5, 0.5], initial_investment=1000)
+
+    def exit_at_cost(state):
+        # Sortie complète au prix d'achat : le montant net investi revient à 0
+        return -state.quantities if state.index == 2 else strategy(state)
+    result = backtest.run(exit_at_cost, frequency="M")
+    assert(np.allclose(result.cashflows, [1000, 0, -1000, 0, 0]))
+    assert(np.allclose(backtest.run(strategy, frequency="M").cashflows, [1000, 0, 0, 0, 0]))
+
+
+def test_rebalance_from_database(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Spie", "Spie SA", "SPIE.PA", "XTB", "EUR")
+    db_manager.insert_dates_batch(DATES)
+    date_ids = db_manager.get_dates_ids(DATES)
+    for column, asset_id in enumerate([1, 2]):
+        db_manager.insert_prices_batch(asset_id, date_ids, [(date, price, price) for date, price in zip(DATES, PRICES[:, column]) if not np.isnan(price)])
+    data_version = db_manager.get_last_inserted_ids()
+
+    backtest = Backtest.from_database(db_manager, ["GNFT.PA", "SPIE.PA"], DATES[0], DATES[-1])
+    assert(backtest.prices[3, 1] == 25.0)     # Prix reporté
+    results = backtest.run_many({weight: rebalance([weight, 1 - weight], initial_investment=1000) for weight in (0.25, 0.5, 0.75)})
+    result = results[0.5]
+    values = result.quantities * backtest.prices
+    assert(np.allclose(values[[0, 2, 4]], values[[0, 2, 4]].sum(axis=1, keepdims=True) / 2))
+    assert(result.cashflows[0] == 1000 and np.allclose(result.cashflows[1:], 0))
+    assert(db_manager.get_last_inserted_ids() == data_version)     # Aucune écriture dans la base
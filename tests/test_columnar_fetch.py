@@ -0,0 +1,48 @@
+import numpy as np
+from portfolio_tracking.price_matrix import build_matrix
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def _filled_database(tmp_path) -> DatabaseManager:
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    db_manager.insert_dates_batch(dates)
+    date_ids = db_manager.get_dates_ids(dates)
+    db_manager.insert_prices_batch(1, date_ids, [("2024-01-02", 4.0, 4.0), ("2024-01-03", 4.0, 4.5), ("2024-01-05", 4.5, None)])
+    db_manager.insert_prices_batch(2, date_ids, [(date, 180.0, 180.0 + day) for day, date in enumerate(dates)])
+    db_manager.add_order("GNFT.PA", "2023-12-29", 2, 8.0)
+    db_manager.add_order("GNFT.PA", "2024-01-03", -1, 4.5)
+    db_manager.add_order("AAPL", "2024-01-04", 1, 182.0)
+    db_manager.insert_corporate_actions(1, [("2024-01-03", "split", 2), ("2024-01-05", "dividend", 0.5)])
+    return db_manager
+
+
+def test_prices_arrays(tmp_path):
+    db_manager = _filled_database(tmp_path)
+    dates, asset_ids, closes = db_manager.get_all_assets_prices_arrays("2024-01-02", "2024-01-05")
+    str_dates = dates.astype(str).tolist()
+    assert(str_dates == [row[0] for row in db_manager.get_dates("2024-01-02", "2024-01-05")])
+    assert(asset_ids.tolist() == [1, 2])
+    np.testing.assert_array_equal(closes, build_matrix(str_dates, [1, 2], db_manager.get_all_assets_prices_between_dates("2024-01-02", "2024-01-05")))
+
+    dates, closes = db_manager.get_one_asset_prices_arrays(1, "2024-01-03", "2024-01-05")
+    assert(dates.astype(str).tolist() == ["2024-01-03", "2024-01-05"])
+    np.testing.assert_array_equal(closes, [4.5, np.nan])
+
+
+def test_quantities_and_cashflows_arrays(tmp_path):
+    db_manager = _filled_database(tmp_path)
+    dates, asset_ids, quantities = db_manager.get_all_assets_quantities_arrays("2024-01-02", "2024-01-05")
+    expected = build_matrix(dates.astype(str).tolist(), [1, 2], db_manager.get_all_assets_quantities_between_dates("2024-01-02", "2024-01-05"))
+    np.testing.assert_array_equal(quantities, expected)
+    np.testing.assert_array_equal(quantities, [[4, 0], [3, 0], [3, 1], [3, 1]])
+
+    dates, cashflows = db_manager.get_all_cashflows_arrays("2024-01-02", "2024-01-05")
+    expected = db_manager.get_all_cashflows_between_dates("2024-01-02", "2024-01-05")
+    assert(dates.astype(str).tolist() == [date for date, _ in expected])
+    assert(cashflows.tolist() == [cashflow for _, cashflow in expected] == [0, -4.5, 182.0, -1.5])
+
+    empty_dates, empty_cashflows = db_manager.get_all_cashflows_arrays("2025-01-01", "2025-12-31")
+    assert(len(empty_dates) == len(empty_cashflows) == 0)
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from portfolio_tracking.connection_pool import is_read_query
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_is_read_query():
+    assert(is_read_query("\n        SELECT d.date FROM Dates d"))
+    assert(is_read_query("PRAGMA data_version"))
+    assert(not is_read_query("PRAGMA journal_mode=WAL"))
+    assert(not is_read_query("INSERT OR IGNORE INTO Dates (date) VALUES (?)"))
+
+
+def test_parallel_valuations_while_writing(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db", read_cache_size=16, thread_safe=True)
+    assert(db_manager.execute_query("PRAGMA journal_mode").fetchone()[0] == "wal")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = [f"2024-01-{day:02d}" for day in range(2, 31)]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 4.0, 4.0) for date in dates])
+
+    def valuate(_):
+        wallet = Wallet(db_manager=db_manager)
+        wallet.set_evaluation_dates("2024-01-02", "2024-01-30")
+        return wallet.calculate_wallet_valuation()[0]
+
+    def write(day):
+        db_manager.add_order("GNFT.PA", f"2024-02-{day:02d}", 1, 4.0)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        writes = [executor.submit(write, day) for day in range(1, 21)]
+        valuations = list(executor.map(valuate, range(50)))
+        for write_result in writes:
+            write_result.result()
+    assert(valuations == [8.0] * 50)
+    assert(db_manager.get_asset_total_quantity_at_date(1, "2024-02-28") == 22)
+    db_manager.close()
+
+
+def test_read_cache_and_indexes_across_threads(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db", read_cache_size=16, thread_safe=True)
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert(len(executor.submit(db_manager.get_all_assets).result()) == 1)
+
+    # Écriture d'un autre processus, puis lecture depuis un nouveau thread (et donc une nouvelle connexion en lecture)
+    other_process = DatabaseManager(tmp_path / "data_base.db")
+    other_process.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    other_process.close()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert(len(executor.submit(db_manager.get_all_assets).result()) == 2)
+
+        # Les lectures de l'index des positions n'attendent pas un écrivain en cours
+        with db_manager._pool.write_lock:
+            assert(executor.submit(db_manager.get_asset_total_quantity_at_date, 1, "2024-01-03").result(timeout=5) == 2)
+    db_manager.close()
@@ -0,0 +1,86 @@
+import pandas as pd
+import yfinance
+from portfolio_tracking.corporate_actions import AdjustmentFactors
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import Asset, DatabaseManager
+
+
+def test_adjustment_factors():
+    factors = AdjustmentFactors.from_actions([(1, "2024-03-01", "split", 3), (1, "2024-01-15", "split", 2), (1, "2024-02-01", "dividend", 0.5)])
+    assert(factors.quantity_factor(1, "2024-01-02") == 6)
+    assert(factors.quantity_factor(1, "2024-01-15") == 3)   # Split déjà reflété dans la quantité de l'ordre
+    assert(factors.quantity_factors(1, ["2024-02-01", "2024-03-01"]).tolist() == [3, 1])
+    assert(factors.quantity_factor(2, "2024-01-02") == 1)
+    assert(factors.dividends_between("2024-01-01", "2024-12-31") == [("2024-02-01", 1, 0.5)])
+
+
+def test_split_and_dividend_in_wallet(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 8.0)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    # Prix ajustés du split 2:1 du 2024-01-03, comme fournis par Yahoo Finance
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-02", 4.0, 4.0),
+                                                                      ("2024-01-03", 4.0, 4.0),
+                                                                      ("2024-01-04", 4.0, 3.5)])
+    assert(db_manager.get_asset_total_quantity_at_date(1, "2024-01-04") == 2)
+    db_manager.insert_corporate_actions(1, [("2024-01-03", "split", 2), ("2024-01-04", "dividend", 0.5)])
+    assert(db_manager.get_asset_total_quantity_at_date(1, "2024-01-04") == 4)
+    assert(db_manager.get_all_cashflows_between_dates("2024-01-02", "2024-01-04") == [("2024-01-02", 16.0), ("2024-01-03", 0), ("2024-01-04", -2.0)])
+
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    assert(wallet.calculate_wallet_valuation() == [16.0, 16.0, 14.0])
+    twrr_cumulated, _ = wallet.calculate_wallet_TWRR()
+    assert(twrr_cumulated == [100.0, 100.0, 100.0])     # Le détachement du dividende n'est pas une perte
+
+
+def test_dividend_on_a_missing_session(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 4.0)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-05", "2024-01-08"]
+    db_manager.insert_dates_batch(dates)
+    # Ex-dates absentes de Dates : comptées à la séance suivante
+    db_manager.insert_corporate_actions(1, [("2024-01-04", "dividend", 0.5), ("2024-01-06", "dividend", 0.25)])
+    assert(db_manager.get_all_cashflows_between_dates("2024-01-02", "2024-01-08") == [("2024-01-02", 8.0), ("2024-01-03", 0), ("2024-01-05", -1.0), ("2024-01-08", -0.5)])
+    # Le dividende détaché entre la séance précédente et le début de la fenêtre tombe sur sa première séance
+    assert(db_manager.get_all_cashflows_between_dates("2024-01-07", "2024-01-08") == [("2024-01-08", -0.5)])
+    _, cashflows = db_manager.get_all_cashflows_arrays("2024-01-07", "2024-01-08")
+    assert(cashflows.tolist() == [-0.5])
+
+
+def test_factors_are_checked_once_per_call(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db", read_cache_size=0)
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    dates = [f"2024-01-{day:02d}" for day in range(2, 12)]
+    db_manager.insert_dates_batch(dates)
+    for date in dates:
+        db_manager.add_order("GNFT.PA", date, 1, 4.0)
+    db_manager.insert_corporate_actions(1, [("2024-01-05", "split", 2)])
+    statements = []
+    db_manager.conn.set_trace_callback(statements.append)
+    quantities = db_manager.get_all_assets_quantities_between_dates("2024-01-02", "2024-01-11")
+    assert(quantities[-1] == ("2024-01-11", 1, 13))
+    assert(statements.count("PRAGMA data_version") == 1)
+
+
+def test_actions_are_downloaded_for_new_sessions_only(tmp_path, monkeypatch):
+    downloads = []
+
+    class Ticker:
+        def __init__(self, ticker):
+            downloads.append(ticker)
+            self.actions = pd.DataFrame({"Dividends": [0.5], "Stock Splits": [0.0]}, index=pd.to_datetime(["2024-01-04"]))
+
+    monkeypatch.setattr(yfinance, "Ticker", Ticker)
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    asset = Asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    asset._download_corporate_actions(db_manager, "2024-01-10")
+    asset._download_corporate_actions(db_manager, "2024-01-10")
+    assert(len(downloads) == 1 and db_manager.get_corporate_actions(1) == [(1, "2024-01-04", "dividend", 0.5)])
+    assert(db_manager.get_corporate_actions_checked_session(1) == "2024-01-09")
+    asset._download_corporate_actions(db_manager, "2024-01-12")
+    assert(len(downloads) == 2)
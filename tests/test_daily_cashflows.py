@@ -0,0 +1,35 @@
+import sqlite3
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_daily_cashflows_triggers(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    db_manager.insert_dates_batch(["2024-01-02", "2024-01-03", "2024-01-04"])
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)     # Doublon ignoré : pas de flux
+    db_manager.add_order("AAPL", "2024-01-02", 1, 180.0)
+    db_manager.add_order("GNFT.PA", "2024-01-04", -1, 4.0)
+    assert(db_manager.get_daily_cashflows("2024-01-01", "2024-01-31") == [("2024-01-02", 1, "EUR", 7.5),
+                                                                          ("2024-01-02", 2, "USD", 180.0),
+                                                                          ("2024-01-04", 1, "EUR", -4.0)])
+    assert(db_manager.get_all_cashflows_between_dates("2024-01-02", "2024-01-04") == [("2024-01-02", 187.5), ("2024-01-03", 0), ("2024-01-04", -4.0)])
+
+    # Modifications directes de la table Orders
+    db_manager.execute_query("UPDATE Orders SET price = 4.5 WHERE date = '2024-01-04'")
+    db_manager.execute_query("DELETE FROM Orders WHERE asset_id = 2")
+    assert(db_manager.get_all_cashflows_between_dates("2024-01-02", "2024-01-04") == [("2024-01-02", 7.5), ("2024-01-03", 0), ("2024-01-04", -4.5)])
+
+
+def test_daily_cashflows_backfill(tmp_path):
+    # Base créée avant l'ajout de la table DailyCashflows
+    conn = sqlite3.connect(tmp_path / "data_base.db")
+    DatabaseManager(tmp_path / "data_base.db").insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    conn.executescript("""
+    DROP TRIGGER Orders_insert_cashflow;
+    DROP TABLE DailyCashflows;
+    INSERT INTO Orders (asset_id, date, quantity, price) VALUES (1, '2024-01-02', 2, 3.75);
+    """)
+    conn.close()
+    assert(DatabaseManager(tmp_path / "data_base.db").get_daily_cashflows("2024-01-01", "2024-01-31") == [("2024-01-02", 1, "EUR", 7.5)])
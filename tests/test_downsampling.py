@@ -0,0 +1,43 @@
+from portfolio_tracking.downsampling import choose_period, lttb, lttb_indices, ohlc_rollup, period_start
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_period_start():
+    assert(period_start("2024-01-04", "W") == "2024-01-01")
+    assert(period_start("2024-01-04", "M") == "2024-01-01")
+    assert(period_start("2024-03-04", "Y") == "2024-01-01")
+
+
+def test_ohlc_rollup():
+    dates = ["2024-01-30", "2024-01-31", "2024-02-01", "2024-02-02"]
+    closes = [10, 12, 9, 11]
+    assert(ohlc_rollup(dates, closes, "M") == [("2024-01-01", 10, 12, 10, 12), ("2024-02-01", 9, 11, 9, 11)])
+    assert(ohlc_rollup(dates, closes, "W", opens=[9, 10, 13, 9]) == [("2024-01-29", 9, 13, 9, 11)])
+
+
+def test_lttb_keeps_extrema():
+    values = [0.0] * 1000
+    values[321] = 50.0
+    values[654] = -50.0
+    indices = lttb_indices(values, 20)
+    assert(len(indices) == 20)
+    assert(indices[0] == 0 and indices[-1] == 999)
+    assert(321 in indices and 654 in indices)
+    assert(lttb(["a", "b"], [1, 2], 20) == (["a", "b"], [1, 2]))
+
+
+def test_choose_period():
+    assert(choose_period("2024-01-01", "2024-12-31", 2000) is None)
+    assert(choose_period("1990-01-01", "2024-12-31", 2000) == "W")
+    assert(choose_period("1990-01-01", "2024-12-31", 100) == "Y")
+
+
+def test_price_rollups(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    dates = ["2024-01-30", "2024-01-31", "2024-02-01"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-30", 10, 11), ("2024-01-31", 11, 13), ("2024-02-01", 12, 9)])
+    db_manager.refresh_price_rollups(1)
+    assert(db_manager.get_price_rollups(1, "M", "2024-01-15", "2024-02-15") == [("2024-01-01", 10, 13, 10, 13), ("2024-02-01", 12, 12, 9, 9)])
+    assert(db_manager.get_price_rollups(1, "Y", "2024-01-15", "2024-02-15") == [("2024-01-01", 10, 13, 9, 9)])
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from portfolio_tracking.fixed_point import exact_valuations, to_fixed
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def _fill(db_manager: DatabaseManager) -> None:
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Toyota", "Toyota Motor", "7203.T", "XTB", "JPY")
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    date_ids = db_manager.get_dates_ids(dates)
+    db_manager.insert_prices_batch(1, date_ids, [("2024-01-02", 3.3, 3.3), ("2024-01-03", 3.3, 3.4), ("2024-01-04", 3.4, 3.1)])
+    db_manager.insert_prices_batch(2, date_ids, [("2024-01-02", 2500.5, 2500.5), ("2024-01-04", 2510.0, 2512.25)])
+    for _ in range(10):
+        db_manager.add_order("GNFT.PA", "2024-01-02", 0.1, 3.3 + _ / 1000)
+    db_manager.add_order("7203.T", "2024-01-03", 0.5, 2500.5)
+    db_manager.add_order("GNFT.PA", "2024-01-04", -0.3, 3.1)
+
+
+def test_to_fixed():
+    assert(to_fixed(3.3, 10**4) == 33000)
+    assert(to_fixed(-0.1, 10**6) == -100000)
+    assert(to_fixed(float("nan"), 10**4) is None)
+    assert(exact_valuations(np.array([[10**6, 2 * 10**6]]), np.array([[33000.0, np.nan]]), np.array([10**4, 10**2])).tolist() == [3.3])
+    # 1000 actions à 1 000 000 : le produit en unités de stockage (10**19) dépasse int64
+    assert(exact_valuations(np.array([[10**9, 10**9]]), np.array([[10.0**10, 10.0**10 + 1]]), np.array([10**4, 10**4])).tolist() == [2 * 10**9 + 0.1])
+
+
+def test_fixed_point_matches_floating_point(tmp_path):
+    float_db = DatabaseManager(tmp_path / "float.db")
+    fixed_db = DatabaseManager(tmp_path / "fixed.db", fixed_point=True)
+    _fill(float_db)
+    _fill(fixed_db)
+    assert(fixed_db.execute_query("SELECT DISTINCT typeof(quantity), typeof(price) FROM Orders").fetchall() == [("integer", "integer")])
+    assert(fixed_db.execute_query("SELECT DISTINCT typeof(cashflow) FROM DailyCashflows").fetchall() == [("integer",)])
+    assert(fixed_db.get_one_asset_prices_between_dates(2, "2024-01-01", "2024-01-31") == [("2024-01-02", 2500.5), ("2024-01-04", 2512.25)])
+    assert(fixed_db.get_asset_total_quantity_at_date(1, "2024-01-04") == 0.7)
+    assert(fixed_db.get_all_assets_quantities_between_dates("2024-01-02", "2024-01-04")[-2:] == [("2024-01-04", 1, 0.7), ("2024-01-04", 2, 0.5)])
+    # Dix achats de 0.1 : la somme entière est exacte
+    assert(fixed_db.get_all_cashflows_between_dates("2024-01-02", "2024-01-04")[0] == ("2024-01-02", 3.3045))
+
+    for start, end in [("2024-01-02", "2024-01-04"), ("2024-01-03", "2024-01-04")]:
+        np.testing.assert_allclose(fixed_db.get_all_assets_prices_arrays(start, end)[2], float_db.get_all_assets_prices_arrays(start, end)[2])
+        np.testing.assert_allclose(fixed_db.get_all_cashflows_arrays(start, end)[1], float_db.get_all_cashflows_arrays(start, end)[1])
+        fixed_wallet, float_wallet = Wallet(db_manager=fixed_db), Wallet(db_manager=float_db)
+        fixed_wallet.set_evaluation_dates(start, end)
+        float_wallet.set_evaluation_dates(start, end)
+        assert(fixed_wallet.calculate_wallet_valuation() == float_wallet.calculate_wallet_valuation())
+        np.testing.assert_allclose(fixed_wallet.calculate_wallet_TWRR()[0], float_wallet.calculate_wallet_TWRR()[0])
+
+
+def test_storage_mode_is_kept(tmp_path):
+    DatabaseManager(tmp_path / "fixed.db", fixed_point=True).close()
+    assert(DatabaseManager(tmp_path / "fixed.db").fixed_point)
+    with pytest.raises(ValueError):
+        DatabaseManager(tmp_path / "fixed.db", fixed_point=False)
+    DatabaseManager(tmp_path / "float.db").close()
+    with pytest.raises(ValueError):
+        DatabaseManager(tmp_path / "float.db", fixed_point=True)
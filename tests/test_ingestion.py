@@ -0,0 +1,43 @@
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_ingest_prices(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    history = [("2024-01-02", 3.7, 3.75), ("2024-01-03", 3.75, 3.8)]
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) == "2024-01-02")
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) is None)     # Rien de nouveau
+
+    # Seules les lignes plus récentes que les prix stockés sont insérées
+    history.append(("2024-01-04", 3.8, 3.9))
+    last_price_id = db_manager.get_last_inserted_ids()["Prices"]
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) == "2024-01-04")
+    assert([row[0] for row in db_manager.get_prices_inserted_after(last_price_id)] == ["2024-01-04"])
+
+    # Un prix passé corrigé dans le fichier déclenche une réconciliation complète
+    history[0] = ("2024-01-02", 3.7, 3.72)
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) == "2024-01-02")
+    assert(db_manager.get_one_asset_prices_between_dates(1, "2024-01-02", "2024-01-04") == [("2024-01-02", 3.72), ("2024-01-03", 3.8), ("2024-01-04", 3.9)])
+
+
+def test_ingest_prices_reconciles_old_blocks(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    history = [("2022-06-01", 2.0, 2.1), ("2023-03-01", 3.0, 3.1), ("2023-06-01", 3.5, 3.6), ("2024-03-01", 3.7, 3.75), ("2024-03-04", 3.75, 3.8)]
+    db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history)
+    assert(sorted(db_manager.get_ingestion_state(1)[2]) == [2022, 2023, 2024])
+
+    # Un prix corrigé il y a plus d'un an : seul le bloc de son année est réécrit
+    history[1] = ("2023-03-01", 3.0, 3.15)
+    last_price_id = db_manager.get_last_inserted_ids()["Prices"]
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) == "2023-03-01")
+    assert([row[0] for row in db_manager.get_prices_inserted_after(last_price_id)] == ["2023-03-01", "2023-06-01"])
+    assert(db_manager.get_one_asset_one_price(1, "2023-03-01")[0][1] == 3.15)
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", history) is None)
+
+    # Des lignes plus anciennes ajoutées en tête du fichier sont insérées sans toucher aux autres blocs
+    older = [("2021-01-04", 1.0, 1.1), ("2021-01-05", 1.1, 1.2)]
+    last_price_id = db_manager.get_last_inserted_ids()["Prices"]
+    assert(db_manager.ingest_prices(1, "Genfit_EUR_history.csv", older + history) == "2021-01-04")
+    assert([row[0] for row in db_manager.get_prices_inserted_after(last_price_id)] == ["2021-01-04", "2021-01-05"])
+    assert(db_manager.get_asset_price_dates_bounds(1) == ("2021-01-04", "2024-03-04"))
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from portfolio_tracking.intraday_store import IntradayStore
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def _timestamp(moment: str) -> int:
+    return int(datetime.strptime(moment, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp())
+
+
+BARS = [
+    (_timestamp("2024-01-31 09:00"), 10.0, 11.0, 9.5, 10.5, 100),
+    (_timestamp("2024-01-31 10:00"), 10.5, 12.0, 10.0, 11.0, 200),
+    (_timestamp("2024-02-01 09:00"), 11.0, 11.5, 10.5, 11.2, 50),
+    (_timestamp("2024-02-01 10:00"), 11.2, 11.3, 9.0, 9.5, 70),
+]
+
+
+def test_bars_are_partitioned_by_month(tmp_path):
+    store = IntradayStore(tmp_path)
+    assert(store.insert_bars("GNFT.PA", BARS) == 4)
+    assert(store.get_partitions("GNFT.PA") == [(2024, 1), (2024, 2)])
+    assert(list(store.get_bars("GNFT.PA", BARS[1][0], BARS[2][0])) == BARS[1:3])
+    assert(store.get_last_timestamp("GNFT.PA") == BARS[-1][0])
+    assert(store.get_last_timestamp("SPIE.PA") is None)
+
+
+def test_daily_bars(tmp_path):
+    store = IntradayStore(tmp_path)
+    store.insert_bars("GNFT.PA", BARS)
+    assert(store.get_daily_bars("GNFT.PA", "2024-01-01", "2024-02-29") == [
+        ("2024-01-31", 10.0, 12.0, 9.5, 11.0, 300),
+        ("2024-02-01", 11.0, 11.5, 9.0, 9.5, 120),
+    ])
+
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    assert(store.write_daily_bars(db_manager, "GNFT.PA", "2024-01-01", "2024-02-29") == 2)
+    assert(db_manager.get_one_asset_prices_between_dates(1, "2024-01-01", "2024-02-29") == [("2024-01-31", 11.0), ("2024-02-01", 9.5)])
+
+    # Le dernier jour, écrit alors qu'il était partiel, est remplacé quand ses barres suivantes arrivent
+    store.insert_bars("GNFT.PA", [(_timestamp("2024-02-01 11:00"), 9.5, 10.0, 9.4, 9.8, 30)])
+    assert(store.write_daily_bars(db_manager, "GNFT.PA", "2024-02-01", "2024-02-29") == 1)
+    assert(db_manager.get_one_asset_prices_between_dates(1, "2024-01-01", "2024-02-29") == [("2024-01-31", 11.0), ("2024-02-01", 9.8)])
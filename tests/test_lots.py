@@ -0,0 +1,66 @@
+import numpy as np
+from portfolio_tracking.lots import LotBook
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+ORDERS = [(1, "2024-01-02", 10, 5.0), (1, "2024-02-01", 10, 7.0), (1, "2024-03-01", -15, 8.0)]
+
+
+def test_lot_methods():
+    fifo = LotBook("FIFO")
+    fifo.add_orders(ORDERS)
+    assert([closed.realized_pnl for closed in fifo.closed_lots(1)] == [30.0, 5.0])
+    assert([closed.holding_days for closed in fifo.closed_lots(1)] == [59, 29])
+    assert([(lot.open_date, lot.quantity) for lot in fifo.open_lots(1)] == [("2024-02-01", 5)])
+
+    lifo = LotBook("LIFO")
+    lifo.add_orders(ORDERS)
+    assert(sum(closed.realized_pnl for closed in lifo.closed_lots()) == 10 + 15)
+    assert([(lot.open_date, lot.quantity, lot.unit_cost) for lot in lifo.open_lots(1)] == [("2024-01-02", 5, 5.0)])
+
+    average = LotBook("AVERAGE")
+    average.add_orders(ORDERS)
+    assert(np.isclose(sum(closed.realized_pnl for closed in average.closed_lots()), 15 * (8 - 6)))
+    assert(average.open_lots(1)[0].unit_cost == 6.0)
+
+
+def test_pnl_series_and_backdated_orders():
+    book = LotBook("FIFO")
+    book.add_orders(ORDERS[:1])
+    book.add_orders(ORDERS[1:])     # Ordres ajoutés à la suite : pas de rejeu
+    dates = ["2024-01-01", "2024-01-02", "2024-02-15", "2024-03-01"]
+    prices = np.array([[4.0], [5.0], [6.0], [8.0]])
+    realized, unrealized = book.pnl_series(dates, [1], prices)
+    assert(realized[:, 0].tolist() == [0, 0, 0, 35.0])
+    assert(unrealized[:, 0].tolist() == [0, 0, 20 * 6 - 120, 5 * 8 - 35])
+
+    book.add_orders([(1, "2024-01-15", 5, 4.0)])    # Ordre antidaté : l'asset est rejoué
+    assert([closed.unit_cost for closed in book.closed_lots(1)] == [5.0, 4.0])
+
+
+def test_lot_book_refresh(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 10, 5.0)
+    book = LotBook.from_database(db_manager)
+    db_manager.add_order("GNFT.PA", "2024-02-01", -4, 6.0)
+    assert(book.refresh(db_manager) == 1)
+    assert(book.refresh(db_manager) == 0)
+    assert(book.closed_lots(1)[0].realized_pnl == 4.0)
+
+
+def test_refresh_adjusts_splits_and_float_remainders(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 0.3, 10.0)
+    db_manager.add_order("GNFT.PA", "2024-01-03", -0.1, 10.0)
+    db_manager.add_order("GNFT.PA", "2024-01-04", -0.2, 10.0)
+    book = LotBook.from_database(db_manager)
+    assert(book.open_lots(1) == [])     # 0.3 - 0.1 - 0.2 n'est pas exactement nul en flottants
+    assert(book.last_order_id == 3)
+
+    db_manager.add_order("GNFT.PA", "2024-02-01", 2, 8.0)
+    db_manager.insert_corporate_actions(1, [("2024-03-01", "split", 2)])
+    assert(book.refresh(db_manager) == 4)     # Nouveau split : tous les ordres sont rejoués
+    assert([(lot.quantity, lot.unit_cost) for lot in book.open_lots(1)] == [(4.0, 4.0)])
+    assert(book.refresh(db_manager) == 0)
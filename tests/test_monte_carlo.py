@@ -0,0 +1,44 @@
+import numpy as np
+from portfolio_tracking.monte_carlo import ReturnsModel, future_sessions, project, project_wallet, simulate_paths
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_simulate_paths():
+    model = ReturnsModel([1, 2], np.array([100.0, 50.0]), np.log([[1.01, 1.0], [1.01, 1.0], [1.01, 1.0]]))
+    valuations = simulate_paths(model, nb_paths=4, horizon=2, method="bootstrap", seed=1)
+    assert(valuations.shape == (4, 3))
+    assert(np.allclose(valuations, [150, 100 * 1.01 + 50, 100 * 1.01 ** 2 + 50]))
+
+
+def test_project_is_independent_of_workers():
+    generator = np.random.default_rng(0)
+    model = ReturnsModel([1, 2], np.array([100.0, 50.0]), generator.normal(0, 0.01, size=(250, 2)))
+    bands = project(model, nb_paths=1000, horizon=20, method="normal", seed=42, chunk_size=10_000, max_workers=1)
+    same_bands = project(model, nb_paths=1000, horizon=20, method="normal", seed=42, chunk_size=10_000, max_workers=2)
+    assert(np.array_equal(bands[50], same_bands[50]))
+    assert(np.all(bands[5] <= bands[50]) and np.all(bands[50] <= bands[95]))
+    assert(bands[50][0] == 150)
+
+
+def test_project_wallet(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 4.0, close) for date, close in zip(dates, [3.75, 4.0, 4.5, 4.0])])
+    projection = project_wallet(db_manager, "2024-01-05", nb_paths=100, horizon=5, seed=0)
+    assert(projection["dates"] == future_sessions("2024-01-05", 5) == ["2024-01-05", "2024-01-08", "2024-01-09", "2024-01-10", "2024-01-11", "2024-01-12"])
+    assert(projection["percentiles"][50][0] == 8.0)
+
+
+def test_model_uses_split_adjusted_quantities(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 8.0)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 4.0, close) for date, close in zip(dates, [4.0, 4.0, 4.5, 4.0])])
+    db_manager.insert_corporate_actions(1, [("2024-01-03", "split", 2)])
+    model = ReturnsModel.from_database(db_manager, "2024-01-05")
+    assert(model.asset_ids == [1] and model.initial_values.tolist() == [16.0])
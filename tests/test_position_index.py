@@ -0,0 +1,43 @@
+from portfolio_tracking.position_index import PositionIndex
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_position_index():
+    index = PositionIndex.from_orders([(1, "2024-02-01", -1), (1, "2024-01-01", 2), (2, "2024-01-15", 5), (1, "2024-01-01", 1)])
+    assert(index.quantity_at(1, "2023-12-31") == 0)
+    assert(index.quantity_at(1, "2024-01-01") == 3)
+    assert(index.quantity_at(1, "2024-03-01") == 2)
+    assert(index.quantities_at(2, ["2024-01-14", "2024-01-15"]) == [0, 5])
+    assert(index.quantity_at(3, "2024-01-01") == 0)
+
+    index.add_order(1, "2024-01-10", 4)     # Ordre antidaté
+    index.add_order(1, "2024-03-01", -2)
+    assert(index.quantities_at(1, ["2024-01-05", "2024-01-10", "2024-02-01", "2024-03-01"]) == [3, 7, 6, 4])
+    assert(index.wallet_at("2024-01-20") == {1: 7, 2: 5})
+
+
+def test_database_position_index(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    assert(db_manager.get_asset_total_quantity_at_date(1, "2024-01-02") == 2)
+
+    db_manager.add_order("GNFT.PA", "2024-01-05", -1, 4.0)
+    db_manager.add_order("GNFT.PA", "2024-01-05", -1, 4.0)     # Doublon ignoré par la base, et donc par l'index
+    assert(db_manager.get_asset_quantities_at_dates(1, ["2024-01-01", "2024-01-04", "2024-01-05"]) == [0, 2, 1])
+
+    # Une écriture depuis une autre connexion force la reconstruction de l'index
+    DatabaseManager(tmp_path / "data_base.db").add_order("GNFT.PA", "2024-01-03", 3, 3.9)
+    assert(db_manager.get_wallet_quantities_at_date("2024-01-05") == {1: 4})
+
+
+def test_lookups_check_staleness_once(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    db_manager.get_asset_total_quantity_at_date(1, "2024-01-02")
+    statements = []
+    db_manager.conn.set_trace_callback(statements.append)
+    dates = [f"2024-01-{day:02d}" for day in range(1, 32)]
+    assert(db_manager.get_asset_quantities_at_dates(1, dates) == [0] + [2] * 30)
+    assert(statements == ["PRAGMA data_version"])
@@ -0,0 +1,36 @@
+import numpy as np
+from portfolio_tracking.price_matrix import build_matrix, forward_fill_prices
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_build_matrix():
+    matrix = build_matrix(["2024-01-02", "2024-01-03"], [5, 2], [("2024-01-03", 2, 1.5), ("2024-01-02", 5, 3.0), ("2024-01-04", 5, 9.0), ("2024-01-02", 7, 9.0)])
+    np.testing.assert_array_equal(matrix, [[3.0, np.nan], [np.nan, 1.5]])
+
+
+def test_forward_fill_prices():
+    dates = ["2024-01-02", "2024-01-03", "2024-01-10", "2024-01-20"]
+    prices = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [np.nan, 4.0]])
+    filled = forward_fill_prices(prices, dates, max_staleness_days=10, initial_prices=np.array([1.5, np.nan]), initial_dates=["2023-12-29", None])
+    np.testing.assert_array_equal(filled, [[1.5, 1.0], [2.0, 1.0], [2.0, 1.0], [np.nan, 4.0]])
+    unlimited = forward_fill_prices(prices, dates, max_staleness_days=None)
+    np.testing.assert_array_equal(unlimited, [[np.nan, 1.0], [2.0, 1.0], [2.0, 1.0], [2.0, 4.0]])
+
+
+def test_valuation_across_exchange_calendars(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    db_manager.add_order("GNFT.PA", "2024-07-03", 2, 4.0)
+    db_manager.add_order("AAPL", "2024-07-03", 1, 100.0)
+    dates = ["2024-07-03", "2024-07-04", "2024-07-05"]
+    db_manager.insert_dates_batch(dates)
+    date_ids = db_manager.get_dates_ids(dates)
+    db_manager.insert_prices_batch(1, date_ids, [(date, 4.0, 4.0) for date in dates])
+    # Le NYSE est fermé le 4 juillet
+    db_manager.insert_prices_batch(2, date_ids, [("2024-07-03", 100.0, 100.0), ("2024-07-05", 102.0, 102.0)])
+
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-07-03", "2024-07-05")
+    assert(wallet.calculate_wallet_valuation() == [108.0, 108.0, 110.0])
@@ -0,0 +1,91 @@
+import sqlite3
+import numpy as np
+import pytest
+from portfolio_tracking import price_shards
+from portfolio_tracking.price_shards import PriceShards
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+DATES = ["2020-12-30", "2020-12-31", "2021-01-04", "2021-06-30", "2022-01-03", "2022-01-04"]
+
+
+def _filled_database(tmp_path) -> DatabaseManager:
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    db_manager.insert_dates_batch(DATES)
+    date_ids = db_manager.get_dates_ids(DATES)
+    db_manager.insert_prices_batch(1, date_ids, [(date, 4.0, 4.0 + day) for day, date in enumerate(DATES)])
+    db_manager.insert_prices_batch(2, date_ids, [(date, 100.0, 100.0 + day) for day, date in enumerate(DATES) if day % 2])
+    db_manager.add_order("GNFT.PA", "2020-12-30", 2, 4.0)
+    db_manager.add_order("AAPL", "2021-06-30", 1, 103.0)
+    db_manager.add_order("GNFT.PA", "2022-01-03", -1, 8.0)
+    return db_manager
+
+
+def _results(db_manager: DatabaseManager):
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2020-12-30", "2022-01-04")
+    return (db_manager.get_dates("2020-01-01", "2022-12-31"),
+            db_manager.get_all_assets_prices_between_dates("2020-12-31", "2022-01-03"),
+            db_manager.get_one_asset_prices_between_dates(2, "2020-01-01", "2022-12-31"),
+            db_manager.get_one_asset_one_price(1, "2021-01-04"),
+            db_manager.get_all_assets_last_prices_before_date("2022-01-03"),
+            db_manager.get_asset_price_dates_bounds(1),
+            db_manager.get_all_assets_quantities_between_dates("2020-12-31", "2022-01-04"),
+            db_manager.get_all_cashflows_between_dates("2020-12-30", "2022-01-04"),
+            db_manager.get_price_rollups(1, "M", "2020-01-01", "2022-12-31"),
+            wallet.calculate_wallet_valuation(),
+            wallet.calculate_wallet_TWRR())
+
+
+def test_segments():
+    shards = PriceShards(None, "data_base.db", [2020, 2022])
+    shards.schema = lambda year: f"prices_{year}"
+    assert(list(shards.segments("2019-06-01", "2023-02-01")) == [("main", "2019-06-01", "2019-12-31"),
+                                                                  ("prices_2020", "2020-01-01", "2020-12-31"),
+                                                                  ("main", "2021-01-01", "2021-12-31"),
+                                                                  ("prices_2022", "2022-01-01", "2022-12-31"),
+                                                                  ("main", "2023-01-01", "2023-02-01")])
+    assert(list(shards.segments("2020-03-01", "2020-04-01")) == [("prices_2020", "2020-03-01", "2020-04-01")])
+    assert(list(PriceShards(None, "data_base.db").segments("2020-03-01", "2020-04-01")) == [("main", "2020-03-01", "2020-04-01")])
+
+
+def test_archived_years_are_transparent(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_shards, "MAX_ATTACHED_SHARDS", 1)
+    db_manager = _filled_database(tmp_path)
+    db_manager.refresh_price_rollups(1)
+    expected = _results(db_manager)
+
+    assert(db_manager.archive_year(2020) == tmp_path / "data_base_prices_2020.db")
+    db_manager.archive_year(2021)
+    assert(db_manager.execute_query("SELECT MIN(date) FROM Dates").fetchone() == ("2022-01-03",))
+    assert(_results(db_manager) == expected)
+    reopened = DatabaseManager(tmp_path / "data_base.db")
+    assert(_results(reopened) == expected)
+    closes = reopened.get_all_assets_prices_arrays("2020-01-01", "2022-12-31")[2]
+    np.testing.assert_array_equal(closes[:, 0], [4.0, 5.0, 6.0, 7.0, 8.0, 9.0])
+
+    with pytest.raises(ValueError):
+        reopened.archive_year(2021)
+    with pytest.raises(ValueError):
+        reopened.archive_year(9999)
+    # Les années archivées sont attachées en lecture seule
+    schema = reopened._shards.schema(2020)
+    with pytest.raises(sqlite3.OperationalError):
+        reopened.conn.execute(f"DELETE FROM {schema}.Prices")
+
+
+def test_prices_written_to_an_archived_year(tmp_path):
+    db_manager = _filled_database(tmp_path)
+    db_manager.archive_year(2020)
+    db_manager.insert_one_asset("Spie", "Spie SA", "SPIE.PA", "XTB", "EUR")
+    markers = db_manager.get_write_markers(0)
+    assert(db_manager.ingest_prices(3, "SPIE.PA_history.csv", [("2020-06-01", 20.0, 20.5), ("2020-12-31", 21.0, 21.5), ("2022-01-03", 22.0, 22.5)]) == "2020-06-01")
+    assert(db_manager.get_one_asset_prices_between_dates(3, "2020-01-01", "2022-12-31") == [("2020-06-01", 20.5), ("2020-12-31", 21.5), ("2022-01-03", 22.5)])
+    assert(db_manager.get_asset_price_dates_bounds(3) == ("2020-06-01", "2022-01-03"))
+    assert(db_manager.execute_query("SELECT COUNT(*) FROM Dates WHERE date < '2021-01-01'").fetchone() == (0,))
+    # L'écriture dans le fichier de 2020 est visible depuis la base principale
+    assert(db_manager.get_write_markers(0)["PriceShards"] != markers["PriceShards"])
+    db_manager.compact_archived_year(2020)
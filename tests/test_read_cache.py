@@ -0,0 +1,39 @@
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_read_cache_invalidation(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db", read_cache_size=2)
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    db_manager.insert_dates_batch(["2024-01-02", "2024-01-03"])
+
+    dates = db_manager.get_dates("2024-01-01", "2024-01-31")
+    dates.append(("2024-12-31",))   # Le résultat retourné est une copie
+    assert(db_manager.get_dates("2024-01-01", "2024-01-31") == [("2024-01-02",), ("2024-01-03",)])
+    assert(db_manager.read_cache_hits == 1)
+
+    # Écriture par cette connexion
+    db_manager.insert_dates_batch(["2024-01-04"])
+    assert(len(db_manager.get_dates("2024-01-01", "2024-01-31")) == 3)
+    assert(db_manager.get_first_date() == "2024-01-02")
+
+    # Écriture par une autre connexion
+    DatabaseManager(tmp_path / "data_base.db").add_order("GNFT.PA", "2024-01-01", 1, 3.5)
+    assert(db_manager.get_first_date() == "2024-01-01")
+    assert(db_manager.read_cache_hits == 1)
+
+    # Taille bornée : le plus ancien résultat est évincé
+    db_manager.get_dates("2024-01-01", "2024-01-02")
+    db_manager.get_dates("2024-01-01", "2024-01-03")
+    db_manager.get_first_date()
+    assert(db_manager.read_cache_hits == 1)
+
+
+def test_read_cache_is_dropped_by_snapshot_refresh(tmp_path):
+    DatabaseManager(tmp_path / "data_base.db").insert_dates_batch(["2024-01-02"])
+    db_manager = DatabaseManager(tmp_path / "data_base.db", read_cache_size=2, snapshot=True)
+    assert(db_manager.get_dates("2024-01-01", "2024-01-31") == [("2024-01-02",)])
+    DatabaseManager(tmp_path / "data_base.db").insert_dates_batch(["2024-01-03"])
+    # La copie par l'API de backup ne change ni data_version ni total_changes de la connexion en mémoire
+    assert(db_manager.refresh_snapshot(full=True))
+    assert(db_manager.get_dates("2024-01-01", "2024-01-31") == [("2024-01-02",), ("2024-01-03",)])
@@ -0,0 +1,55 @@
+import matplotlib
+from portfolio_tracking.report_rendering import ChartJob, build_asset_jobs, build_wallet_jobs, render_report
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_build_asset_jobs(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Spie", "Spie SA", "SPIE.PA", "XTB", "EUR")
+    dates = ["2024-01-02", "2024-01-03"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75), ("2024-01-03", 3.8, 4.0)])
+
+    jobs = build_asset_jobs(db_manager, "2024-01-01", "2024-01-31", tmp_path / "report", "svg")
+    assert([job.path.name for job in jobs] == ["GNFT_PA.svg"])
+    assert(jobs[0].series == {"Genfit": (dates, [3.75, 4.0])})
+
+
+def test_render_report_in_process_pool(tmp_path):
+    dates = [f"2024-01-{day:02d}" for day in range(1, 31)]
+    jobs = [ChartJob(tmp_path / f"chart_{index}.png", {"close": (dates, [float(day + index) for day in range(30)])}, f"Chart {index}", "Date", "Close")
+            for index in range(3)]
+    jobs.append(ChartJob(tmp_path / "chart.svg", {"close": (dates, list(range(30)))}, "Chart", "Date", "Close"))
+
+    paths = render_report(jobs, max_workers=2)
+    assert(paths == [job.path for job in jobs])
+    for path in paths[:3]:
+        assert(path.read_bytes().startswith(b"\x89PNG"))
+    assert(b"<svg" in paths[3].read_bytes())
+
+
+def test_render_in_process_keeps_matplotlib_settings(tmp_path):
+    backend, chunksize = matplotlib.rcParams["backend"], matplotlib.rcParams["agg.path.chunksize"]
+    dates = ["2024-01-01", "2024-01-02"]
+    paths = render_report([ChartJob(tmp_path / "chart.png", {"close": (dates, [1.0, 2.0])}, "Chart", "Date", "Close")], max_workers=1)
+    assert(paths[0].read_bytes().startswith(b"\x89PNG"))
+    assert(matplotlib.rcParams["backend"] == backend and matplotlib.rcParams["agg.path.chunksize"] == chunksize)
+
+
+def test_wallet_jobs_are_decimated(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = [f"2024-01-{day:02d}" for day in range(2, 12)]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 4.0, 4.0 + day % 3) for day, date in enumerate(dates)])
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates(dates[0], dates[-1])
+
+    valuation_job, twrr_job = build_wallet_jobs(wallet, tmp_path / "report", max_points=4)
+    assert(len(valuation_job.series["valuation"][0]) <= 4)
+    twrr_dates, twrr = twrr_job.series["twrr"]
+    assert(len(twrr_dates) == len(twrr) == 4)
+    assert(twrr_dates[0] == dates[0] and twrr_dates[-1] == dates[-1])
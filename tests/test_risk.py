@@ -0,0 +1,51 @@
+import numpy as np
+from portfolio_tracking.risk import CovarianceTracker, portfolio_risk
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_online_covariance_matches_batch():
+    generator = np.random.default_rng(0)
+    log_returns = generator.normal(0, 0.01, size=(50, 3))
+    log_returns[:10, 2] = np.nan
+    tracker = CovarianceTracker()
+    tracker._add_assets(np.array([1, 2, 3]))
+    for day, day_returns in enumerate(log_returns):
+        tracker.add_day(f"2024-01-{day + 1:02d}", day_returns)
+    np.testing.assert_allclose(tracker.covariance[:2, :2], np.cov(log_returns[:, :2], rowvar=False))
+    # Chaque paire est estimée sur les jours où les deux assets ont un rendement
+    np.testing.assert_allclose(tracker.covariance[:, 2], np.cov(log_returns[10:], rowvar=False)[:, 2])
+    np.testing.assert_allclose(tracker.mean[:2], log_returns[:, :2].mean(axis=0))
+    np.testing.assert_allclose(np.diag(tracker.correlation), 1)
+
+
+def test_incremental_update_and_var(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.insert_one_asset("Apple", "Apple Inc", "AAPL", "XTB", "USD")
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-08"]
+    db_manager.insert_dates_batch(dates)
+    date_ids = db_manager.get_dates_ids(dates)
+    db_manager.insert_prices_batch(1, date_ids, [(date, 4.0, close) for date, close in zip(dates, [4.0, 4.4, 4.0, 4.2, 3.9])])
+    db_manager.insert_prices_batch(2, date_ids, [(date, 180.0, close) for date, close in zip(dates[1:], [180.0, 190.0, 185.0, 186.0])])
+    db_manager.add_order("GNFT.PA", "2024-01-02", 10, 4.0)
+    db_manager.add_order("AAPL", "2024-01-03", 1, 180.0)
+
+    tracker = CovarianceTracker.from_database(db_manager, "2024-01-04")
+    assert(tracker.dates == dates[:3])
+    assert(tracker.update(db_manager) == 2)
+    assert(tracker.update(db_manager) == 0)
+    full = CovarianceTracker.from_database(db_manager)
+    np.testing.assert_allclose(tracker.covariance, full.covariance)
+    np.testing.assert_array_equal(tracker.log_returns, full.log_returns)
+
+    values = tracker.holding_values(db_manager)
+    np.testing.assert_allclose(values, [39.0, 186.0])
+    var, cvar = tracker.historical_var(values, confidence=0.75)
+    profits = np.expm1(full.log_returns[2:]) @ values
+    assert(np.isclose(var, -np.quantile(profits, 0.25)) and cvar >= var)
+    var, cvar = tracker.parametric_var(values, confidence=0.99)
+    assert(0 < var < cvar)
+
+    risk = portfolio_risk(db_manager, tracker, confidence=0.75)
+    assert(risk["date"] == "2024-01-08" and np.isclose(risk["value"], 225.0))
+    assert(np.isclose(risk["historical"]["var"], tracker.historical_var(values, confidence=0.75)[0]))
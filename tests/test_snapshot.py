@@ -0,0 +1,65 @@
+import pytest
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_snapshot(tmp_path):
+    db_path = tmp_path / "data_base.db"
+    writer = DatabaseManager(db_path)
+    writer.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    writer.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = ["2024-01-02", "2024-01-03"]
+    writer.insert_dates_batch(dates)
+    writer.insert_prices_batch(1, writer.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75), ("2024-01-03", 3.8, 4.0)])
+
+    snapshot = DatabaseManager(db_path, snapshot=True)
+    wallet = Wallet(db_manager=snapshot)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-03")
+    assert(wallet.calculate_wallet_valuation() == [7.5, 8.0])
+    assert(not snapshot.refresh_snapshot())
+
+    # Les écritures dans le fichier n'apparaissent qu'après un rafraîchissement
+    writer.add_order("GNFT.PA", "2024-01-03", 1, 4.0)
+    writer.insert_prices_batch(1, writer.get_dates_ids(dates), [("2024-01-03", 3.8, 4.5)], replace=True)
+    assert(snapshot.get_asset_total_quantity_at_date(1, "2024-01-03") == 2)
+    assert(snapshot.refresh_snapshot())
+    assert(snapshot.get_asset_total_quantity_at_date(1, "2024-01-03") == 3)
+    assert(snapshot.get_all_cashflows_between_dates("2024-01-02", "2024-01-03") == [("2024-01-02", 7.5), ("2024-01-03", 4.0)])
+    assert(wallet.calculate_wallet_valuation() == [7.5, 13.5])
+
+    # Réécriture des résultats dans le fichier
+    snapshot.insert_dates_batch(["2024-01-04"])
+    snapshot.write_back_snapshot()
+    assert(writer.get_dates("2024-01-01", "2024-01-31")[-1] == ("2024-01-04",))
+    writer.insert_dates_batch(["2024-01-05"])
+    with pytest.raises(ValueError):
+        snapshot.write_back_snapshot()
+    snapshot.close()
+
+
+def test_snapshot_follows_updates_and_deletions(tmp_path):
+    db_path = tmp_path / "data_base.db"
+    writer = DatabaseManager(db_path)
+    writer.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    writer.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    writer.add_order("GNFT.PA", "2024-01-03", 1, 4.0)
+    dates = ["2024-01-02", "2024-01-03"]
+    writer.insert_dates_batch(dates)
+    writer.insert_prices_batch(1, writer.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75), ("2024-01-03", 3.8, 4.0)])
+    snapshot = DatabaseManager(db_path, snapshot=True)
+
+    # Ordre modifié et ordre supprimé : les ordres et les flux quotidiens de la copie restent cohérents
+    writer.execute_query("UPDATE Orders SET quantity = 4 WHERE date = '2024-01-02'")
+    writer.execute_query("DELETE FROM Orders WHERE date = '2024-01-03'")
+    assert(snapshot.refresh_snapshot())
+    assert(snapshot.get_asset_total_quantity_at_date(1, "2024-01-03") == 4)
+    cashflows = writer.get_all_cashflows_between_dates("2024-01-02", "2024-01-03")
+    assert(cashflows[0] == ("2024-01-02", 15.0) and sum(cashflow for _, cashflow in cashflows) == 15.0)
+    assert(snapshot.get_all_cashflows_between_dates("2024-01-02", "2024-01-03") == cashflows)
+
+    # Un prix supprimé du fichier fait recopier tout le fichier
+    writer.execute_query("DELETE FROM Prices WHERE date_id = (SELECT id FROM Dates WHERE date = '2024-01-02')")
+    writer.insert_prices_batch(1, writer.get_dates_ids(dates), [("2024-01-03", 3.8, 4.5)], replace=True)
+    assert(snapshot.refresh_snapshot())
+    assert(snapshot.get_one_asset_prices_between_dates(1, "2024-01-02", "2024-01-03") == [("2024-01-03", 4.5)])
+    snapshot.close()
@@ -0,0 +1,51 @@
+"""Startup benchmark: importing the package must stay cheap for read-only commands."""
+import subprocess
+import sys
+from typing import Dict
+
+HEAVY_MODULES = ("pandas", "yfinance", "matplotlib")
+STARTUP_BUDGET_US = 500_000     # Temps cumulé maximal (en µs) pour `import portfolio_tracking`
+
+
+def _import_times(statement: str) -> Dict[str, int]:
+    """Run `statement` with `python -X importtime` and return {module: cumulative time in µs}."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_does_not_load_heavy_modules():
+    times = _import_times("import portfolio_tracking.wallet_data")
+    loaded = [module for module in times if module.split(".")[0] in HEAVY_MODULES]
+    assert(loaded == [])
+
+
+def test_import_time_budget():
+    times = _import_times("import portfolio_tracking")
+    assert(times["portfolio_tracking"] < STARTUP_BUDGET_US)
+
+
+def test_read_path_without_pandas(tmp_path):
+    script = f"""
+import sys
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import Asset, DatabaseManager, Order
+
+db_manager = DatabaseManager({str(tmp_path / "data_base.db")!r})
+wallet = Wallet(db_manager=db_manager)
+wallet.add_assets([Asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR", [Order("2024-01-02", 2, 3.75)])])
+db_manager.insert_dates_batch(["2024-01-02", "2024-01-03"])
+date_ids = db_manager.get_dates_ids(["2024-01-02", "2024-01-03"])
+db_manager.insert_prices_batch(1, date_ids, [("2024-01-02", 3.7, 3.75), ("2024-01-03", 3.8, 4.0)])
+wallet.set_evaluation_dates("2024-01-02", "2024-01-03")
+assert wallet.calculate_wallet_valuation() == [7.5, 8.0]
+assert "pandas" not in sys.modules and "yfinance" not in sys.modules
+"""
+    subprocess.run([sys.executable, "-c", script], check=True)
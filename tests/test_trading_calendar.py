@@ -0,0 +1,61 @@
+from datetime import date
+import json
+from portfolio_tracking import trading_calendar
+from portfolio_tracking.trading_calendar import (EXCHANGE_RULES, find_price_gaps, get_calendar, get_exchange,
+                                                 last_expected_session, load_rules)
+from portfolio_tracking.yfinance_interface import Asset, DatabaseManager, Order
+
+
+def test_exchange_from_ticker():
+    assert(get_exchange("GNFT.PA") == "XPAR")
+    assert(get_exchange("EURUSD=X") == "FX")
+    assert(get_exchange("AAPL") == "XNYS")
+
+
+def test_holidays():
+    paris = get_calendar("XPAR")
+    assert(not paris.is_session("2024-03-29"))     # Vendredi saint
+    assert(not paris.is_session("2024-04-01"))     # Lundi de Pâques
+    assert(not paris.is_session("2024-12-25"))
+    assert(paris.is_session("2023-07-14"))         # Jour férié français, mais Euronext est ouvert
+    new_york = get_calendar("XNYS")
+    assert(not new_york.is_session("2024-11-28"))  # Thanksgiving
+    assert(not new_york.is_session("2021-07-05"))  # 4 juillet tombant un dimanche
+    assert(new_york.is_session("2021-06-18"))      # Juneteenth n'est férié qu'à partir de 2022
+    assert(not new_york.is_session("2022-06-20") and not new_york.is_session("2023-06-19"))
+    assert(new_york.is_session("2021-12-31"))      # 1er janvier 2022 tombant un samedi, sans report
+    assert(date(2021, 12, 31) not in new_york.holidays(2022))
+    london = get_calendar("XLON")
+    assert(not london.is_session("2021-12-27") and not london.is_session("2021-12-28"))
+
+
+def test_last_expected_session():
+    # Après un week-end de Pâques, la dernière séance attendue est le jeudi précédent
+    assert(last_expected_session("GNFT.PA", "2024-04-02") == "2024-03-28")
+    assert(last_expected_session("GNFT.PA", "2024-04-03") == "2024-04-02")
+    assert(last_expected_session("BTC-USD", "2024-04-01") == "2024-03-31")
+
+
+def test_local_rules(tmp_path, monkeypatch):
+    monkeypatch.setitem(EXCHANGE_RULES, "XPAR", dict(EXCHANGE_RULES["XPAR"]))
+    monkeypatch.setattr(trading_calendar, "TICKER_SUFFIXES", dict(trading_calendar.TICKER_SUFFIXES))
+    rules_path = tmp_path / "trading_calendars.json"
+    rules_path.write_text(json.dumps({"exchanges": {"XPAR": {"extra_closures": ["2024-06-03"]}}, "suffixes": {".MI": "XPAR"}}))
+    load_rules(rules_path)
+    assert(not get_calendar("XPAR").is_session("2024-06-03"))
+    assert(get_exchange("ENI.MI") == "XPAR")
+    get_calendar.cache_clear()
+
+
+def test_gaps_and_refresh_skip(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    asset = Asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR", [Order("2024-03-27", 1, 3.75)])
+    db_manager.insert_one_asset(asset.short_name, asset.name, asset.ticker, asset.broker, asset.currency)
+    dates = ["2024-03-27", "2024-03-28", "2024-04-02"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 3.7, 3.75) for date in dates])
+    assert(find_price_gaps(db_manager, 1, "GNFT.PA", "2024-03-27", "2024-04-04") == ["2024-04-03", "2024-04-04"])
+
+    (tmp_path / "Genfit_EUR_history.csv").write_text("Date,Open,High,Low,Close,Adj Close,Volume\n")
+    assert(asset._is_up_to_date(db_manager, "2024-04-03", tmp_path, "history.csv"))
+    assert(not asset._is_up_to_date(db_manager, "2024-04-04", tmp_path, "history.csv"))
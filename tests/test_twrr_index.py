@@ -0,0 +1,53 @@
+import numpy as np
+from portfolio_tracking.returns import TWRRIndex, twrr_series
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import DatabaseManager
+
+
+def test_windows_match_cumulated_series():
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-08"]
+    valuations = np.array([100.0, 110.0, 99.0, 150.0, 160.0])
+    cashflows = np.array([100.0, 0.0, 0.0, 50.0, 0.0])
+    cumulated, _ = twrr_series(valuations, cashflows)
+    index = TWRRIndex(dates, valuations, cashflows)
+    assert(np.isclose(index.between("2024-01-02", "2024-01-08"), cumulated[4] / cumulated[0] - 1))
+    # Les dates hors séances se rattachent à la dernière séance qui les précède
+    assert(np.isclose(index.between("2024-01-06", "2024-01-07"), 0))
+    assert(np.isclose(index.between("2023-12-31", "2024-01-03"), cumulated[1] / 100 - 1))
+
+    starts = np.repeat(dates, len(dates))
+    ends = np.tile(dates, len(dates))
+    expected = np.where(ends >= starts, cumulated[np.tile(np.arange(5), 5)] / cumulated[np.repeat(np.arange(5), 5)] - 1, 0)
+    np.testing.assert_allclose(index.windows(starts, ends), expected, atol=1e-9)
+
+
+def test_total_loss():
+    index = TWRRIndex(["2024-01-02", "2024-01-03", "2024-01-04"], np.array([100.0, 0.0, 0.0]), np.array([100.0, 0.0, 10.0]))
+    assert(index.between("2024-01-02", "2024-01-04") == -1)
+    assert(np.isclose(index.between("2024-01-03", "2024-01-04"), -1))
+
+
+def test_wallet_TWRR_between(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75),
+                                                                      ("2024-01-03", 3.8, 4.0),
+                                                                      ("2024-01-04", 4.0, 4.5)])
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    twrr_cumulated, _ = wallet.calculate_wallet_TWRR()
+    assert(np.isclose(wallet.calculate_wallet_TWRR_between("2024-01-02", "2024-01-04"), twrr_cumulated[2] / twrr_cumulated[0] - 1))
+    np.testing.assert_allclose(wallet.calculate_wallet_TWRR_windows(["2024-01-02", "2024-01-03"], ["2024-01-03", "2024-01-04"]), [4.0 / 3.75 - 1, 4.5 / 4.0 - 1])
+
+
+def test_series_are_rounded_once():
+    generator = np.random.default_rng(0)
+    valuations = 100 * np.cumprod(1 + generator.normal(0, 0.01, 2000))
+    cashflows = np.zeros(len(valuations))
+    cashflows[0] = valuations[0]
+    cumulated, _ = twrr_series(valuations, cashflows)
+    # Sans flux après le premier jour, le TWRR cumulé se simplifie en 100 * V_n / V_0
+    assert(abs(cumulated[-1] - 100 * valuations[-1] / valuations[0]) < 1e-10)
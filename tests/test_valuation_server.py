@@ -0,0 +1,111 @@
+import json
+import socket
+import threading
+from portfolio_tracking.valuation_server import WarmWallet, create_server
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.yfinance_interface import Asset, DatabaseManager, Order
+
+
+def _fill_database(db_manager):
+    db_manager.insert_one_asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR")
+    db_manager.add_order("GNFT.PA", "2024-01-02", 2, 3.75)
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [("2024-01-02", 3.7, 3.75),
+                                                                      ("2024-01-03", 3.8, 4.0),
+                                                                      ("2024-01-04", 4.0, 4.5)])
+
+
+def test_warm_wallet_matches_wallet(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    _fill_database(db_manager)
+    warm_wallet = WarmWallet(db_manager, "2024-01-02", "2024-01-04")
+
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    assert(warm_wallet.get_valuation()["valuations"] == wallet.calculate_wallet_valuation())
+    twrr_cumulated, twrr = wallet.calculate_wallet_TWRR()
+    assert(warm_wallet.get_TWRR()["twrr_cumulated"] == twrr_cumulated)
+    assert(warm_wallet.get_TWRR()["twrr"] == twrr)
+    assert(warm_wallet.get_positions("2024-01-03")["positions"][0]["quantity"] == 2)
+
+
+def test_warm_wallet_refresh(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    _fill_database(db_manager)
+    warm_wallet = WarmWallet(db_manager, "2024-01-02", "2024-01-05")
+    assert(not warm_wallet.refresh())
+
+    writer = DatabaseManager(tmp_path / "data_base.db")
+    writer.add_order("GNFT.PA", "2024-01-04", 1, 4.5)
+    writer.insert_dates_batch(["2024-01-05"])
+    writer.insert_prices_batch(1, writer.get_dates_ids(["2024-01-05"]), [("2024-01-05", 4.5, 5.0)])
+    assert(warm_wallet.refresh())
+
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-05")
+    assert(warm_wallet.get_valuation()["valuations"] == wallet.calculate_wallet_valuation() == [7.5, 8.0, 13.5, 15.0])
+    assert(warm_wallet.get_TWRR()["twrr_cumulated"] == wallet.calculate_wallet_TWRR()[0])
+
+
+def test_server_over_unix_socket(tmp_path):
+    db_path = tmp_path / "data_base.db"
+    socket_path = tmp_path / "valuation.sock"
+    _fill_database(DatabaseManager(db_path))
+    servers = []
+    ready = threading.Event()
+
+    def serve():
+        servers.append(create_server(db_path, unix_socket=socket_path, start_date="2024-01-02", end_date="2024-01-04"))
+        ready.set()
+        servers[0].serve_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait(5)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socket_path))
+            client.sendall(b"GET /valuation?start_date=2024-01-03 HTTP/1.0\r\n\r\n")
+            response = b"".join(iter(lambda: client.recv(4096), b""))
+    finally:
+        servers[0].shutdown()
+        servers[0].server_close()
+    header, body = response.split(b"\r\n\r\n", 1)
+    assert(header.startswith(b"HTTP/1.0 200"))
+    assert(json.loads(body) == {"dates": ["2024-01-03", "2024-01-04"], "valuations": [8.0, 9.0]})
+
+
+def test_warm_wallet_refresh_keeps_prefix(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    _fill_database(db_manager)
+    warm_wallet = WarmWallet(db_manager, "2024-01-02", "2024-01-08")
+    warm_wallet.valuations[0] = -1.0     # Marqueur : le début de la série ne doit pas être recalculé
+
+    writer = DatabaseManager(tmp_path / "data_base.db")
+    writer.insert_dates_batch(["2024-01-05", "2024-01-08"])
+    writer.insert_prices_batch(1, writer.get_dates_ids(["2024-01-08"]), [("2024-01-08", 4.5, 5.0)])
+    assert(warm_wallet.refresh())
+    # Le 2024-01-05 reprend le prix reporté depuis la ligne précédente
+    assert(warm_wallet.get_valuation()["valuations"] == [-1.0, 8.0, 9.0, 9.0, 10.0])
+
+
+def test_warm_wallet_refresh_reloads_on_other_writes(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    _fill_database(db_manager)
+    warm_wallet = WarmWallet(db_manager, "2024-01-02", "2024-01-04")
+    assert(warm_wallet.get_valuation()["valuations"] == [7.5, 8.0, 9.0])
+
+    writer = DatabaseManager(tmp_path / "data_base.db")
+    writer.insert_corporate_actions(1, [("2024-01-04", "split", 2.0)])
+    assert(warm_wallet.refresh())
+    wallet = Wallet(db_manager=db_manager)
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    assert(warm_wallet.get_valuation()["valuations"] == wallet.calculate_wallet_valuation() != [7.5, 8.0, 9.0])
+
+    # Un ordre modifié ne change aucun id
+    with writer.conn:
+        writer.conn.execute("UPDATE Orders SET quantity = quantity * 2")
+    assert(warm_wallet.refresh())
+    assert(warm_wallet.get_valuation()["valuations"] == wallet.calculate_wallet_valuation())
+    assert(not warm_wallet.refresh())
@@ -0,0 +1,50 @@
+import pytest
+from portfolio_tracking.wallet_data import Wallet
+from portfolio_tracking.wallet_snapshot import SNAPSHOT_VERSION, load_wallet_snapshot, read_wallet_snapshot, save_wallet_snapshot
+from portfolio_tracking.yfinance_interface import Asset, DatabaseManager, Order
+
+
+def test_wallet_snapshot_round_trip(tmp_path):
+    db_manager = DatabaseManager(tmp_path / "data_base.db")
+    wallet = Wallet(db_manager=db_manager, max_price_staleness_days=5)
+    wallet.add_assets([Asset("Genfit", "Genfit SA", "GNFT.PA", "XTB", "EUR", [Order("2024-01-02", 2, 4.0), Order("2024-01-04", -1, 4.5)]),
+                       Asset("Apple", "Apple Inc", "AAPL", "XTB", "USD", [])])
+    dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    db_manager.insert_dates_batch(dates)
+    db_manager.insert_prices_batch(1, db_manager.get_dates_ids(dates), [(date, 4.0, close) for date, close in zip(dates, [4.0, 4.25, 4.5])])
+    wallet.set_evaluation_dates("2024-01-02", "2024-01-04")
+    wallet.calculate_wallet_valuation()
+    wallet.get_valuation_rollups("W")
+
+    path = save_wallet_snapshot(wallet, tmp_path / "snapshots" / "wallet.bin")
+    loaded = load_wallet_snapshot(path, db_manager)
+    assert(loaded.currency == wallet.currency and loaded.max_price_staleness_days == 5)
+    assert(loaded.evaluation_dates == wallet.evaluation_dates)
+    assert(loaded.dates == wallet.dates)
+    assert(loaded.valuations == wallet.valuations == [8.0, 8.5, 4.5])
+    assert(loaded.valuation_rollups == wallet.valuation_rollups)
+    assert([asset.to_dict() for asset in loaded.assets] == [asset.to_dict() for asset in wallet.assets])
+    assert(loaded.assets[0].quantity == 1)
+
+    # Séries calculées sans la base : le portefeuille rechargé pointe sur une base vide
+    cold = load_wallet_snapshot(path, DatabaseManager(tmp_path / "empty.db"))
+    assert(cold.calculate_wallet_TWRR() == wallet.calculate_wallet_TWRR())
+    assert(cold.calculate_wallet_share_value() == wallet.calculate_wallet_share_value())
+    assert(cold.get_wallet_share_value_2() == wallet.get_wallet_share_value_2())
+    assert(cold.calculate_wallet_TWRR_between("2024-01-02", "2024-01-04") == wallet.calculate_wallet_TWRR_between("2024-01-02", "2024-01-04"))
+
+
+def test_wallet_snapshot_version(tmp_path):
+    wallet = Wallet(db_manager=DatabaseManager(tmp_path / "data_base.db"))
+    path = save_wallet_snapshot(wallet, tmp_path / "wallet.bin")
+    metadata, sections = read_wallet_snapshot(path)
+    assert(metadata["assets"] == [] and len(sections["valuations"]) == 0)
+
+    content = bytearray(path.read_bytes())
+    content[8:10] = (SNAPSHOT_VERSION + 1).to_bytes(2, "little")
+    path.write_bytes(bytes(content))
+    with pytest.raises(ValueError):
+        load_wallet_snapshot(path)
+    (tmp_path / "other.bin").write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        read_wallet_snapshot(tmp_path / "other.bin")